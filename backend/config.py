@@ -15,6 +15,18 @@ class Config:
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     CLIENT_URL: str = os.getenv("CLIENT_URL", "http://localhost:5173")
     ENV: str = os.getenv("ENV", "development")
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")   # enables /api/admin/* when set
+    # Alternate Gemini REST endpoint, e.g. http://localhost:8765 for scripts/fake_gemini_server.py
+    GEMINI_API_ENDPOINT: str = os.getenv("GEMINI_API_ENDPOINT", "")
+
+    # Rate limiting (per client IP, shared by all workers through RATE_LIMIT_DB)
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))   # cost units (see ROUTE_COSTS)
+    RATE_LIMIT_BURST: float = float(os.getenv("RATE_LIMIT_BURST", "30"))   # cost units
+    RATE_LIMIT_TOKENS_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_TOKENS_PER_MINUTE", "30000"))   # LLM tokens (0 = off)
+    RATE_LIMIT_DB: str = os.getenv(
+        "RATE_LIMIT_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "rate_limits.db")
+    )
 
     # Model settings
     EMBEDDING_MODEL: str = "models/gemini-embedding-001"
@@ -22,14 +34,110 @@ class Config:
     TEMPERATURE: float = 0.2
     MAX_OUTPUT_TOKENS: int = 1024
 
+    # Embedding call settings
+    # async | thread (the REST transport used with GEMINI_API_ENDPOINT is blocking, so it needs threads)
+    EMBEDDING_TRANSPORT: str = os.getenv("EMBEDDING_TRANSPORT", "thread" if GEMINI_API_ENDPOINT else "async")
+    EMBEDDING_TIMEOUT: float = float(os.getenv("EMBEDDING_TIMEOUT", "10"))  # seconds per call
+    EMBEDDING_MAX_CONCURRENCY: int = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "16"))
+
+    # Chat model call settings
+    LLM_TRANSPORT: str = os.getenv("LLM_TRANSPORT", "thread" if GEMINI_API_ENDPOINT else "async")   # async | thread
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))   # in-flight calls / pooled connections
+    LLM_ATTEMPT_TIMEOUT: float = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "20"))   # seconds per attempt
+    LLM_DEADLINE: float = float(os.getenv("LLM_DEADLINE", "45"))   # seconds per call, retries included
+    LLM_FIRST_CHUNK_TIMEOUT: float = float(os.getenv("LLM_FIRST_CHUNK_TIMEOUT", "15"))   # streaming
+    LLM_CHUNK_TIMEOUT: float = float(os.getenv("LLM_CHUNK_TIMEOUT", "20"))   # max gap between stream chunks
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))   # transient errors only
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))   # hedge after this latency
+    LLM_HEDGE_MIN_SAMPLES: int = 20   # latencies observed before hedging kicks in
+    LLM_BREAKER_FAILURES: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))   # consecutive failures to open
+    LLM_BREAKER_RESET: float = float(os.getenv("LLM_BREAKER_RESET", "30"))   # seconds before a trial call
+
     # RAG settings
     SIMILARITY_THRESHOLD: float = 0.65
     TOP_K_CHUNKS: int = 3
     CHUNK_SIZE: int = 300       # words per chunk
     CHUNK_OVERLAP: int = 50     # overlap words
 
+    # Vector store hot reload (seconds between checks, 0 = disabled)
+    VECTOR_STORE_WATCH_INTERVAL: float = float(os.getenv("VECTOR_STORE_WATCH_INTERVAL", "10"))
+
+    # Ingestion settings
+    INGEST_BATCH_SIZE: int = 50          # texts per batch embedding request
+    INGEST_MAX_CONCURRENCY: int = 4      # concurrent batch requests (halved on 429)
+
+    # Vector index settings
+    VECTOR_INDEX: str = os.getenv("VECTOR_INDEX", "auto")   # flat | ivf | auto
+    IVF_MIN_CHUNKS: int = 5000  # 'auto' switches to IVF at this corpus size
+    IVF_NLIST: int = int(os.getenv("IVF_NLIST", "0"))        # clusters (0 = 4 * sqrt(n))
+    IVF_NPROBE: int = int(os.getenv("IVF_NPROBE", "8"))      # clusters scanned per query (recall vs latency)
+
+    # Query embedding cache
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))   # entries
+    EMBEDDING_CACHE_TTL: int = int(os.getenv("EMBEDDING_CACHE_TTL", "86400"))    # seconds
+    EMBEDDING_CACHE_DISK: bool = os.getenv("EMBEDDING_CACHE_DISK", "false").lower() == "true"
+
+    # Semantic answer cache (first-turn questions only)
+    ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # query cosine similarity
+    ANSWER_CACHE_SIZE: int = 512     # entries
+    ANSWER_CACHE_TTL: int = 3600     # seconds
+
+    # Request coalescing: identical concurrent queries share one embedding call,
+    # identical concurrent first-turn questions share one generation
+    COALESCING_ENABLED: bool = os.getenv("COALESCING_ENABLED", "true").lower() == "true"
+
+    # Admission control for chat turns (per worker): concurrent turns, waiting turns,
+    # longest wait before a 503; ongoing conversations are admitted before new ones
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_MAX_CONCURRENCY: int = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "16"))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+    ADMISSION_MAX_WAIT: float = float(os.getenv("ADMISSION_MAX_WAIT", "10"))   # seconds
+
+    # Database settings
+    DB_READ_POOL_SIZE: int = int(os.getenv("DB_READ_POOL_SIZE", "4"))   # reader connections
+    DB_BUSY_TIMEOUT_MS: int = 5000
+    DB_PROFILE: str = os.getenv("DB_PROFILE", "balanced")   # durable | balanced | fast (see db/database.py)
+    DB_STATEMENT_CACHE: int = 256   # prepared statements cached per connection
+    DB_MAINTENANCE_INTERVAL: int = int(os.getenv("DB_MAINTENANCE_INTERVAL", "300"))   # seconds (0 = off)
+
+    # Retention: archive sessions idle for RETENTION_DAYS (0 = keep everything)
+    RETENTION_DAYS: float = float(os.getenv("RETENTION_DAYS", "0"))
+    RETENTION_TARGET: str = os.getenv("RETENTION_TARGET", "sqlite")   # sqlite | ndjson
+    RETENTION_ARCHIVE_PATH: str = os.getenv("RETENTION_ARCHIVE_PATH", "")   # default data/archive.db or data/archive/
+    RETENTION_INTERVAL: int = int(os.getenv("RETENTION_INTERVAL", "3600"))   # seconds between runs
+    RETENTION_BATCH_SIZE: int = 100      # sessions per archive/delete transaction
+    RETENTION_MAX_BATCHES: int = 50      # per run, so one run stays bounded
+    RETENTION_VACUUM_PAGES: int = 2000   # free pages released per run (incremental vacuum)
+    SESSIONS_PAGE_SIZE: int = int(os.getenv("SESSIONS_PAGE_SIZE", "50"))   # default /api/sessions limit
+    CONVERSATION_PAGE_SIZE: int = int(os.getenv("CONVERSATION_PAGE_SIZE", "100"))   # default messages per page
+    CONVERSATION_STREAM_BATCH: int = 200   # rows fetched per step when streaming NDJSON
+    # Write-behind chat persistence: immediate | group (committed on return; adds up to
+    # DB_FLUSH_INTERVAL_MS per write, pays off under heavy write load) | async
+    DB_WRITE_DURABILITY: str = os.getenv("DB_WRITE_DURABILITY", "immediate")
+    DB_FLUSH_INTERVAL_MS: float = float(os.getenv("DB_FLUSH_INTERVAL_MS", "20"))   # max wait before a flush
+    DB_FLUSH_MAX_BATCH: int = int(os.getenv("DB_FLUSH_MAX_BATCH", "200"))   # flush early at this many writes
+
+    # Background session titles
+    TITLE_WORKERS: int = int(os.getenv("TITLE_WORKERS", "2"))   # concurrent title LLM calls
+    TITLE_QUEUE_SIZE: int = 100       # beyond this, a heuristic title is used immediately
+    TITLE_MAX_RETRIES: int = 2
+    TITLE_EVENT_WAIT: float = 5.0     # seconds a stream waits to send the 'title' event
+
+    # Gemini context caching of the prompt prefix + frequently retrieved chunks
+    CONTEXT_CACHE_ENABLED: bool = os.getenv("CONTEXT_CACHE_ENABLED", "false").lower() == "true"
+    CONTEXT_CACHE_TTL: int = int(os.getenv("CONTEXT_CACHE_TTL", "3600"))   # seconds
+    CONTEXT_CACHE_REFRESH_MARGIN: int = 300     # extend/rebuild this many seconds before expiry
+    CONTEXT_CACHE_CHECK_INTERVAL: int = 60      # seconds between lifecycle checks
+    CONTEXT_CACHE_RETRY: int = 300              # seconds to wait after a caching error
+    CONTEXT_CACHE_HOT_CHUNKS: int = int(os.getenv("CONTEXT_CACHE_HOT_CHUNKS", "20"))
+    CONTEXT_CACHE_MIN_TOKENS: int = 1024        # provider minimum for cached content
+
     # Context settings
     MAX_HISTORY_PAIRS: int = 5
+    PROMPT_TOKEN_BUDGET: int = int(os.getenv("PROMPT_TOKEN_BUDGET", "4000"))   # estimated input tokens
+    PROMPT_CHARS_PER_TOKEN: float = float(os.getenv("PROMPT_CHARS_PER_TOKEN", "4"))   # local estimate ratio
 
     @classmethod
     def validate(cls):
@@ -0,0 +1,120 @@
+"""
+Async Query Functions — awaitable versions of db/queries.py.
+
+Reads run on the reader pool and writes on the single writer thread
+(see db/database.py), so SQLite I/O never blocks the event loop.
+Session creation and message inserts go through the write-behind log
+(db/write_behind.py); reads of a session flush its queued writes first.
+"""
+from db import queries
+from db.database import run_read, run_write
+from db.write_behind import write_log
+
+
+# Session Queries
+
+async def create_session(session_id: str) -> None:
+    """Create a new session if it doesn't exist."""
+    if write_log.enabled:
+        await write_log.submit(("session", session_id))
+    else:
+        await run_write(queries.create_session, session_id)
+
+
+async def get_session_by_id(session_id: str) -> dict | None:
+    """Get a single session by ID."""
+    await write_log.barrier(session_id)
+    return await run_read(queries.get_session_by_id, session_id)
+
+
+async def get_sessions(limit: int = 50, cursor: str | None = None) -> dict:
+    """One page of sessions, most recently updated first."""
+    await write_log.barrier()
+    return await run_read(queries.get_sessions, limit, cursor)
+
+
+async def update_session_title(session_id: str, title: str) -> None:
+    """Update session title."""
+    await write_log.barrier(session_id)
+    await run_write(queries.update_session_title, session_id, title)
+
+
+async def has_title(session_id: str) -> bool:
+    """Check if session already has a title."""
+    return await run_read(queries.has_title, session_id)
+
+
+async def delete_session(session_id: str) -> None:
+    """Delete a session and all its messages (CASCADE)."""
+    await write_log.barrier(session_id)
+    await run_write(queries.delete_session, session_id)
+
+
+# Message Queries
+
+async def insert_message(
+    session_id: str, role: str, content: str, tokens_used: int = 0, usage: dict | None = None
+) -> None:
+    """Insert a new message and update session timestamp."""
+    if write_log.enabled:
+        await write_log.submit(("message", session_id, role, content, tokens_used, usage))
+    else:
+        await run_write(queries.insert_message, session_id, role, content, tokens_used, usage)
+
+
+async def get_messages_by_session(session_id: str) -> list[dict]:
+    """Get all messages for a session in chronological order."""
+    await write_log.barrier(session_id)
+    return await run_read(queries.get_messages_by_session, session_id)
+
+
+async def get_messages_page(session_id: str, limit: int = 100, before_id: int | None = None) -> dict:
+    """One page of a conversation, newest page first (see queries.get_messages_page)."""
+    await write_log.barrier(session_id)
+    return await run_read(queries.get_messages_page, session_id, limit, before_id)
+
+
+async def iter_messages(session_id: str, batch_size: int = 200):
+    """
+    Yield a conversation's messages chronologically, `batch_size` rows at a time.
+
+    Rows come straight from one SQLite cursor, so the conversation is
+    never materialized as a whole list.
+    """
+    await write_log.barrier(session_id)
+    cursor = await run_read(queries.open_messages_cursor, session_id)
+    try:
+        while True:
+            rows = await run_read(queries.fetch_rows, cursor, batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+    finally:
+        await run_read(queries.close_cursor, cursor)
+
+
+async def get_recent_message_pairs(session_id: str, limit: int = 5) -> list[dict]:
+    """Get the last N message pairs (user + assistant) for context."""
+    await write_log.barrier(session_id)
+    return await run_read(queries.get_recent_message_pairs, session_id, limit)
+
+
+async def clear_messages(session_id: str) -> None:
+    """Clear all messages from a session (keep the session)."""
+    await write_log.barrier(session_id)
+    await run_write(queries.clear_messages, session_id)
+
+
+# Usage Queries
+
+async def get_usage_by_session(limit: int = 50, session_id: str | None = None) -> list[dict]:
+    """Token usage per session, heaviest first."""
+    await write_log.barrier()
+    return await run_read(queries.get_usage_by_session, limit, session_id)
+
+
+async def get_usage_by_day(days: int = 30) -> list[dict]:
+    """Token usage per UTC day over the last `days` days."""
+    await write_log.barrier()
+    return await run_read(queries.get_usage_by_day, days)
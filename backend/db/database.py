@@ -1,27 +1,211 @@
 """
 SQLite Database — initialization and connection management.
+
+Queries from the async app run off the event loop:
+- Reads go to a small pool of reader threads, each with its own connection
+- Writes go to a single writer thread with one connection, so they are
+  serialized without lock contention (WAL lets reads proceed meanwhile)
+
+Connections are tuned with a named PRAGMA profile (DB_PROFILE), and a
+background task checkpoints the WAL and runs PRAGMA optimize.
 """
+import asyncio
 import sqlite3
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from config import config
 
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "rag_assistant.db")
 
 _connection: sqlite3.Connection | None = None
 
+# Per-thread connections for the reader pool and writer thread
+_local = threading.local()
+_pool_connections: list[sqlite3.Connection] = []
+_pool_lock = threading.Lock()
+_reader_pool: ThreadPoolExecutor | None = None
+_writer_pool: ThreadPoolExecutor | None = None
+_closed = False   # set by close_db; the pools are not recreated afterwards
+
+# Storage tuning profiles (DB_PROFILE). cache_size < 0 is KiB; mmap_size is bytes.
+# - durable:  fsync on every commit, SQLite's defaults otherwise
+# - balanced: fsync at WAL checkpoints only (a power loss can drop the
+#             latest commits, never corrupt the file), bigger cache + mmap
+# - fast:     no fsync at all, for benchmarks and disposable data
+PROFILES = {
+    "durable": {
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "wal_autocheckpoint": 1000,
+    },
+    "balanced": {
+        "synchronous": "NORMAL",
+        "cache_size": -32000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 1000,
+    },
+    "fast": {
+        "synchronous": "OFF",
+        "cache_size": -64000,
+        "mmap_size": 1024 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 4000,
+    },
+}
+
+# Background maintenance counters (see run_maintenance)
+_maintenance = {"runs": 0, "checkpointed_pages": 0, "busy_checkpoints": 0, "last_ms": 0.0, "errors": 0}
+
+
+def get_profile() -> dict:
+    """PRAGMA values of the configured profile."""
+    if config.DB_PROFILE not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{config.DB_PROFILE}' (expected one of {', '.join(PROFILES)})")
+    return PROFILES[config.DB_PROFILE]
+
+
+def _open_connection(read_only: bool = False) -> sqlite3.Connection:
+    """Open a connection tuned with the configured profile."""
+    # Every query uses constant SQL with bound parameters, so the statement
+    # cache keeps them prepared across calls
+    connection = sqlite3.connect(
+        DB_PATH, check_same_thread=False, cached_statements=config.DB_STATEMENT_CACHE
+    )
+    connection.row_factory = sqlite3.Row
+    connection.execute(f"PRAGMA busy_timeout={config.DB_BUSY_TIMEOUT_MS}")
+    profile = get_profile()
+    if read_only:
+        connection.execute("PRAGMA query_only=ON")
+    else:
+        # Takes effect only on a new database, and must precede the switch to
+        # WAL; existing ones switch with archive_sessions.py --enable-incremental-vacuum
+        connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(f"PRAGMA synchronous={profile['synchronous']}")
+        connection.execute(f"PRAGMA wal_autocheckpoint={profile['wal_autocheckpoint']}")
+    connection.execute(f"PRAGMA cache_size={profile['cache_size']}")
+    connection.execute(f"PRAGMA mmap_size={profile['mmap_size']}")
+    connection.execute(f"PRAGMA temp_store={profile['temp_store']}")
+    connection.execute("PRAGMA foreign_keys=ON")
+    return connection
+
+
+def open_reader() -> sqlite3.Connection:
+    """
+    Dedicated read-only connection for a long-lived cursor (the caller closes it).
+
+    Used for streaming results, so a slow client never holds a pool connection.
+    """
+    return _open_connection(read_only=True)
+
+
+def _init_pool_thread(read_only: bool) -> None:
+    """Thread initializer: give each pool thread its own connection."""
+    connection = _open_connection(read_only=read_only)
+    _local.connection = connection
+    with _pool_lock:
+        _pool_connections.append(connection)
+
 
 def get_db() -> sqlite3.Connection:
-    """Get or create the database connection."""
+    """
+    Get the database connection for the current thread.
+
+    Pool threads use their own connection; anything else (startup,
+    scripts) shares the module-level connection.
+    """
     global _connection
+    local = getattr(_local, "connection", None)
+    if local is not None:
+        return local
     if _connection is None:
-        _connection = sqlite3.connect(DB_PATH, check_same_thread=False)
-        _connection.row_factory = sqlite3.Row
-        _connection.execute("PRAGMA journal_mode=WAL")
-        _connection.execute("PRAGMA foreign_keys=ON")
+        _connection = _open_connection()
     return _connection
 
 
+def _get_pools() -> tuple[ThreadPoolExecutor, ThreadPoolExecutor]:
+    """Create the reader pool and writer thread on first use."""
+    global _reader_pool, _writer_pool
+    if _closed:
+        raise RuntimeError("Database is closed")
+    if _reader_pool is None:
+        _reader_pool = ThreadPoolExecutor(
+            max_workers=config.DB_READ_POOL_SIZE,
+            thread_name_prefix="db-reader",
+            initializer=_init_pool_thread,
+            initargs=(True,),
+        )
+    if _writer_pool is None:
+        _writer_pool = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="db-writer",
+            initializer=_init_pool_thread,
+            initargs=(False,),
+        )
+    return _reader_pool, _writer_pool
+
+
+async def run_read(fn, *args, **kwargs):
+    """Run a read-only query function on the reader pool."""
+    reader_pool, _ = _get_pools()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(reader_pool, partial(fn, *args, **kwargs))
+
+
+async def run_write(fn, *args, **kwargs):
+    """Run a query function that writes on the single writer thread."""
+    _, writer_pool = _get_pools()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(writer_pool, partial(fn, *args, **kwargs))
+
+
+# Schema migrations on top of the base schema in init_db, applied in order
+# and tracked with PRAGMA user_version
+MIGRATIONS = [
+    # 1: separate prompt / output / cached token counts per response
+    """
+    ALTER TABLE messages ADD COLUMN prompt_tokens INTEGER DEFAULT 0;
+    ALTER TABLE messages ADD COLUMN output_tokens INTEGER DEFAULT 0;
+    ALTER TABLE messages ADD COLUMN cached_tokens INTEGER DEFAULT 0;
+    ALTER TABLE messages ADD COLUMN tokens_estimated INTEGER DEFAULT 0;
+    """,
+    # 2: denormalized session listing columns + keyset pagination index
+    """
+    ALTER TABLE sessions ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE sessions ADD COLUMN first_message TEXT;
+    UPDATE sessions SET
+        message_count = (SELECT COUNT(*) FROM messages WHERE session_id = sessions.id),
+        first_message = (SELECT content FROM messages WHERE session_id = sessions.id AND role = 'user'
+                         ORDER BY created_at ASC, id ASC LIMIT 1);
+    CREATE INDEX IF NOT EXISTS idx_sessions_updated_at_id ON sessions(updated_at, id);
+    """,
+    # 3: order conversations by the unique id instead of the non-unique created_at
+    """
+    DROP INDEX IF EXISTS idx_messages_session_id;
+    CREATE INDEX IF NOT EXISTS idx_messages_session_id_id ON messages(session_id, id);
+    """,
+]
+
+
+def _migrate(db: sqlite3.Connection) -> None:
+    """Apply pending migrations, each in its own transaction."""
+    version = db.execute("PRAGMA user_version").fetchone()[0]
+    for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        db.executescript(f"BEGIN; {script} PRAGMA user_version = {number}; COMMIT;")
+        print(f"🔧 Database migrated to schema version {number}")
+
+
 def init_db():
     """Initialize database tables and indexes."""
+    global _closed
+    _closed = False
     db = get_db()
 
     db.executescript("""
@@ -42,19 +226,98 @@ def init_db():
             FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
         );
 
-        CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages(session_id);
         CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages(created_at);
         CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at);
     """)
+    _migrate(db)
 
     print("✅ SQLite database initialized")
 
 
+# Maintenance
+
+def run_maintenance() -> dict:
+    """
+    Passive WAL checkpoint plus PRAGMA optimize (runs on the writer thread).
+
+    A passive checkpoint never blocks readers or writers; it copies what it
+    can and the WAL is reused from the start once fully checkpointed.
+    """
+    db = get_db()
+    start = time.perf_counter()
+    busy, wal_pages, checkpointed = db.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    db.execute("PRAGMA optimize")
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    _maintenance["runs"] += 1
+    _maintenance["checkpointed_pages"] += max(checkpointed, 0)
+    _maintenance["busy_checkpoints"] += busy
+    _maintenance["last_ms"] = round(elapsed_ms, 1)
+    return {"busy": busy, "wal_pages": wal_pages, "checkpointed": checkpointed, "ms": round(elapsed_ms, 1)}
+
+
+async def maintain_db(interval: float) -> None:
+    """Background maintenance loop (started from the app lifespan)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            result = await run_write(run_maintenance)
+            if result["wal_pages"] > 0:
+                print(
+                    f"🧹 DB maintenance: checkpointed {result['checkpointed']}/{result['wal_pages']} "
+                    f"WAL pages in {result['ms']}ms"
+                )
+        except Exception as e:
+            _maintenance["errors"] += 1
+            print(f"⚠️  DB maintenance error: {e}")
+
+
+def db_stats() -> dict:
+    """Active profile and maintenance counters for /metrics."""
+    return {"profile": config.DB_PROFILE, **get_profile(), "maintenance": dict(_maintenance)}
+
+
+async def shutdown_db():
+    """Wait for in-flight write-behind flushes, then close the database (app shutdown)."""
+    from db.write_behind import write_log
+
+    await write_log.barrier()
+    close_db()
+
+
 def close_db():
-    """Close the database connection."""
-    global _connection
+    """
+    Drain the pools and the write-behind queue, then close every database connection.
+
+    Flushes already handed to the writer are not waited for; from a running
+    event loop use shutdown_db.
+    """
+    global _connection, _reader_pool, _writer_pool, _closed
+    from db.write_behind import write_log
+
+    _closed = True
+    for pool in (_writer_pool, _reader_pool):
+        if pool is not None:
+            pool.shutdown(wait=True)
+    _reader_pool = _writer_pool = None
+
+    try:
+        write_log.drain()
+    except Exception as e:
+        print(f"❌ Could not drain queued writes: {e}")
+
+    with _pool_lock:
+        for connection in _pool_connections:
+            connection.close()
+        _pool_connections.clear()
+
     if _connection:
+        try:
+            # Leave a small WAL behind and keep the query planner stats fresh
+            _connection.execute("PRAGMA optimize")
+            _connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            print(f"⚠️  Final checkpoint failed: {e}")
         _connection.close()
         _connection = None
         print("🔒 Database connection closed")
-
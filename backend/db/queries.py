@@ -1,7 +1,11 @@
 """
 Database Query Functions — all SQL operations for sessions and messages.
 """
-from db.database import get_db
+import base64
+import json
+import sqlite3
+
+from db.database import get_db, open_reader
 
 
 # Session Queries
@@ -20,27 +24,57 @@ def get_session_by_id(session_id: str) -> dict | None:
     """Get a single session by ID."""
     db = get_db()
     row = db.execute(
-        "SELECT id, title, created_at, updated_at FROM sessions WHERE id = ?",
+        "SELECT id, title, created_at, updated_at, message_count FROM sessions WHERE id = ?",
         (session_id,)
     ).fetchone()
     return dict(row) if row else None
 
 
-def get_all_sessions() -> list[dict]:
-    """Get all sessions ordered by most recently updated."""
+def encode_cursor(updated_at: str, session_id: str) -> str:
+    """Opaque pagination cursor for the position after a session."""
+    raw = json.dumps([updated_at, session_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors."""
+    try:
+        updated_at, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return str(updated_at), str(session_id)
+
+
+def get_sessions(limit: int = 50, cursor: str | None = None) -> dict:
+    """
+    One page of sessions, most recently updated first.
+
+    Keyset pagination on (updated_at, id), so each page is an index range
+    scan regardless of how many sessions or messages exist.
+
+    Returns:
+        Dict with 'sessions' and 'next_cursor' (None on the last page)
+    """
     db = get_db()
-    rows = db.execute("""
-        SELECT 
-            s.id, s.title, s.created_at, s.updated_at,
-            COUNT(m.id) as message_count,
-            (SELECT content FROM messages WHERE session_id = s.id AND role = 'user' 
-             ORDER BY created_at ASC LIMIT 1) as first_message
-        FROM sessions s
-        LEFT JOIN messages m ON m.session_id = s.id
-        GROUP BY s.id
-        ORDER BY s.updated_at DESC
-    """).fetchall()
-    return [dict(row) for row in rows]
+    columns = "id, title, created_at, updated_at, message_count, first_message"
+    if cursor:
+        rows = db.execute(
+            f"SELECT {columns} FROM sessions WHERE (updated_at, id) < (?, ?) "
+            "ORDER BY updated_at DESC, id DESC LIMIT ?",
+            (*decode_cursor(cursor), limit + 1)
+        ).fetchall()
+    else:
+        rows = db.execute(
+            f"SELECT {columns} FROM sessions ORDER BY updated_at DESC, id DESC LIMIT ?",
+            (limit + 1,)
+        ).fetchall()
+
+    sessions = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = sessions[-1]
+        next_cursor = encode_cursor(last["updated_at"], last["id"])
+    return {"sessions": sessions, "next_cursor": next_cursor}
 
 
 def update_session_title(session_id: str, title: str) -> None:
@@ -72,31 +106,160 @@ def delete_session(session_id: str) -> None:
 
 # Message Queries
 
-def insert_message(session_id: str, role: str, content: str, tokens_used: int = 0) -> None:
-    """Insert a new message and update session timestamp."""
+def insert_message(
+    session_id: str, role: str, content: str, tokens_used: int = 0, usage: dict | None = None
+) -> None:
+    """
+    Insert a new message and update session timestamp.
+
+    `usage` holds the prompt / output / cached token split of an
+    assistant response (see LLMService) and whether it was estimated.
+    """
     db = get_db()
+    _insert_message_row(db, session_id, role, content, tokens_used, usage)
+    _touch_session(db, session_id, 1, content if role == "user" else None)
+    db.commit()
+
+
+def _insert_message_row(
+    db: sqlite3.Connection, session_id: str, role: str, content: str, tokens_used: int, usage: dict | None
+) -> None:
+    usage = usage or {}
     db.execute(
-        "INSERT INTO messages (session_id, role, content, tokens_used) VALUES (?, ?, ?, ?)",
-        (session_id, role, content, tokens_used)
+        "INSERT INTO messages (session_id, role, content, tokens_used, "
+        "prompt_tokens, output_tokens, cached_tokens, tokens_estimated) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            session_id, role, content, tokens_used,
+            usage.get("prompt_tokens", 0), usage.get("output_tokens", 0),
+            usage.get("cached_tokens", 0), int(usage.get("estimated", False)),
+        )
     )
+
+
+def _touch_session(db: sqlite3.Connection, session_id: str, added: int, first_user_message: str | None) -> None:
+    """Bump updated_at and the denormalized listing columns after `added` new messages."""
     db.execute(
-        "UPDATE sessions SET updated_at = datetime('now') WHERE id = ?",
-        (session_id,)
+        "UPDATE sessions SET updated_at = datetime('now'), message_count = message_count + ?, "
+        "first_message = COALESCE(first_message, ?) WHERE id = ?",
+        (added, first_user_message, session_id)
     )
-    db.commit()
+
+
+def apply_writes(ops: list[tuple]) -> tuple[list[Exception | None], int]:
+    """
+    Apply queued writes (see db/write_behind.py) in one transaction.
+
+    Ops are ('session', session_id) or ('message', session_id, role,
+    content, tokens_used, usage), applied in order; each touched session
+    gets a single UPDATE however many messages it received. Every op runs
+    under its own SAVEPOINT, so one failing write does not undo the rest.
+    Messages for a session deleted meanwhile (user delete, retention) are
+    skipped.
+
+    Returns:
+        (error or None per op, number of skipped messages)
+    """
+    db = get_db()
+    touched: dict[str, list] = {}
+    errors: list[Exception | None] = []
+    skipped = 0
+    with db:
+        if not db.in_transaction:
+            db.execute("BEGIN")
+        for op in ops:
+            if op[0] == "message" and not db.execute("SELECT 1 FROM sessions WHERE id = ?", (op[1],)).fetchone():
+                skipped += 1
+                errors.append(None)
+                continue
+            db.execute("SAVEPOINT write_op")
+            try:
+                if op[0] == "session":
+                    db.execute("INSERT OR IGNORE INTO sessions (id) VALUES (?)", (op[1],))
+                else:
+                    _insert_message_row(db, *op[1:])
+            except sqlite3.Error as e:
+                db.execute("ROLLBACK TO write_op")
+                db.execute("RELEASE write_op")
+                errors.append(e)
+                continue
+            db.execute("RELEASE write_op")
+            errors.append(None)
+            if op[0] == "message":
+                _, session_id, role, content, _, _ = op
+                counts = touched.setdefault(session_id, [0, None])
+                counts[0] += 1
+                if role == "user" and counts[1] is None:
+                    counts[1] = content
+        for session_id, (added, first_user_message) in touched.items():
+            _touch_session(db, session_id, added, first_user_message)
+    return errors, skipped
+
+
+_MESSAGE_COLUMNS = "id, session_id, role, content, tokens_used, created_at"
 
 
 def get_messages_by_session(session_id: str) -> list[dict]:
     """Get all messages for a session in chronological order."""
     db = get_db()
     rows = db.execute(
-        "SELECT id, session_id, role, content, tokens_used, created_at "
-        "FROM messages WHERE session_id = ? ORDER BY created_at ASC",
+        f"SELECT {_MESSAGE_COLUMNS} FROM messages WHERE session_id = ? ORDER BY id ASC",
         (session_id,)
     ).fetchall()
     return [dict(row) for row in rows]
 
 
+def get_messages_page(session_id: str, limit: int = 100, before_id: int | None = None) -> dict:
+    """
+    One page of a conversation, paging backwards from the newest message.
+
+    Args:
+        session_id: Session to read
+        limit: Messages per page
+        before_id: Only messages older than this id (None = newest page)
+
+    Returns:
+        Dict with 'messages' (chronological within the page) and
+        'next_before_id' for the next older page (None when none is left)
+    """
+    db = get_db()
+    where, params = "session_id = ?", (session_id,)
+    if before_id is not None:
+        where, params = "session_id = ? AND id < ?", (session_id, before_id)
+    rows = db.execute(
+        f"SELECT {_MESSAGE_COLUMNS} FROM messages WHERE {where} ORDER BY id DESC LIMIT ?",
+        (*params, limit + 1)
+    ).fetchall()
+    messages = [dict(row) for row in reversed(rows[:limit])]
+    next_before_id = messages[0]["id"] if len(rows) > limit else None
+    return {"messages": messages, "next_before_id": next_before_id}
+
+
+def open_messages_cursor(session_id: str) -> sqlite3.Cursor:
+    """
+    Cursor over a whole conversation (chronological) on its own connection.
+
+    Rows are fetched incrementally by the caller; close it with close_cursor.
+    """
+    connection = open_reader()
+    return connection.execute(
+        f"SELECT {_MESSAGE_COLUMNS} FROM messages WHERE session_id = ? ORDER BY id ASC",
+        (session_id,)
+    )
+
+
+def fetch_rows(cursor: sqlite3.Cursor, size: int) -> list[dict]:
+    """Next batch of rows from an open cursor (empty when exhausted)."""
+    return [dict(row) for row in cursor.fetchmany(size)]
+
+
+def close_cursor(cursor: sqlite3.Cursor) -> None:
+    """Close a cursor from open_messages_cursor together with its connection."""
+    connection = cursor.connection
+    cursor.close()
+    connection.close()
+
+
 def get_recent_message_pairs(session_id: str, limit: int = 5) -> list[dict]:
     """
     Get the last N message pairs (user + assistant) for context.
@@ -105,7 +268,7 @@ def get_recent_message_pairs(session_id: str, limit: int = 5) -> list[dict]:
     db = get_db()
     rows = db.execute(
         "SELECT role, content FROM messages "
-        "WHERE session_id = ? ORDER BY created_at DESC LIMIT ?",
+        "WHERE session_id = ? ORDER BY id DESC LIMIT ?",
         (session_id, limit * 2)
     ).fetchall()
     # Reverse to get chronological order
@@ -117,8 +280,45 @@ def clear_messages(session_id: str) -> None:
     db = get_db()
     db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
     db.execute(
-        "UPDATE sessions SET title = NULL, updated_at = datetime('now') WHERE id = ?",
+        "UPDATE sessions SET title = NULL, message_count = 0, first_message = NULL, "
+        "updated_at = datetime('now') WHERE id = ?",
         (session_id,)
     )
     db.commit()
 
+
+# Usage Queries
+
+_USAGE_COLUMNS = """
+    COUNT(*) AS responses,
+    COALESCE(SUM(prompt_tokens), 0) AS prompt_tokens,
+    COALESCE(SUM(output_tokens), 0) AS output_tokens,
+    COALESCE(SUM(cached_tokens), 0) AS cached_tokens,
+    COALESCE(SUM(tokens_used), 0) AS total_tokens,
+    COALESCE(SUM(tokens_estimated), 0) AS estimated_responses
+"""
+
+
+def get_usage_by_session(limit: int = 50, session_id: str | None = None) -> list[dict]:
+    """Token usage per session, heaviest first (assistant responses only)."""
+    db = get_db()
+    where = "WHERE role = 'assistant'" + (" AND session_id = ?" if session_id else "")
+    params = (session_id, limit) if session_id else (limit,)
+    rows = db.execute(
+        f"SELECT session_id, {_USAGE_COLUMNS}, MIN(created_at) AS first_response, MAX(created_at) AS last_response "
+        f"FROM messages {where} GROUP BY session_id ORDER BY total_tokens DESC LIMIT ?",
+        params
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_usage_by_day(days: int = 30) -> list[dict]:
+    """Token usage per UTC day over the last `days` days, newest first."""
+    db = get_db()
+    rows = db.execute(
+        f"SELECT date(created_at) AS day, COUNT(DISTINCT session_id) AS sessions, {_USAGE_COLUMNS} "
+        "FROM messages WHERE role = 'assistant' AND created_at >= datetime('now', ?) "
+        "GROUP BY day ORDER BY day DESC",
+        (f"-{int(days)} days",)
+    ).fetchall()
+    return [dict(row) for row in rows]
@@ -0,0 +1,274 @@
+"""
+Retention — moves idle sessions out of the hot database.
+
+Sessions not updated for RETENTION_DAYS are copied, with their messages,
+to an archive and then deleted from the hot DB, RETENTION_BATCH_SIZE
+sessions per transaction so write locks stay short. Freed pages are
+returned with PRAGMA incremental_vacuum (bounded per run) instead of a
+full VACUUM.
+
+Archive targets (RETENTION_TARGET):
+- sqlite: an archive database with the same columns (RETENTION_ARCHIVE_PATH)
+- ndjson: gzip-compressed NDJSON, one session (with its messages) per line,
+          one file per day in the RETENTION_ARCHIVE_PATH directory
+
+Runs from the app lifespan (retention_loop) or scripts/archive_sessions.py.
+"""
+import asyncio
+import gzip
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from config import config
+from db.database import get_db, run_write
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+_stats = {"runs": 0, "sessions_archived": 0, "messages_archived": 0, "pages_vacuumed": 0, "errors": 0}
+
+
+# Archive targets
+
+class SqliteArchive:
+    """Archive database mirroring the hot sessions/messages columns."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._tables: set[str] = set()
+
+    def _ensure_table(self, table: str, columns: list[str]) -> None:
+        if table in self._tables:
+            return
+        # Column types are not needed for an archive; the primary key keeps re-runs idempotent
+        definitions = ", ".join(f"{column} PRIMARY KEY" if column == "id" else column for column in columns)
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS {table} ({definitions}, archived_at TEXT)")
+        self._tables.add(table)
+
+    def _insert(self, table: str, rows: list[dict], archived_at: str) -> None:
+        if not rows:
+            return
+        columns = list(rows[0].keys())
+        self._ensure_table(table, columns)
+        placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+        self._db.executemany(
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}, archived_at) VALUES ({placeholders})",
+            [(*(row[column] for column in columns), archived_at) for row in rows],
+        )
+
+    def write(self, sessions: list[dict], messages: list[dict]) -> None:
+        archived_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self._db:
+            self._insert("sessions", sessions, archived_at)
+            self._insert("messages", messages, archived_at)
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class NdjsonArchive:
+    """Daily gzip NDJSON files; each batch is appended as a new gzip member."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, sessions: list[dict], messages: list[dict]) -> None:
+        by_session: dict[str, list[dict]] = {}
+        for message in messages:
+            by_session.setdefault(message["session_id"], []).append(message)
+
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        path = os.path.join(self.directory, f"sessions-{day}.ndjson.gz")
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as archive:
+                for session in sessions:
+                    record = {**session, "messages": by_session.get(session["id"], [])}
+                    archive.write((json.dumps(record) + "\n").encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())   # durable before the rows leave the hot DB
+
+    def close(self) -> None:
+        pass
+
+
+def open_archive(target: str | None = None, path: str | None = None):
+    """Archive for the configured (or given) target and path."""
+    target = target or config.RETENTION_TARGET
+    if target == "sqlite":
+        return SqliteArchive(path or config.RETENTION_ARCHIVE_PATH or os.path.join(DATA_DIR, "archive.db"))
+    if target == "ndjson":
+        return NdjsonArchive(path or config.RETENTION_ARCHIVE_PATH or os.path.join(DATA_DIR, "archive"))
+    raise ValueError(f"Unknown RETENTION_TARGET '{target}' (expected sqlite or ndjson)")
+
+
+# Batches (run on the writer connection)
+
+def cutoff_for(days: float) -> str:
+    """updated_at value before which a session counts as idle."""
+    row = get_db().execute("SELECT datetime('now', ?)", (f"-{days} days",)).fetchone()
+    return row[0]
+
+
+def count_idle(cutoff: str) -> int:
+    """Number of sessions that would be archived."""
+    return get_db().execute("SELECT COUNT(*) FROM sessions WHERE updated_at < ?", (cutoff,)).fetchone()[0]
+
+
+def archive_batch(archive, cutoff: str, limit: int) -> tuple[int, int]:
+    """
+    Archive and delete up to `limit` sessions idle since before `cutoff`.
+
+    The archive is written (and committed/fsynced) before the delete, so a
+    crash in between leaves a duplicate in the archive, never a loss.
+
+    Returns:
+        (sessions archived, messages archived)
+    """
+    db = get_db()
+    sessions = [
+        dict(row) for row in db.execute(
+            "SELECT * FROM sessions WHERE updated_at < ? ORDER BY updated_at ASC LIMIT ?",
+            (cutoff, limit)
+        ).fetchall()
+    ]
+    if not sessions:
+        return 0, 0
+
+    ids = [session["id"] for session in sessions]
+    placeholders = ", ".join("?" for _ in ids)
+    messages = [
+        dict(row) for row in db.execute(
+            f"SELECT * FROM messages WHERE session_id IN ({placeholders}) ORDER BY id ASC", ids
+        ).fetchall()
+    ]
+    archive.write(sessions, messages)
+
+    # Messages go with their session (ON DELETE CASCADE)
+    with db:
+        db.execute(f"DELETE FROM sessions WHERE id IN ({placeholders}) AND updated_at < ?", (*ids, cutoff))
+    return len(sessions), len(messages)
+
+
+def incremental_vacuum_enabled() -> bool:
+    return get_db().execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def incremental_vacuum(max_pages: int) -> int:
+    """Return up to `max_pages` free pages to the OS; 0 unless auto_vacuum is INCREMENTAL."""
+    db = get_db()
+    if not incremental_vacuum_enabled():
+        return 0
+    free = db.execute("PRAGMA freelist_count").fetchone()[0]
+    pages = min(free, max_pages)
+    if pages:
+        # executescript steps the pragma to completion (execute() frees a single page)
+        db.executescript(f"PRAGMA incremental_vacuum({pages})")
+    return pages
+
+
+def enable_incremental_vacuum() -> None:
+    """One-off full VACUUM that switches an existing database to auto_vacuum=INCREMENTAL."""
+    db = get_db()
+    db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    db.execute("VACUUM")
+
+
+def _record(sessions: int, messages: int, pages: int) -> None:
+    _stats["runs"] += 1
+    _stats["sessions_archived"] += sessions
+    _stats["messages_archived"] += messages
+    _stats["pages_vacuumed"] += pages
+
+
+def run_retention(
+    days: float | None = None,
+    batch_size: int | None = None,
+    max_batches: int | None = None,
+    archive=None,
+) -> dict:
+    """
+    Archive idle sessions batch by batch, then vacuum incrementally (blocking; used by the CLI).
+
+    Returns:
+        Dict with 'sessions', 'messages', 'batches' and 'pages_vacuumed'
+    """
+    days = config.RETENTION_DAYS if days is None else days
+    batch_size = batch_size or config.RETENTION_BATCH_SIZE
+    max_batches = max_batches or config.RETENTION_MAX_BATCHES
+    archive = archive or open_archive()
+    cutoff = cutoff_for(days)
+
+    sessions = messages = batches = 0
+    try:
+        while batches < max_batches:
+            archived, archived_messages = archive_batch(archive, cutoff, batch_size)
+            if not archived:
+                break
+            sessions += archived
+            messages += archived_messages
+            batches += 1
+    finally:
+        archive.close()
+    pages = incremental_vacuum(config.RETENTION_VACUUM_PAGES)
+    _record(sessions, messages, pages)
+    return {"sessions": sessions, "messages": messages, "batches": batches, "pages_vacuumed": pages}
+
+
+# Background task
+
+async def run_retention_async() -> dict:
+    """
+    Same as run_retention, but each batch is its own job on the writer
+    thread, so chat writes interleave between batches.
+    """
+    from db.write_behind import write_log
+
+    await write_log.barrier()
+    archive = await run_write(open_archive)
+    cutoff = await run_write(cutoff_for, config.RETENTION_DAYS)
+    sessions = messages = batches = 0
+    try:
+        while batches < config.RETENTION_MAX_BATCHES:
+            archived, archived_messages = await run_write(archive_batch, archive, cutoff, config.RETENTION_BATCH_SIZE)
+            if not archived:
+                break
+            sessions += archived
+            messages += archived_messages
+            batches += 1
+    finally:
+        await run_write(archive.close)
+    pages = await run_write(incremental_vacuum, config.RETENTION_VACUUM_PAGES)
+    _record(sessions, messages, pages)
+    return {"sessions": sessions, "messages": messages, "batches": batches, "pages_vacuumed": pages}
+
+
+async def retention_loop(interval: float) -> None:
+    """Periodic retention (started from the app lifespan when RETENTION_DAYS > 0)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            start = time.perf_counter()
+            result = await run_retention_async()
+            if result["sessions"] or result["pages_vacuumed"]:
+                print(
+                    f"🗄️  Archived {result['sessions']} session(s), {result['messages']} message(s) "
+                    f"in {result['batches']} batch(es), vacuumed {result['pages_vacuumed']} page(s) "
+                    f"in {(time.perf_counter() - start) * 1000:.0f}ms"
+                )
+        except Exception as e:
+            _stats["errors"] += 1
+            print(f"⚠️  Retention run failed: {e}")
+
+
+def retention_stats() -> dict:
+    """Retention settings and counters for /metrics."""
+    return {
+        "days": config.RETENTION_DAYS,
+        "target": config.RETENTION_TARGET,
+        **_stats,
+    }
@@ -0,0 +1,149 @@
+"""
+Write-behind Log — groups chat writes into few transactions.
+
+Session creation and message inserts (with their session touch) are queued
+in memory and flushed on the writer thread in one transaction every
+DB_FLUSH_INTERVAL_MS, or as soon as DB_FLUSH_MAX_BATCH writes are waiting.
+Under load, many commits (and fsyncs) per turn become a few per second.
+
+Durability (DB_WRITE_DURABILITY):
+- immediate: no queue; every write commits on its own (default)
+- group:     callers wait until their batch has committed (committed on
+             return; it survives a power loss only if SQLite fsyncs each
+             commit, i.e. synchronous=FULL). Each write waits up to
+             DB_FLUSH_INTERVAL_MS, which adds that latency at low load
+- async:     callers return once queued; a crash can lose the last interval
+
+Each write in a batch succeeds or fails on its own: a failing write only
+fails its caller, and messages for a session deleted meanwhile are
+skipped. Reads and direct writes of a session first flush its queued
+writes, so the app always reads its own writes. Shutdown waits for
+in-flight flushes and drains whatever is still queued.
+"""
+import asyncio
+
+from config import config
+from db import queries
+from db.database import run_write
+
+
+class WriteBehindLog:
+    """In-memory queue of session/message writes, flushed in grouped transactions."""
+
+    def __init__(self):
+        self._pending: list[tuple] = []
+        self._waiters: list[asyncio.Future | None] = []   # one per pending op (None in async mode)
+        self._pending_sessions: set[str] = set()
+        self._in_flight: dict[asyncio.Task, set[str]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self.flushes = 0
+        self.writes = 0
+        self.failures = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return config.DB_WRITE_DURABILITY in ("group", "async")
+
+    # Queueing
+
+    async def submit(self, op: tuple) -> None:
+        """Queue one write ('session', id) or ('message', id, ...) per the durability mode."""
+        loop = asyncio.get_running_loop()
+        self._pending.append(op)
+        self._pending_sessions.add(op[1])
+        waiter = loop.create_future() if config.DB_WRITE_DURABILITY == "group" else None
+        self._waiters.append(waiter)
+
+        if len(self._pending) >= config.DB_FLUSH_MAX_BATCH:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(config.DB_FLUSH_INTERVAL_MS / 1000, self._start_flush)
+
+        if waiter is not None:
+            await waiter
+
+    # Flushing
+
+    def _start_flush(self) -> None:
+        """Hand the queued writes to the writer thread as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        ops, waiters, sessions = self._pending, self._waiters, self._pending_sessions
+        self._pending, self._waiters, self._pending_sessions = [], [], set()
+        # The writer is a single thread, so batches commit in submission order
+        task = asyncio.ensure_future(self._write(ops, waiters))
+        self._in_flight[task] = sessions
+        task.add_done_callback(lambda done: self._in_flight.pop(done, None))
+
+    async def _write(self, ops: list[tuple], waiters: list[asyncio.Future | None]) -> None:
+        try:
+            errors, skipped = await run_write(queries.apply_writes, ops)
+        except Exception as e:
+            # The batch transaction itself failed (e.g. database locked)
+            errors, skipped = [e] * len(ops), 0
+        self._settle(ops, waiters, errors, skipped)
+
+    def _settle(self, ops: list[tuple], waiters: list, errors: list, skipped: int) -> None:
+        """Record a flushed batch and resolve each caller with its own write's outcome."""
+        self.flushes += 1
+        self.skipped += skipped
+        for op, waiter, error in zip(ops, waiters, errors):
+            if error is None:
+                self.writes += 1
+            else:
+                self.failures += 1
+                print(f"❌ Write-behind {op[0]} write for session {op[1]} failed: {error}")
+            if waiter is None or waiter.done():
+                continue
+            if error is None:
+                waiter.set_result(None)
+            else:
+                waiter.set_exception(error)
+
+    async def barrier(self, session_id: str | None = None) -> None:
+        """
+        Make queued writes visible before a read or a direct write.
+
+        With a session id only that session's writes are waited for.
+        """
+        if self._pending and (session_id is None or session_id in self._pending_sessions):
+            self._start_flush()
+        tasks = [
+            task for task, sessions in self._in_flight.items()
+            if session_id is None or session_id in sessions
+        ]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def drain(self) -> None:
+        """Synchronously write whatever is still queued (shutdown, after the writer thread stopped)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        ops, waiters = self._pending, self._waiters
+        self._pending, self._waiters, self._pending_sessions = [], [], set()
+        self._settle(ops, waiters, *queries.apply_writes(ops))
+        print(f"💾 Drained {len(ops)} queued write(s)")
+
+    def stats(self) -> dict:
+        """Queue depth and batching counters for /metrics."""
+        return {
+            "durability": config.DB_WRITE_DURABILITY,
+            "pending": len(self._pending),
+            "flushes_in_flight": len(self._in_flight),
+            "flushes": self.flushes,
+            "writes": self.writes,
+            "avg_batch": round(self.writes / self.flushes, 1) if self.flushes else 0.0,
+            "failures": self.failures,
+            "skipped": self.skipped,
+        }
+
+
+# Singleton instance
+write_log = WriteBehindLog()
@@ -2,18 +2,28 @@
 FastAPI Application — main entry point.
 Production-Grade RAG Assistant Backend.
 """
-import google.generativeai as genai
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from slowapi.errors import RateLimitExceeded
 
 from config import config
-from db.database import init_db, close_db
+from db.database import db_stats, init_db, maintain_db, shutdown_db
+from db.write_behind import write_log
+from db.retention import retention_loop, retention_stats
 from services.rag_service import rag_service
+from services.embedding_cache import embedding_cache
+from services.embedding_service import embedding_service
+from services.answer_cache import answer_cache
+from services.title_service import title_service
+from services.llm_service import configure_gemini, llm_service
+from services.prompt_builder import prompt_builder
+from services.context_cache import context_cache
+from services.chat_service import chat_service
 from routes.chat import router as chat_router
-from middleware.rate_limiter import limiter, rate_limit_handler
+from routes.admin import router as admin_router
+from middleware.rate_limiter import RateLimitMiddleware, rate_limiter
 
 
 @asynccontextmanager
@@ -22,15 +32,42 @@ async def lifespan(app: FastAPI):
     # ── Startup ──
     print("\n🚀 Starting RAG Assistant Backend...")
     config.validate()
-    genai.configure(api_key=config.GEMINI_API_KEY)
+    configure_gemini()
     init_db()
     rag_service.load_vector_store()
+    title_service.start()
+    watcher = None
+    if config.VECTOR_STORE_WATCH_INTERVAL > 0:
+        watcher = asyncio.create_task(rag_service.watch_vector_store(config.VECTOR_STORE_WATCH_INTERVAL))
+    db_maintenance = None
+    if config.DB_MAINTENANCE_INTERVAL > 0:
+        db_maintenance = asyncio.create_task(maintain_db(config.DB_MAINTENANCE_INTERVAL))
+    retention = None
+    if config.RETENTION_DAYS > 0:
+        retention = asyncio.create_task(retention_loop(config.RETENTION_INTERVAL))
+    cache_keeper = None
+    if config.CONTEXT_CACHE_ENABLED:
+        cache_keeper = asyncio.create_task(context_cache.run(config.CONTEXT_CACHE_CHECK_INTERVAL))
     print("✅ Server ready!\n")
 
     yield
 
     # ── Shutdown ──
-    close_db()
+    if watcher:
+        watcher.cancel()
+    if db_maintenance:
+        db_maintenance.cancel()
+    if retention:
+        retention.cancel()
+    if cache_keeper:
+        cache_keeper.cancel()
+        await context_cache.close()
+    await title_service.stop()
+    embedding_cache.close()
+    embedding_service.close()
+    llm_service.close()
+    rate_limiter.close()
+    await shutdown_db()
     print("👋 Server shut down gracefully")
 
 
@@ -45,9 +82,8 @@ app = FastAPI(
 
 # ─── Middleware ────────────────────────────────────────────────────
 
-# Rate limiting
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, rate_limit_handler)
+# Rate limiting (added before CORS so 429 responses still get CORS headers)
+app.add_middleware(RateLimitMiddleware)
 
 # CORS
 app.add_middleware(
@@ -61,6 +97,7 @@ app.add_middleware(
 # ─── Routes ────────────────────────────────────────────────────────
 
 app.include_router(chat_router, prefix="/api")
+app.include_router(admin_router, prefix="/api")
 
 
 # ─── Health Check ──────────────────────────────────────────────────
@@ -73,6 +110,33 @@ async def health_check():
         "status": "healthy",
         "service": "OVI AssistAI API",
         "version": "1.0.0",
+        "vector_store": rag_service.describe_store(),
+    }
+
+
+# ─── Metrics ──────────────────────────────────────────────────────
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime counters for capacity planning."""
+    return {
+        "success": True,
+        "embedding": embedding_service.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "titles": title_service.stats(),
+        "llm": llm_service.stats(),
+        "prompt": prompt_builder.stats(),
+        "context_cache": context_cache.stats(),
+        "db": db_stats(),
+        "db_writes": write_log.stats(),
+        "retention": retention_stats(),
+        "rate_limit": rate_limiter.stats(),
+        "admission": chat_service.admission.stats(),
+        "coalescing": {
+            "embeddings": rag_service.coalescing_stats(),
+            "generations": chat_service.coalescing_stats(),
+        },
     }
 
 
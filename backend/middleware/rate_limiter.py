@@ -1,24 +1,227 @@
 """
-Rate Limiter Middleware — per-IP rate limiting using SlowAPI.
+Rate Limiter Middleware — per-client token buckets shared by every worker.
+
+Bucket state lives in a small SQLite file (RATE_LIMIT_DB), updated in one
+IMMEDIATE transaction per check, so N uvicorn workers enforce one limit
+instead of N. Two buckets per client IP:
+
+1. Requests: RATE_LIMIT_PER_MINUTE cost units/min with a RATE_LIMIT_BURST
+   burst. Routes have weights (ROUTE_COSTS) — streaming chat costs more
+   than listing sessions.
+2. LLM tokens: RATE_LIMIT_TOKENS_PER_MINUTE. Chat requests are admitted
+   while the bucket is positive and charged the tokens actually used once
+   the reply is done (the bucket can go into debt), so heavy users are
+   throttled on what they cost rather than on request count.
+
+If the bucket store fails, requests are allowed (fail open) and counted.
 """
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 from fastapi import Request
 from fastapi.responses import JSONResponse
 
-# Create limiter instance — uses client IP for rate limiting
-limiter = Limiter(key_func=get_remote_address)
+from config import config
+
+# (method, path) → cost units; anything else under /api costs DEFAULT_COST
+ROUTE_COSTS = {
+    ("POST", "/api/chat/stream"): 5,
+    ("POST", "/api/chat"): 4,
+}
+DEFAULT_COST = 1
+EXEMPT_PATHS = ("/health", "/metrics", "/docs", "/openapi.json")
+
+# Routes that spend LLM tokens (checked against the token bucket)
+LLM_PATHS = {"/api/chat", "/api/chat/stream"}
+
+_PRUNE_EVERY = 1000   # checks between deletions of idle buckets
+
+
+def client_key(request: Request) -> str:
+    """Client identity used for limits (remote IP, as before)."""
+    return request.client.host if request.client else "unknown"
+
+
+class BucketStore:
+    """Token buckets in a SQLite file shared across processes (one thread per process)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db: sqlite3.Connection | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rate-limit")
+        self._checks = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Autocommit mode; transactions are explicit
+            self._db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=1.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=OFF")   # losing bucket state on a crash is harmless
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+        return self._db
+
+    def _take(self, key: str, cost: float, capacity: float, rate: float, required: float) -> tuple[bool, float, float]:
+        db = self._connect()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+            allowed = tokens >= required
+            if allowed:
+                tokens -= cost
+            db.execute(
+                "INSERT INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now)
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+        self._checks += 1
+        if self._checks % _PRUNE_EVERY == 0:
+            # A bucket idle this long has refilled completely; dropping it changes nothing
+            db.execute("DELETE FROM buckets WHERE updated_at < ?", (now - 3600,))
+
+        retry_after = 0.0 if allowed else (required - tokens) / rate
+        return allowed, tokens, retry_after
+
+    async def take(self, key: str, cost: float, capacity: float, per_minute: float, required: float | None = None):
+        """
+        Refill the bucket, then deduct `cost` if it holds at least `required` (default: cost).
+
+        Returns:
+            (allowed, tokens left, seconds until allowed)
+        """
+        loop = asyncio.get_running_loop()
+        required = cost if required is None else required
+        return await loop.run_in_executor(
+            self._executor, partial(self._take, key, cost, capacity, per_minute / 60, required)
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class RateLimiter:
+    """Per-route request limits plus the per-client LLM token budget."""
+
+    def __init__(self, store: BucketStore):
+        self.store = store
+        self.allowed = 0
+        self.limited_requests = 0
+        self.limited_tokens = 0
+        self.errors = 0
+
+    @staticmethod
+    def route_cost(method: str, path: str) -> int:
+        """Cost units of a request (0 = not limited)."""
+        if method == "OPTIONS" or path.startswith(EXEMPT_PATHS) or not path.startswith("/api"):
+            return 0
+        return ROUTE_COSTS.get((method, path), DEFAULT_COST)
+
+    async def check(self, request: Request) -> JSONResponse | None:
+        """Return a 429 response if the request is over a limit, else None."""
+        if not config.RATE_LIMIT_ENABLED:
+            return None
+        cost = self.route_cost(request.method, request.url.path)
+        if cost == 0:
+            return None
+        key = client_key(request)
+
+        try:
+            allowed, remaining, retry_after = await self.store.take(
+                f"req:{key}", cost, config.RATE_LIMIT_BURST, config.RATE_LIMIT_PER_MINUTE
+            )
+            if not allowed:
+                self.limited_requests += 1
+                return self._limited("Too many requests. Please slow down.", retry_after)
+
+            if config.RATE_LIMIT_TOKENS_PER_MINUTE > 0 and request.url.path in LLM_PATHS:
+                # Admit while the token budget is not in debt; the reply's usage is charged later
+                allowed, _, retry_after = await self.store.take(
+                    f"tok:{key}", 0, config.RATE_LIMIT_TOKENS_PER_MINUTE,
+                    config.RATE_LIMIT_TOKENS_PER_MINUTE, required=1,
+                )
+                if not allowed:
+                    self.limited_tokens += 1
+                    return self._limited("Token budget exceeded. Please wait a moment.", retry_after)
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️  Rate limiter unavailable, allowing request: {e}")
+            return None
+
+        self.allowed += 1
+        return None
+
+    async def charge_tokens(self, request: Request, tokens: int) -> None:
+        """Deduct the LLM tokens a reply actually used from the client's budget."""
+        if not config.RATE_LIMIT_ENABLED or config.RATE_LIMIT_TOKENS_PER_MINUTE <= 0 or tokens <= 0:
+            return
+        try:
+            await self.store.take(
+                f"tok:{client_key(request)}", tokens, config.RATE_LIMIT_TOKENS_PER_MINUTE,
+                config.RATE_LIMIT_TOKENS_PER_MINUTE, required=float("-inf"),
+            )
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️  Could not charge {tokens} tokens: {e}")
+
+    @staticmethod
+    def _limited(message: str, retry_after: float) -> JSONResponse:
+        retry_after = max(1, round(retry_after))
+        return JSONResponse(
+            status_code=429,
+            content={"success": False, "error": message, "detail": message, "retryAfter": retry_after},
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    def stats(self) -> dict:
+        return {
+            "enabled": config.RATE_LIMIT_ENABLED,
+            "per_minute": config.RATE_LIMIT_PER_MINUTE,
+            "burst": config.RATE_LIMIT_BURST,
+            "tokens_per_minute": config.RATE_LIMIT_TOKENS_PER_MINUTE,
+            "allowed": self.allowed,
+            "limited_requests": self.limited_requests,
+            "limited_tokens": self.limited_tokens,
+            "errors": self.errors,
+        }
+
+    def close(self) -> None:
+        self.store.close()
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying `rate_limiter` to every HTTP request (streaming-safe)."""
+
+    def __init__(self, app):
+        self.app = app
 
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            response = await rate_limiter.check(Request(scope))
+            if response is not None:
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
 
-async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
-    """Custom handler for rate limit exceeded errors."""
-    return JSONResponse(
-        status_code=429,
-        content={
-            "success": False,
-            "error": "Too many requests. Please slow down.",
-            "detail": str(exc.detail),
-        },
-    )
 
+# Singleton instance
+rate_limiter = RateLimiter(BucketStore(config.RATE_LIMIT_DB))
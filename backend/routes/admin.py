@@ -0,0 +1,51 @@
+"""
+Admin API Routes — operational endpoints, enabled by setting ADMIN_TOKEN.
+"""
+import hmac
+from fastapi import APIRouter, Header, HTTPException, Query
+from config import config
+from db import async_queries as queries
+from services.rag_service import rag_service
+
+router = APIRouter()
+
+
+def require_admin(token: str | None) -> None:
+    """Reject the request unless it carries the configured admin token."""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not token or not hmac.compare_digest(token, config.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+# POST /api/admin/reload-store — Hot-swap the vector store
+
+@router.post("/admin/reload-store")
+async def reload_store(force: bool = False, x_admin_token: str | None = Header(default=None)):
+    """Load the vector store currently on disk without restarting."""
+    require_admin(x_admin_token)
+    swapped = await rag_service.reload_vector_store(force=force)
+    return {
+        "success": True,
+        "reloaded": swapped,
+        "vectorStore": rag_service.describe_store(),
+    }
+
+
+# GET /api/admin/usage — Token usage rollups
+
+@router.get("/admin/usage")
+async def usage(
+    by: str = Query("day", pattern="^(day|session)$"),
+    days: int = Query(30, ge=1, le=366),
+    limit: int = Query(50, ge=1, le=1000),
+    session_id: str | None = None,
+    x_admin_token: str | None = Header(default=None),
+):
+    """Prompt / output / cached token totals per day or per session."""
+    require_admin(x_admin_token)
+    if by == "session":
+        rows = await queries.get_usage_by_session(limit, session_id)
+    else:
+        rows = await queries.get_usage_by_day(days)
+    return {"success": True, "by": by, "usage": rows}
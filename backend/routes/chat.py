@@ -2,10 +2,16 @@
 Chat API Routes — all HTTP endpoint definitions.
 """
 import json
-from fastapi import APIRouter, HTTPException, Request
+from contextlib import aclosing
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, field_validator
+from config import config
 from services.chat_service import chat_service
+from services.llm_service import LLMUnavailableError
+from utils.admission import AdmissionRejected
+from middleware.rate_limiter import rate_limiter
 
 router = APIRouter()
 
@@ -33,44 +39,80 @@ class ChatRequest(BaseModel):
         return v.strip()
 
 
+async def _admit(session_id: str):
+    """Chat slot for the turn, or a 503 with Retry-After when the turn is shed."""
+    try:
+        return await chat_service.admit(session_id)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, round(e.retry_after)))},
+        )
+
+
 # POST /api/chat — Non-streaming
 
 @router.post("/chat")
-async def send_message(body: ChatRequest):
+async def send_message(body: ChatRequest, request: Request):
     """Send a chat message and get AI response."""
+    slot = await _admit(body.sessionId)
     try:
         result = await chat_service.process_message(body.sessionId, body.message)
+        await rate_limiter.charge_tokens(request, result["tokens_used"])
         return {
             "success": True,
             "reply": result["reply"],
             "tokensUsed": result["tokens_used"],
             "retrievedChunks": result["retrieved_chunks"],
             "docsUsed": result["docs_used"],
+            "cached": result["cached"],
         }
+    except LLMUnavailableError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, round(e.retry_after)))},
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if slot:
+            slot.release()
 
 
 # POST /api/chat/stream — Streaming SSE
 
 @router.post("/chat/stream")
-async def send_message_stream(body: ChatRequest):
+async def send_message_stream(body: ChatRequest, request: Request):
     """Send a chat message and get streaming AI response via SSE."""
+    # Admitted before the response starts, so a shed turn still gets a 503
+    slot = await _admit(body.sessionId)
 
     async def event_generator():
         try:
             async for event in chat_service.process_message_stream(
                 body.sessionId, body.message
             ):
+                if event["type"] == "complete":
+                    # The reply is done; free the slot instead of holding it through the title wait
+                    if slot:
+                        slot.release()
+                    await rate_limiter.charge_tokens(request, event["tokens_used"])
                 yield f"data: {json.dumps(event)}\n\n"
             yield "data: [DONE]\n\n"
         except Exception as e:
             error_event = {"type": "error", "error": str(e)}
             yield f"data: {json.dumps(error_event)}\n\n"
+        finally:
+            if slot:
+                slot.release()
 
     return StreamingResponse(
         event_generator(),
         media_type="text/event-stream",
+        # Also releases the slot if the client disconnects before streaming starts
+        background=BackgroundTask(slot.release) if slot else None,
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
@@ -79,12 +121,35 @@ async def send_message_stream(body: ChatRequest):
     )
 
 
-# GET /api/conversations/:sessionId — Get conversation
+# GET /api/conversations/:sessionId — Get conversation (paginated or NDJSON)
 
 @router.get("/conversations/{session_id}")
-async def get_conversation(session_id: str):
-    """Get all messages for a session."""
-    result = chat_service.get_conversation(session_id)
+async def get_conversation(
+    session_id: str,
+    limit: int = Query(config.CONVERSATION_PAGE_SIZE, ge=1, le=1000),
+    before_id: int | None = Query(None, ge=1),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """
+    Get a session's messages.
+
+    JSON: the newest `limit` messages (chronological); pass `nextBeforeId`
+    as `before_id` for the page before. NDJSON: every message, one per
+    line, streamed from the database cursor.
+    """
+    if format == "ndjson":
+        messages = await chat_service.stream_conversation(session_id)
+        if messages is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+        async def ndjson_lines():
+            async with aclosing(messages):
+                async for message in messages:
+                    yield json.dumps(message) + "\n"
+
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+    result = await chat_service.get_conversation(session_id, limit, before_id)
     if not result:
         raise HTTPException(status_code=404, detail="Session not found")
 
@@ -92,16 +157,23 @@ async def get_conversation(session_id: str):
         "success": True,
         "sessionId": result["session"]["id"],
         "messages": result["messages"],
+        "nextBeforeId": result["next_before_id"],
     }
 
 
-# ─── GET /api/sessions — List all sessions 
+# ─── GET /api/sessions — List sessions (keyset-paginated)
 
 @router.get("/sessions")
-async def get_sessions():
-    """Get all sessions."""
-    sessions = chat_service.get_all_sessions()
-    return {"success": True, "sessions": sessions}
+async def get_sessions(
+    limit: int = Query(config.SESSIONS_PAGE_SIZE, ge=1, le=200),
+    cursor: str | None = None,
+):
+    """Get a page of sessions; pass `nextCursor` back as `cursor` for the next one."""
+    try:
+        page = await chat_service.get_sessions(limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "sessions": page["sessions"], "nextCursor": page["next_cursor"]}
 
 
 # DELETE /api/sessions/:sessionId — Delete session
@@ -109,7 +181,7 @@ async def get_sessions():
 @router.delete("/sessions/{session_id}")
 async def delete_session(session_id: str):
     """Delete a session and all its messages."""
-    deleted = chat_service.delete_session(session_id)
+    deleted = await chat_service.delete_session(session_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Session not found")
     return {"success": True, "message": "Session deleted successfully"}
@@ -120,7 +192,7 @@ async def delete_session(session_id: str):
 @router.delete("/conversations/{session_id}")
 async def clear_conversation(session_id: str):
     """Clear all messages from a session (keep the session)."""
-    cleared = chat_service.clear_conversation(session_id)
+    cleared = await chat_service.clear_conversation(session_id)
     if not cleared:
         raise HTTPException(status_code=404, detail="Session not found")
     return {"success": True, "message": "Conversation cleared successfully"}
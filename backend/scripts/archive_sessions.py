@@ -0,0 +1,90 @@
+"""
+Archive Script — moves idle sessions out of the chat database.
+
+This script:
+1. Finds sessions not updated for --days (default RETENTION_DAYS)
+2. Copies them, with their messages, to the archive (sqlite or gzip NDJSON)
+3. Deletes them from the hot database in batches of --batch-size sessions
+4. Releases freed pages with an incremental vacuum
+
+Safe to run while the server is up (each batch is one short transaction).
+
+Run: python scripts/archive_sessions.py --days 90 [--target ndjson] [--path DIR] [--dry-run]
+     python scripts/archive_sessions.py --enable-incremental-vacuum   # one-off full VACUUM
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path so we can import project modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env"))
+
+from config import config
+from db import retention
+from db.database import close_db, init_db
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Archive idle chat sessions and shrink the database")
+    parser.add_argument("--days", type=float, default=config.RETENTION_DAYS, help="Idle age in days")
+    parser.add_argument("--target", default=config.RETENTION_TARGET, choices=["sqlite", "ndjson"])
+    parser.add_argument("--path", default=None, help="Archive database file or NDJSON directory")
+    parser.add_argument("--batch-size", type=int, default=config.RETENTION_BATCH_SIZE, help="Sessions per batch")
+    parser.add_argument("--max-batches", type=int, default=1_000_000, help="Stop after this many batches")
+    parser.add_argument("--dry-run", action="store_true", help="Only count idle sessions")
+    parser.add_argument(
+        "--enable-incremental-vacuum", action="store_true",
+        help="Switch the database to auto_vacuum=INCREMENTAL (full VACUUM; stop the server first)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 60)
+    print("🗄️  Session Archive")
+    print("=" * 60)
+
+    init_db()
+    try:
+        if args.enable_incremental_vacuum:
+            start = time.perf_counter()
+            retention.enable_incremental_vacuum()
+            print(f"✅ auto_vacuum=INCREMENTAL enabled ({time.perf_counter() - start:.1f}s)")
+            return
+
+        if args.days <= 0:
+            print("❌ Pass --days (or set RETENTION_DAYS) to a positive age")
+            sys.exit(1)
+
+        cutoff = retention.cutoff_for(args.days)
+        idle = retention.count_idle(cutoff)
+        print(f"🔍 {idle} session(s) idle since before {cutoff} UTC")
+        if args.dry_run or not idle:
+            return
+
+        start = time.perf_counter()
+        result = retention.run_retention(
+            days=args.days,
+            batch_size=args.batch_size,
+            max_batches=args.max_batches,
+            archive=retention.open_archive(args.target, args.path),
+        )
+        print(
+            f"✅ Archived {result['sessions']} session(s), {result['messages']} message(s) "
+            f"in {result['batches']} batch(es) to {args.target}; "
+            f"vacuumed {result['pages_vacuumed']} page(s) in {time.perf_counter() - start:.1f}s"
+        )
+        if not retention.incremental_vacuum_enabled():
+            print("💡 Free pages are only released with auto_vacuum=INCREMENTAL (--enable-incremental-vacuum)")
+    finally:
+        close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+ANN Benchmark Script — recall@K vs latency of IVF search against exact search.
+
+This script:
+1. Builds a synthetic clustered corpus (or loads the real vector store with --store)
+2. Builds a FlatIndex (ground truth) and an IVFIndex over the same matrix
+3. Runs noisy copies of corpus rows as queries through both paths
+4. Reports recall@K and p50/p99 latency per nprobe setting
+
+Run: python scripts/benchmark_ann.py [--n 100000] [--dim 768] [--queries 200] [--k 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add parent directory to path so we can import project modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.vector_index import FlatIndex, IVFIndex, default_nlist
+from utils.vector_math import normalize_rows
+from utils.vector_store import load_vector_store
+
+
+def synthetic_corpus(n: int, dim: int, n_topics: int, seed: int) -> np.ndarray:
+    """Clustered embeddings: topic centers plus per-chunk noise."""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    labels = rng.integers(0, n_topics, size=n)
+    noise = rng.standard_normal((n, dim)).astype(np.float32) * 0.6
+    return normalize_rows(topics[labels] + noise)
+
+
+def timed_search(index, queries: np.ndarray, k: int, **kwargs) -> tuple[list[set], np.ndarray]:
+    """Run every query, returning result id sets and per-query latency in ms."""
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, top_k=k, threshold=-1.0, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({hit["id"] for hit in hits})
+    return results, np.array(latencies)
+
+
+def main():
+    """Benchmark IVF recall and latency against brute force."""
+    parser = argparse.ArgumentParser(description="Benchmark IVF vs exact vector search")
+    parser.add_argument("--n", type=int, default=100_000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=768, help="Synthetic embedding dimension")
+    parser.add_argument("--topics", type=int, default=500, help="Synthetic topic clusters")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--k", type=int, default=3, help="Top-K")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF clusters (0 = 4 * sqrt(n))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="nprobe values")
+    parser.add_argument("--store", action="store_true", help="Use the real vector store instead of synthetic data")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("📊 ANN Benchmark — IVF vs exact search")
+    print("=" * 60)
+
+    if args.store:
+        matrix, meta = load_vector_store()
+        matrix = np.ascontiguousarray(matrix)
+        chunks = meta["chunks"]
+    else:
+        matrix = synthetic_corpus(args.n, args.dim, args.topics, args.seed)
+        chunks = [{"id": i, "doc_id": i, "title": "", "content": "", "chunk_index": 0} for i in range(len(matrix))]
+    print(f"   📐 Corpus: {matrix.shape[0]} x {matrix.shape[1]}")
+
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.integers(0, matrix.shape[0], size=args.queries)
+    queries = matrix[picks] + rng.standard_normal((args.queries, matrix.shape[1])).astype(np.float32) * 0.02
+
+    flat = FlatIndex(matrix, chunks, normalized=True)
+    start = time.perf_counter()
+    ivf = IVFIndex.build(matrix, chunks, nlist=args.nlist or default_nlist(len(chunks)), normalized=True, seed=args.seed)
+    print(f"   🗂️  IVF build: {ivf.nlist} clusters in {time.perf_counter() - start:.1f}s\n")
+
+    truth, flat_ms = timed_search(flat, queries, args.k)
+    print(f"{'mode':<14}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'exact':<14}{1.0:>10.3f}{np.percentile(flat_ms, 50):>10.2f}{np.percentile(flat_ms, 99):>10.2f}")
+
+    for nprobe in args.nprobe:
+        if nprobe > ivf.nlist:
+            continue
+        found, ivf_ms = timed_search(ivf, queries, args.k, nprobe=nprobe)
+        recall = np.mean([len(f & t) / max(len(t), 1) for f, t in zip(found, truth)])
+        label = f"ivf/{nprobe}"
+        print(f"{label:<14}{recall:>10.3f}{np.percentile(ivf_ms, 50):>10.2f}{np.percentile(ivf_ms, 99):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
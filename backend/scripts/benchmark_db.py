@@ -0,0 +1,116 @@
+"""
+SQLite Profile Benchmark — synthetic chat workload against each DB_PROFILE.
+
+This script:
+1. Creates a fresh database per profile in a temporary directory
+2. Replays --turns chat turns, --concurrency at a time, through db/async_queries
+   (create session, read history, store user message, store reply, list sessions)
+3. Reads conversation pages in parallel with the writes
+4. Reports writes/s and read latency p50/p99 per profile
+
+Run: python scripts/benchmark_db.py [--turns 2000] [--concurrency 32] [--durability immediate]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add parent directory to path so we can import project modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from config import config
+from db import async_queries as queries
+from db import database
+from db.database import PROFILES
+
+REPLY = "Based on our documentation, you can do this from Settings. " * 8
+
+
+async def replay(turns: int, concurrency: int, sessions: int) -> dict:
+    """Run the synthetic workload; returns write count, elapsed seconds and read latencies (ms)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    read_latencies: list[float] = []
+    writes = 0
+
+    async def timed_read(call):
+        start = time.perf_counter()
+        await call
+        read_latencies.append((time.perf_counter() - start) * 1000)
+
+    async def turn(i: int) -> None:
+        nonlocal writes
+        session_id = f"bench-{random.randrange(sessions)}"
+        async with semaphore:
+            await queries.create_session(session_id)
+            await timed_read(queries.get_recent_message_pairs(session_id, config.MAX_HISTORY_PAIRS))
+            await queries.insert_message(session_id, "user", f"Question {i} about billing and invoices?")
+            await queries.insert_message(
+                session_id, "assistant", REPLY, 120,
+                {"prompt_tokens": 100, "output_tokens": 20, "total_tokens": 120},
+            )
+            writes += 3
+            if i % 10 == 0:
+                await timed_read(queries.get_sessions(50))
+            if i % 5 == 0:
+                await timed_read(queries.get_messages_page(session_id, 100))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(turn(i) for i in range(turns)))
+    return {"writes": writes, "elapsed": time.perf_counter() - start, "reads": read_latencies}
+
+
+async def run_workload(args) -> dict:
+    try:
+        return await replay(args.turns, args.concurrency, args.sessions)
+    finally:
+        await database.shutdown_db()
+
+
+def run_profile(profile: str, args, directory: str) -> dict:
+    config.DB_PROFILE = profile
+    database.DB_PATH = os.path.join(directory, f"bench_{profile}.db")
+    database.init_db()
+    random.seed(args.seed)
+    return asyncio.run(run_workload(args))
+
+
+def main():
+    """Benchmark every storage profile on the same workload."""
+    parser = argparse.ArgumentParser(description="Benchmark SQLite PRAGMA profiles with a chat workload")
+    parser.add_argument("--turns", type=int, default=2000, help="Chat turns to replay")
+    parser.add_argument("--concurrency", type=int, default=32, help="Turns in flight at once")
+    parser.add_argument("--sessions", type=int, default=200, help="Distinct sessions")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument(
+        "--durability", default="immediate", choices=["immediate", "group", "async"],
+        help="DB_WRITE_DURABILITY (immediate shows the per-commit cost of each profile)",
+    )
+    parser.add_argument("--dir", default=None, help="Directory for the databases (default: a temp dir)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    config.DB_WRITE_DURABILITY = args.durability
+
+    print("=" * 60)
+    print(f"📊 SQLite Profile Benchmark — {args.turns} turns, concurrency {args.concurrency}, "
+          f"writes: {args.durability}")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        rows = []
+        for profile in args.profiles:
+            result = run_profile(profile, args, directory)
+            p50, p99 = np.percentile(result["reads"], [50, 99])
+            rows.append((profile, result["writes"] / result["elapsed"], p50, p99, result["elapsed"]))
+
+    print(f"\n{'profile':<10} {'writes/s':>10} {'read p50 ms':>12} {'read p99 ms':>12} {'total s':>8}")
+    for profile, rate, p50, p99, elapsed in rows:
+        print(f"{profile:<10} {rate:>10.0f} {p50:>12.2f} {p99:>12.2f} {elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
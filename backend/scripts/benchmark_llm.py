@@ -0,0 +1,79 @@
+"""
+LLM Transport Benchmark — tail latency of LLMService with and without hedging.
+
+This script:
+1. Points the Gemini client at a REST endpoint (normally scripts/fake_gemini_server.py)
+2. Sends --requests non-stream generations, --concurrency at a time, through LLMService
+3. Reports p50/p95/p99 latency, failures and the transport counters
+   (retries, hedges, circuit breaker state)
+
+Run: python scripts/fake_gemini_server.py --tail-rate 0.05 --tail-ms 3000 &
+     python scripts/benchmark_llm.py --endpoint http://localhost:8765 [--hedge] [--requests 200]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Tail latency of LLMService against a Gemini REST endpoint")
+    parser.add_argument("--endpoint", default="http://localhost:8765", help="Gemini REST endpoint")
+    parser.add_argument("--requests", type=int, default=200, help="Total generations")
+    parser.add_argument("--concurrency", type=int, default=10, help="Generations in flight at once")
+    parser.add_argument("--hedge", action="store_true", help="Enable hedged requests")
+    return parser.parse_args()
+
+
+async def run(args) -> None:
+    from services.llm_service import LLMUnavailableError, configure_gemini, llm_service
+
+    configure_gemini()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, failures, rejected = [], 0, 0
+
+    async def one(i: int) -> None:
+        nonlocal failures, rejected
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await llm_service.generate_response(f"Benchmark question {i}", "", [])
+                latencies.append((time.perf_counter() - start) * 1000)
+            except LLMUnavailableError:
+                rejected += 1
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    print(f"\n📊 {args.requests} requests in {elapsed:.1f}s (hedging {'on' if args.hedge else 'off'})")
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"   Latency ms — p50 {p50:.0f}  p95 {p95:.0f}  p99 {p99:.0f}  max {max(latencies):.0f}")
+    print(f"   Failed: {failures}, rejected by open circuit: {rejected}")
+    stats = llm_service.stats()
+    print(f"   Calls: {stats['calls']}, retries: {stats['retries']}, timeouts: {stats['timeouts']}, "
+          f"hedges: {stats['hedges']} ({stats['hedge_wins']} won)")
+    print(f"   Circuit: {stats['circuit']}")
+    llm_service.close()
+
+
+def main():
+    args = parse_args()
+
+    # Config is read at import time
+    os.environ["GEMINI_API_ENDPOINT"] = args.endpoint
+    os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+    os.environ["LLM_HEDGE_ENABLED"] = "true" if args.hedge else "false"
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Vector Store Conversion Script — migrates vector_store.json to the binary format.
+
+This script:
+1. Reads the legacy data/vector_store.json (embeddings inline as JSON floats)
+2. Writes data/vector_store.<version>.npy (normalized float32 matrix)
+   and data/vector_store.meta.json (compact chunk metadata)
+
+Run: python scripts/convert_vector_store.py [--input PATH] [--output BASE] [--remove-json]
+"""
+import argparse
+import os
+import sys
+
+# Add parent directory to path so we can import project modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from config import config
+from utils.vector_store import (
+    LEGACY_JSON_PATH,
+    VECTOR_STORE_BASE,
+    convert_json_store,
+    matrix_path_for,
+    store_paths,
+)
+
+
+def main():
+    """Convert a JSON vector store to the binary format."""
+    parser = argparse.ArgumentParser(description="Convert vector_store.json to the binary store format")
+    parser.add_argument("--input", default=LEGACY_JSON_PATH, help="Path to the legacy JSON store")
+    parser.add_argument("--output", default=VECTOR_STORE_BASE, help="Base path for the binary store")
+    parser.add_argument("--remove-json", action="store_true", help="Delete the JSON store after converting")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"❌ {args.input} not found")
+        sys.exit(1)
+
+    print(f"🔄 Converting {args.input}...")
+    meta = convert_json_store(args.input, args.output, model=config.EMBEDDING_MODEL)
+
+    _, meta_path = store_paths(args.output)
+    matrix_path = matrix_path_for(args.output, meta)
+    print(f"✅ Wrote {meta['count']} vectors ({meta['dim']}d), version {meta['version']}")
+    print(f"   💾 {matrix_path} ({os.path.getsize(matrix_path) / 1024:.0f} KB)")
+    print(f"   💾 {meta_path} ({os.path.getsize(meta_path) / 1024:.0f} KB)")
+
+    if args.remove_json:
+        os.remove(args.input)
+        print(f"   🗑️  Removed {args.input}")
+
+
+if __name__ == "__main__":
+    main()
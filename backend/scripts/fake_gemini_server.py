@@ -0,0 +1,260 @@
+"""
+Fake Gemini Server — a local stand-in for the Gemini REST API.
+
+Serves generateContent, streamGenerateContent, embedContent and
+batchEmbedContents with configurable latency, tail latency, hangs, 5xx
+and 429 errors, so timeouts, retries, hedging and the circuit breaker can
+be exercised offline.
+
+Run:  python scripts/fake_gemini_server.py --port 8765 --tail-rate 0.05 --tail-ms 3000
+Use:  GEMINI_API_ENDPOINT=http://localhost:8765 uvicorn main:app
+      python scripts/benchmark_llm.py --endpoint http://localhost:8765 --hedge
+
+Faults can be changed while running, e.g. to simulate an outage:
+      curl -X POST localhost:8765/fake/config -d '{"error_rate": 1.0, "fault_methods": "generateContent"}'
+      curl localhost:8765/fake/stats
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+REPLY = (
+    "Based on our documentation, you can do this from **Settings**. "
+    "Open the relevant section, make your change and click **Save**. "
+    "Let me know if you need anything else!"
+)
+TITLE = "Fake Conversation Title"
+
+_ROUTE = re.compile(r"^/v1beta/models/(?P<model>[^:]+):(?P<method>\w+)")
+
+
+class Faults:
+    """Latency and failure model; every field can be changed at runtime via /fake/config."""
+
+    def __init__(self, args):
+        self.latency_ms = args.latency_ms
+        self.jitter = args.jitter
+        self.tail_rate = args.tail_rate
+        self.tail_ms = args.tail_ms
+        self.hang_rate = args.hang_rate
+        self.hang_ms = args.hang_ms
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.chunk_delay_ms = args.chunk_delay_ms
+        self.dim = args.dim
+        self.fault_methods = args.fault_methods   # comma-separated; empty = every method
+
+    def update(self, values: dict) -> None:
+        for key, value in values.items():
+            if hasattr(self, key):
+                setattr(self, key, type(getattr(self, key))(value))
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+    def applies_to(self, method: str) -> bool:
+        return not self.fault_methods or method in self.fault_methods.split(",")
+
+    def delay(self) -> float:
+        """Seconds to wait before answering: log-normal body plus an occasional slow tail or hang."""
+        roll = random.random()
+        if roll < self.hang_rate:
+            return self.hang_ms / 1000
+        if roll < self.hang_rate + self.tail_rate:
+            return self.tail_ms / 1000
+        return self.latency_ms / 1000 * math.exp(random.gauss(0, self.jitter))
+
+    def error(self) -> tuple[int, str] | None:
+        roll = random.random()
+        if roll < self.error_rate:
+            return 503, "UNAVAILABLE"
+        if roll < self.error_rate + self.rate_limit_rate:
+            return 429, "RESOURCE_EXHAUSTED"
+        return None
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: dict[str, int] = {}
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+
+def fake_embedding(text: str, dim: int) -> list[float]:
+    seed = int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32).tolist()
+
+
+def prompt_text(body: dict) -> str:
+    return " ".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+def generate_response(text: str, reply: str | None = None, generated: str | None = None) -> dict:
+    """One response; `generated` is the text streamed so far, which usage counts (like Gemini)."""
+    reply = reply if reply is not None else (TITLE if "very short title" in text else REPLY)
+    prompt_tokens = max(1, len(text) // 4)
+    output_tokens = max(1, len(generated if generated is not None else reply) // 4)
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": reply}]}, "finishReason": 1, "index": 0}],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        },
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, so client connection pooling is exercised
+    faults: Faults = None
+    stats: Stats = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # Helpers
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status: int, payload) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, reason: str) -> None:
+        self._send_json(status, {"error": {"code": status, "message": f"Simulated {reason}", "status": reason}})
+
+    def _write_chunk(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    # Routes
+
+    def do_GET(self):
+        if self.path.startswith("/fake/stats"):
+            self._send_json(200, {"requests": self.stats.counts, "faults": self.faults.as_dict()})
+        else:
+            self._send_error(404, "NOT_FOUND")
+
+    def do_POST(self):
+        if self.path.startswith("/fake/config"):
+            self.faults.update(self._read_json())
+            self._send_json(200, self.faults.as_dict())
+            return
+
+        match = _ROUTE.match(self.path)
+        if not match:
+            self._send_error(404, "NOT_FOUND")
+            return
+
+        method = match["method"]
+        body = self._read_json()
+        self.stats.add(method)
+
+        error = None
+        if self.faults.applies_to(method):
+            time.sleep(self.faults.delay())
+            error = self.faults.error()
+        else:
+            time.sleep(self.faults.latency_ms / 1000)
+        if error:
+            self.stats.add(f"error_{error[0]}")
+            self._send_error(*error)
+            return
+
+        if method == "generateContent":
+            self._send_json(200, generate_response(prompt_text(body)))
+        elif method == "streamGenerateContent":
+            self._stream(prompt_text(body))
+        elif method == "embedContent":
+            text = prompt_text({"contents": [body.get("content", {})]})
+            self._send_json(200, {"embedding": {"values": fake_embedding(text, self.faults.dim)}})
+        elif method == "batchEmbedContents":
+            embeddings = [
+                {"values": fake_embedding(prompt_text({"contents": [req.get("content", {})]}), self.faults.dim)}
+                for req in body.get("requests", [])
+            ]
+            self._send_json(200, {"embeddings": embeddings})
+        else:
+            self._send_error(404, "NOT_FOUND")
+
+    def _stream(self, text: str) -> None:
+        """Stream a JSON array of partial responses (the REST streaming format)."""
+        words = (TITLE if "very short title" in text else REPLY).split(" ")
+        pieces = [" ".join(words[i:i + 4]) + " " for i in range(0, len(words), 4)]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        generated = ""
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(self.faults.chunk_delay_ms / 1000)
+            generated += piece
+            prefix = "[" if i == 0 else ","
+            self._write_chunk(prefix + json.dumps(generate_response(text, piece, generated)))
+        self._write_chunk("]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local fake of the Gemini REST API with fault injection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Median response latency")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Log-normal sigma of the latency")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="Fraction of requests that are slow")
+    parser.add_argument("--tail-ms", type=float, default=3000, help="Latency of slow requests")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Fraction of requests that hang")
+    parser.add_argument("--hang-ms", type=float, default=60000, help="How long a hanging request takes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests failing with 429")
+    parser.add_argument("--chunk-delay-ms", type=float, default=50, help="Gap between streamed chunks")
+    parser.add_argument("--dim", type=int, default=3072, help="Embedding dimensions")
+    parser.add_argument(
+        "--fault-methods", default="",
+        help="Only inject faults into these methods, e.g. generateContent,streamGenerateContent",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    Handler.faults = Faults(args)
+    Handler.stats = Stats()
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    print(f"🧪 Fake Gemini API on http://{args.host}:{args.port} — faults: {Handler.faults.as_dict()}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
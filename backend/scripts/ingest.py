@@ -4,11 +4,18 @@ Ingestion Script — Pre-processes documents into embeddings.
 This script:
 1. Reads docs.json (raw knowledge base)
 2. Chunks each document into ~300-word pieces with overlap
-3. Generates embeddings for each chunk using Gemini Embeddings API
-4. Saves everything to vector_store.json
-
-Run: python scripts/ingest.py
+3. Reuses stored embeddings for chunks whose content hash is unchanged and
+   only embeds new/changed chunks (use --full to re-embed everything)
+4. Generates embeddings in concurrent batches using Gemini Embeddings API
+   (adaptive backoff on 429, resumable from data/ingest_checkpoint.jsonl)
+5. Saves everything to the binary vector store (vector_store.<version>.npy + vector_store.meta.json)
+   and prints a report of added / changed / removed documents
+
+Run: python scripts/ingest.py [--full] [--restart] [--batch-size N] [--concurrency N] [--report PATH]
+     python scripts/ingest.py --fake   # offline benchmark with a stub embedder
 """
+import argparse
+import asyncio
 import json
 import os
 import sys
@@ -20,17 +27,26 @@ sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."
 from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env"))
 
+import numpy as np
 import google.generativeai as genai
 from config import config
 from utils.chunker import chunk_all_documents
-
-# Configure Gemini
-genai.configure(api_key=config.GEMINI_API_KEY)
+from utils.embedding_pipeline import Checkpoint, FakeEmbedder, GeminiEmbedder, embed_texts, text_hash
+from utils.vector_index import IVFIndex, wants_ivf
+from utils.vector_store import (
+    DATA_DIR,
+    VECTOR_STORE_BASE,
+    ivf_index_path,
+    load_vector_store,
+    matrix_path_for,
+    save_vector_store,
+    store_exists,
+)
 
 # Paths
-DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
 DOCS_PATH = os.path.join(DATA_DIR, "docs.json")
-VECTOR_STORE_PATH = os.path.join(DATA_DIR, "vector_store.json")
+CHECKPOINT_PATH = os.path.join(DATA_DIR, "ingest_checkpoint.jsonl")
+FAKE_STORE_BASE = os.path.join(DATA_DIR, "vector_store_fake")
 
 
 def load_documents() -> list[dict]:
@@ -41,79 +57,195 @@ def load_documents() -> list[dict]:
     return docs
 
 
-def generate_embedding(text: str) -> list[float]:
-    """Generate embedding vector for a text using Gemini Embeddings API."""
-    result = genai.embed_content(
-        model=config.EMBEDDING_MODEL,
-        content=text,
-    )
-    return result["embedding"]
+def embedding_input(chunk: dict) -> str:
+    """Combine title + content for richer embeddings."""
+    return f"{chunk['title']}: {chunk['content']}"
+
+
+def document_hash(doc: dict) -> str:
+    """Content hash of a source document (title + body)."""
+    return text_hash(f"{doc['title']}\n{doc['content']}")
+
+
+def load_previous_store(base_path: str, model: str | None) -> tuple[dict[str, np.ndarray], dict[str, str]]:
+    """
+    Index the existing store for reuse.
+
+    Returns:
+        (embedding by chunk content hash, document hash by doc id) — both
+        empty when there is no store or it was built with another model
+    """
+    if not store_exists(base_path):
+        return {}, {}
+
+    matrix, meta = load_vector_store(base_path)
+    if meta.get("model") != model:
+        print(f"   ⚠️  Existing store was built with {meta.get('model')}; re-embedding everything")
+        return {}, {}
+
+    # Stores migrated from vector_store.json predate content hashes; derive them
+    reusable = {
+        chunk.get("content_hash") or text_hash(embedding_input(chunk)): np.array(matrix[row])
+        for row, chunk in enumerate(meta["chunks"])
+    }
+    return reusable, meta.get("doc_hashes", {})
+
+
+def diff_documents(documents: list[dict], previous_hashes: dict[str, str]) -> dict:
+    """Classify documents against the previous run as added / changed / unchanged / removed."""
+    report = {"added": [], "changed": [], "unchanged": [], "removed": []}
+    current_ids = set()
+    for doc in documents:
+        doc_id = str(doc["id"])
+        current_ids.add(doc_id)
+        previous = previous_hashes.get(doc_id)
+        if previous is None:
+            report["added"].append(doc_id)
+        elif previous != doc["content_hash"]:
+            report["changed"].append(doc_id)
+        else:
+            report["unchanged"].append(doc_id)
+    report["removed"] = sorted(set(previous_hashes) - current_ids)
+    return report
+
+
+def build_ann_index(embeddings: np.ndarray, meta: dict, base_path: str = VECTOR_STORE_BASE) -> None:
+    """Build and persist an IVF index next to the store when the config calls for one."""
+    index_path = ivf_index_path(base_path)
+    if not wants_ivf(meta["count"], config.VECTOR_INDEX):
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        return
+
+    print(f"\n🗂️  Building IVF index over {meta['count']} vectors...")
+    start = time.perf_counter()
+    index = IVFIndex.build(embeddings, meta["chunks"], nlist=config.IVF_NLIST, nprobe=config.IVF_NPROBE)
+    index.save(index_path, meta["version"])
+    print(f"   ✅ {index.nlist} clusters in {time.perf_counter() - start:.1f}s — saved to {index_path}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chunk and embed docs.json into the vector store")
+    parser.add_argument("--batch-size", type=int, default=config.INGEST_BATCH_SIZE, help="Texts per embedding request")
+    parser.add_argument("--concurrency", type=int, default=config.INGEST_MAX_CONCURRENCY, help="Max concurrent requests")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint from an interrupted run")
+    parser.add_argument("--full", action="store_true", help="Re-embed every chunk instead of reusing unchanged ones")
+    parser.add_argument("--report", help="Write the change report as JSON to this path")
+    parser.add_argument("--fake", action="store_true", help="Use an offline stub embedder (writes vector_store_fake.*)")
+    parser.add_argument("--fake-latency", type=float, default=0.2, help="Stub latency per batch request (s)")
+    parser.add_argument("--fake-429-rate", type=float, default=0.0, help="Stub probability of a simulated 429")
+    return parser.parse_args()
 
 
 def main():
     """Main ingestion pipeline."""
+    args = parse_args()
+
     print("=" * 60)
     print("🚀 RAG Ingestion Pipeline")
     print("=" * 60)
 
-    # Validate API key
-    config.validate()
+    if args.fake:
+        embedder = FakeEmbedder(latency=args.fake_latency, rate_limit_prob=args.fake_429_rate)
+        store_base = FAKE_STORE_BASE
+        checkpoint = Checkpoint(f"{CHECKPOINT_PATH}.fake")
+        model = None
+    else:
+        # Validate API key
+        config.validate()
+        genai.configure(api_key=config.GEMINI_API_KEY)
+        embedder = GeminiEmbedder(config.EMBEDDING_MODEL)
+        store_base = VECTOR_STORE_BASE
+        checkpoint = Checkpoint(CHECKPOINT_PATH)
+        model = config.EMBEDDING_MODEL
 
     # Step 1: Load documents
     documents = load_documents()
+    for doc in documents:
+        doc["content_hash"] = document_hash(doc)
 
     # Step 2: Chunk documents
     print(f"\n📐 Chunking documents (size={config.CHUNK_SIZE}, overlap={config.CHUNK_OVERLAP})...")
     chunks = chunk_all_documents(documents, config.CHUNK_SIZE, config.CHUNK_OVERLAP)
-
-    # Step 3: Generate embeddings for each chunk
-    print(f"\n🧠 Generating embeddings for {len(chunks)} chunks...")
-    print(f"   Using model: {config.EMBEDDING_MODEL}")
-
-    vector_store = []
-    for i, chunk in enumerate(chunks):
-        try:
-            # Combine title + content for richer embeddings
-            embed_text = f"{chunk['title']}: {chunk['content']}"
-            embedding = generate_embedding(embed_text)
-
-            vector_entry = {
-                "id": chunk["id"],
-                "doc_id": chunk["doc_id"],
-                "title": chunk["title"],
-                "content": chunk["content"],
-                "chunk_index": chunk["chunk_index"],
-                "total_chunks": chunk["total_chunks"],
-                "word_count": chunk["word_count"],
-                "embedding": embedding,
-            }
-            vector_store.append(vector_entry)
-
-            print(f"   ✅ [{i + 1}/{len(chunks)}] {chunk['id']} — {chunk['word_count']} words — {len(embedding)}d vector")
-
-            # Small delay to avoid API rate limits
-            time.sleep(0.3)
-
-        except Exception as e:
-            print(f"   ❌ [{i + 1}/{len(chunks)}] Failed: {chunk['id']} — {e}")
-
-    # Step 4: Save to vector_store.json
-    print(f"\n💾 Saving {len(vector_store)} vectors to vector_store.json...")
-    with open(VECTOR_STORE_PATH, "w") as f:
-        json.dump(vector_store, f, indent=2)
+    for chunk in chunks:
+        chunk["content_hash"] = text_hash(embedding_input(chunk))
+
+    # Step 3: Reuse embeddings of unchanged chunks
+    reusable, previous_doc_hashes = ({}, {}) if args.full else load_previous_store(store_base, model)
+    report = diff_documents(documents, previous_doc_hashes)
+    embeddings_by_id = {
+        chunk["id"]: reusable[chunk["content_hash"]]
+        for chunk in chunks
+        if chunk["content_hash"] in reusable
+    }
+    to_embed = [chunk for chunk in chunks if chunk["id"] not in embeddings_by_id]
+    report["chunks_reused"] = len(embeddings_by_id)
+    report["chunks_embedded"] = len(to_embed)
+
+    print("\n🔎 Changes since last ingestion:")
+    for key in ("added", "changed", "removed", "unchanged"):
+        ids = report[key]
+        preview = f" ({', '.join(ids[:10])}{', …' if len(ids) > 10 else ''})" if ids and key != "unchanged" else ""
+        print(f"   {key.capitalize():<10} {len(ids)} document(s){preview}")
+    print(f"   Chunks:    {len(to_embed)} to embed, {len(embeddings_by_id)} reused")
+
+    # Step 4: Generate embeddings in concurrent batches
+    print(f"\n🧠 Generating embeddings for {len(to_embed)} chunks...")
+    print(f"   Using model: {'fake' if args.fake else config.EMBEDDING_MODEL}")
+    print(f"   Batch size: {args.batch_size}, max concurrency: {args.concurrency}")
+
+    if args.restart:
+        checkpoint.remove()
+    resumed = checkpoint.load()
+    if resumed:
+        print(f"   ♻️  Resuming — {resumed} embeddings recovered from checkpoint")
+
+    def on_batch(done: int, total: int, batch_ids: list[str]) -> None:
+        print(f"   ✅ [{done}/{total}] {batch_ids[0]} … {batch_ids[-1]}")
+
+    new_embeddings, failed = asyncio.run(embed_texts(
+        [(chunk["id"], embedding_input(chunk)) for chunk in to_embed],
+        embedder,
+        batch_size=args.batch_size,
+        max_concurrency=args.concurrency,
+        checkpoint=checkpoint,
+        on_batch=on_batch,
+    ))
+
+    if failed:
+        print(f"\n❌ {len(failed)} chunks failed to embed. Re-run to resume from the checkpoint.")
+        sys.exit(1)
+
+    embeddings_by_id.update(new_embeddings)
+    vector_store = [chunk for chunk in chunks if chunk["id"] in embeddings_by_id]
+    doc_hashes = {str(doc["id"]): doc["content_hash"] for doc in documents}
+
+    # Step 5: Save to the binary vector store
+    print(f"\n💾 Saving {len(vector_store)} vectors to the vector store...")
+    embeddings = np.array([embeddings_by_id[chunk["id"]] for chunk in vector_store], dtype=np.float32)
+    meta = save_vector_store(embeddings, vector_store, store_base, model=model, doc_hashes=doc_hashes)
+    matrix_path = matrix_path_for(store_base, meta)
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({**report, "version": meta["version"]}, f, indent=2)
+
+    # Step 6: Build the ANN index for large corpora
+    build_ann_index(embeddings, meta, store_base)
+
+    checkpoint.remove()
 
     # Summary
     print("\n" + "=" * 60)
     print("✅ Ingestion Complete!")
     print(f"   📄 Documents:  {len(documents)}")
     print(f"   📐 Chunks:     {len(chunks)}")
-    print(f"   🧠 Embeddings: {len(vector_store)}")
-    print(f"   💾 Saved to:   {VECTOR_STORE_PATH}")
-    embedding_dim = len(vector_store[0]["embedding"]) if vector_store else 0
-    print(f"   📏 Dimensions: {embedding_dim}")
+    print(f"   🧠 Embeddings: {len(vector_store)} ({report['chunks_embedded']} new, {report['chunks_reused']} reused)")
+    print(f"   💾 Saved to:   {matrix_path}")
+    print(f"   📏 Dimensions: {meta['dim']}")
+    print(f"   🏷️  Version:    {meta['version']}")
     print("=" * 60)
 
 
 if __name__ == "__main__":
     main()
-
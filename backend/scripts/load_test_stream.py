@@ -0,0 +1,113 @@
+"""
+Load Test Script — concurrent /api/chat/stream throughput.
+
+This script:
+1. Opens N concurrent SSE streams against a running backend
+2. Records time-to-first-chunk and total time for every stream
+3. Reports streams/s plus p50/p95/p99 latencies
+
+Run it once against a build before a change and once after to compare.
+Unique session ids and (by default) unique questions keep caches out of the
+measurement; pass --same-message to measure the cached path instead.
+
+Run: python scripts/load_test_stream.py [--url http://localhost:8000] [--concurrency 20] [--requests 100]
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import numpy as np
+
+QUESTIONS = [
+    "How do I reset my password?",
+    "How do I invite team members?",
+    "What payment methods do you accept?",
+    "How do I enable two-factor authentication?",
+    "Can I export my project data?",
+]
+
+
+async def stream_once(host: str, port: int, message: str) -> dict:
+    """POST one chat message and read the SSE response to the end."""
+    body = json.dumps({"sessionId": str(uuid.uuid4()), "message": message}).encode("utf-8")
+    request = (
+        f"POST /api/chat/stream HTTP/1.1\r\n"
+        f"Host: {host}:{port}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n"
+    ).encode("utf-8") + body
+
+    start = time.perf_counter()
+    first_chunk = None
+    ok = False
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(request)
+        await writer.drain()
+        async for line in reader:
+            if line.startswith(b"data: "):
+                payload = line[6:].strip()
+                if payload == b"[DONE]":
+                    ok = True
+                    continue
+                event = json.loads(payload)
+                if event.get("type") == "chunk" and first_chunk is None:
+                    first_chunk = time.perf_counter() - start
+                elif event.get("type") == "error":
+                    break
+    finally:
+        writer.close()
+
+    return {"ok": ok, "ttfc": first_chunk, "total": time.perf_counter() - start}
+
+
+async def run(url: str, concurrency: int, total: int, same_message: bool) -> None:
+    """Drive `total` streams with at most `concurrency` open at a time."""
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(i: int) -> dict:
+        message = QUESTIONS[0] if same_message else f"{QUESTIONS[i % len(QUESTIONS)]} (#{i})"
+        async with semaphore:
+            try:
+                return await stream_once(host, port, message)
+            except Exception as e:
+                return {"ok": False, "ttfc": None, "total": 0.0, "error": str(e)}
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(worker(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+
+    succeeded = [r for r in results if r["ok"]]
+    ttfc = np.array([r["ttfc"] for r in succeeded if r["ttfc"] is not None]) * 1000
+    totals = np.array([r["total"] for r in succeeded]) * 1000
+
+    print("=" * 60)
+    print(f"📈 {len(succeeded)}/{total} streams OK in {elapsed:.1f}s — {len(succeeded) / elapsed:.2f} streams/s")
+    print(f"   concurrency={concurrency}")
+    for label, values in (("first chunk", ttfc), ("total", totals)):
+        if len(values):
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            print(f"   {label:<12} p50={p50:.0f}ms  p95={p95:.0f}ms  p99={p99:.0f}ms")
+    print("=" * 60)
+
+
+def main():
+    """Parse arguments and run the load test."""
+    parser = argparse.ArgumentParser(description="Concurrent SSE load test for /api/chat/stream")
+    parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL")
+    parser.add_argument("--concurrency", type=int, default=20, help="Streams open at once")
+    parser.add_argument("--requests", type=int, default=100, help="Total streams")
+    parser.add_argument("--same-message", action="store_true", help="Send the same question every time")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.url, args.concurrency, args.requests, args.same_message))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Answer Cache — semantic response cache for repeated first-turn questions.
+
+An entry is reused when a new question:
+1. Retrieved exactly the same set of documentation chunks, and
+2. Has a query embedding within ANSWER_CACHE_THRESHOLD cosine similarity
+   of the cached question.
+
+Entries expire after a TTL, are evicted LRU beyond a size cap, and are
+dropped wholesale when a different vector store version is loaded.
+"""
+import time
+from collections import OrderedDict
+from itertools import count
+from threading import Lock
+
+import numpy as np
+
+from config import config
+from utils.vector_math import normalize_vector
+
+
+class AnswerCache:
+    """Embedding-similarity cache of generated answers, bucketed by retrieved chunk set."""
+
+    def __init__(self, max_size: int = 512, ttl: float = 3600, threshold: float = 0.95):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.store_version: str | None = None
+        # entry_id -> (chunk_key, embedding, payload, expires_at), in LRU order
+        self._entries: OrderedDict = OrderedDict()
+        # chunk_key -> set of entry ids
+        self._buckets: dict[tuple, set] = {}
+        self._ids = count()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def chunk_key(docs_used: list[dict]) -> tuple:
+        """Order-independent key for a retrieval result."""
+        return tuple(sorted(doc["chunk_id"] for doc in docs_used))
+
+    def _remove(self, entry_id: int) -> None:
+        chunk_key = self._entries.pop(entry_id)[0]
+        bucket = self._buckets.get(chunk_key)
+        if bucket is not None:
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[chunk_key]
+
+    def lookup(self, query_embedding, docs_used: list[dict]) -> dict | None:
+        """
+        Find a cached answer for a semantically equivalent question.
+
+        Returns:
+            The stored payload (reply, docs_used, ...) or None
+        """
+        chunk_key = self.chunk_key(docs_used)
+        query = normalize_vector(query_embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._buckets.get(chunk_key, ())):
+                _, embedding, _, expires_at = self._entries[entry_id]
+                if expires_at <= now:
+                    self._remove(entry_id)
+                    continue
+                score = float(embedding @ query)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][2]
+
+    def store(self, query_embedding, docs_used: list[dict], payload: dict) -> None:
+        """Cache a generated answer for the given question embedding and chunk set."""
+        chunk_key = self.chunk_key(docs_used)
+        embedding = normalize_vector(query_embedding)
+
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (chunk_key, embedding, payload, time.monotonic() + self.ttl)
+            self._buckets.setdefault(chunk_key, set()).add(entry_id)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, store_version: str | None = None) -> None:
+        """Drop every entry; called when the vector store is (re)loaded."""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._buckets.clear()
+            self.store_version = store_version
+
+    def stats(self) -> dict:
+        """Size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": config.ANSWER_CACHE_ENABLED,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "store_version": self.store_version,
+        }
+
+
+def split_for_replay(text: str, words_per_chunk: int = 8) -> list[str]:
+    """Split a cached answer into stream-sized pieces (whitespace preserved)."""
+    pieces, current, words = [], "", 0
+    for token in text.split(" "):
+        current += token + " "
+        words += 1
+        if words >= words_per_chunk:
+            pieces.append(current)
+            current, words = "", 0
+    if current:
+        pieces.append(current)
+    if pieces:
+        pieces[-1] = pieces[-1][:-1]  # drop the trailing space added above
+    return pieces
+
+
+# Singleton instance
+answer_cache = AnswerCache(
+    max_size=config.ANSWER_CACHE_SIZE,
+    ttl=config.ANSWER_CACHE_TTL,
+    threshold=config.ANSWER_CACHE_THRESHOLD,
+)
@@ -2,59 +2,172 @@
 Chat Service — orchestrates session management, RAG retrieval, and LLM calls.
 """
 import asyncio
-from db import queries
+from contextlib import aclosing
+from db import async_queries as queries
 from services.rag_service import rag_service
+from services.embedding_cache import normalize_query
+from services.answer_cache import answer_cache, split_for_replay
 from services.llm_service import llm_service
+from services.title_service import title_service
 from config import config
+from utils.admission import PRIORITY_ACTIVE, PRIORITY_NEW, AdmissionController, Slot
+from utils.pipeline import Stage, run_stages
+from utils.singleflight import BroadcastGroup, SingleFlight
+from utils.timing import StageTimer
 
 
 class ChatService:
     """Business logic orchestrator for the chat pipeline."""
 
+    def __init__(self):
+        # Identical concurrent first-turn questions share one generation
+        self._responses = SingleFlight()
+        self._streams = BroadcastGroup()
+        self.admission = AdmissionController(
+            config.ADMISSION_MAX_CONCURRENCY, config.ADMISSION_MAX_QUEUE, config.ADMISSION_MAX_WAIT
+        )
+
+    # Admission control
+
+    async def admit(self, session_id: str) -> Slot | None:
+        """
+        Wait for a chat slot; sessions with earlier messages go first.
+
+        Returns:
+            Slot to release once the turn is done, or None when admission control is off
+
+        Raises:
+            AdmissionRejected: the turn was shed (queue full or wait past its deadline)
+        """
+        if not config.ADMISSION_ENABLED:
+            return None
+        session = await queries.get_session_by_id(session_id)
+        priority = PRIORITY_ACTIVE if session and session["message_count"] else PRIORITY_NEW
+        return await self.admission.acquire(priority)
+
+    # Turn preparation (shared by both paths)
+
+    async def _load_history(self, session_id: str, user_message: str) -> list[dict]:
+        """
+        Conversation history for the prompt, ending with the new user message.
+
+        Read before the new message is stored (so it can run concurrently
+        with retrieval); the new message is appended locally instead.
+        """
+        limit = config.MAX_HISTORY_PAIRS
+        previous = await queries.get_recent_message_pairs(session_id, limit)
+        previous = previous[-(limit * 2 - 1):] if limit > 0 else []
+        return previous + [{"role": "user", "content": user_message}]
+
+    def _turn_stages(self, session_id: str, user_message: str) -> list[Stage]:
+        """
+        Dependency graph for preparing a turn:
+
+            session ──┐
+            history ──┴──▶ user_message
+            rag (embedding → retrieval)
+
+        Retrieval (network-bound) overlaps the DB work; generation starts
+        once every stage has finished.
+        """
+        return [
+            Stage("session", lambda _: queries.create_session(session_id)),
+            Stage("history", lambda _: self._load_history(session_id, user_message)),
+            Stage(
+                "user_message",
+                lambda _: queries.insert_message(session_id, "user", user_message),
+                after=("session", "history"),
+            ),
+            Stage("rag", lambda _: rag_service.search(user_message)),
+        ]
+
+    async def _prepare_turn(self, session_id: str, user_message: str, results: dict, timer: StageTimer):
+        """
+        Run the preparation stages concurrently, yielding status events as they complete.
+
+        When exhausted, `results` holds 'rag' and 'history'.
+        """
+        yield {"type": "status", "stage": "session", "message": "Initializing session...", "timings": timer.snapshot()}
+        yield {"type": "status", "stage": "searching", "message": "🔍 Searching documentation...", "timings": timer.snapshot()}
+
+        async for stage in run_stages(self._turn_stages(session_id, user_message), results, timer):
+            if stage == "rag":
+                rag_result = results["rag"]
+                timer.update(rag_result["timings"])
+                if rag_result["has_relevant_docs"]:
+                    message = f"📄 Found {len(rag_result['docs_used'])} relevant document(s)"
+                else:
+                    message = "📄 No specific documentation match found"
+                yield {"type": "status", "stage": "docs_found", "message": message, "timings": timer.snapshot()}
+            elif stage == "history":
+                yield {"type": "status", "stage": "analyzing", "message": "🧠 Analyzing conversation context...", "timings": timer.snapshot()}
+
+        yield {"type": "status", "stage": "generating", "message": "✍️ Generating response...", "timings": timer.snapshot()}
+
+    async def _finish_turn(self, session_id: str, user_message: str, reply: str, usage: dict | None):
+        """
+        Store the assistant reply and queue a title for untitled sessions.
+
+        Returns:
+            Future resolving to the new title, or None if the session has one
+        """
+        tokens_used = usage["total_tokens"] if usage else 0
+        await queries.insert_message(session_id, "assistant", reply, tokens_used, usage)
+
+        if await queries.has_title(session_id):
+            return None
+        return title_service.submit(session_id, user_message, reply)
+
+    # Entry points
+
     async def process_message(self, session_id: str, user_message: str) -> dict:
         """
         Process a chat message (non-streaming).
 
         Pipeline:
-        1. Ensure session exists
-        2. Store user message
-        3. RAG similarity search
-        4. Get conversation history
-        5. Generate LLM response
-        6. Store assistant response
-        7. Generate session title (first message only)
-        """
-        # Session + store user message
-        queries.create_session(session_id)
-        queries.insert_message(session_id, "user", user_message)
-
-        # RAG retrieval
-        rag_result = await rag_service.search(user_message)
-
-        # Conversation history
-        history = queries.get_recent_message_pairs(session_id, config.MAX_HISTORY_PAIRS)
-
-        # LLM generation
-        llm_result = await llm_service.generate_response(
-            user_message, rag_result["context"], history
-        )
+        1. Concurrently: ensure session + load history → store user message,
+           and RAG similarity search
+        2. Generate LLM response (or reuse a cached answer on first turn)
+        3. Store assistant response
+        4. Queue session title generation (first message only; see /api/sessions)
+        """
+        timer = StageTimer()
+        results: dict = {}
+        async for _ in self._prepare_turn(session_id, user_message, results, timer):
+            pass
+        rag_result, history = results["rag"], results["history"]
 
-        # Store response
-        queries.insert_message(session_id, "assistant", llm_result["reply"], llm_result["tokens_used"])
+        # Semantic answer cache, else LLM generation
+        cached = self._lookup_cached_answer(rag_result, history)
+        coalesced = False
+        if cached:
+            llm_result = {"reply": cached["reply"], "tokens_used": 0, "usage": None}
+        else:
+            key = self._generation_key(user_message, rag_result, history)
+            with timer.stage("generation"):
+                if key is None:
+                    llm_result = await self._generate(user_message, rag_result, history)
+                else:
+                    coalesced = self._responses.in_flight(key)
+                    llm_result = await self._responses.do(
+                        key, lambda: self._generate(user_message, rag_result, history)
+                    )
+            if coalesced:
+                # The tokens were spent (and recorded) by the first request
+                llm_result = {"reply": llm_result["reply"], "tokens_used": 0, "usage": None}
 
-        # Generate title for first message
-        title = None
-        if not queries.has_title(session_id):
-            title = await llm_service.generate_title(user_message, llm_result["reply"])
-            queries.update_session_title(session_id, title)
+        await self._finish_turn(session_id, user_message, llm_result["reply"], llm_result["usage"])
 
         return {
             "reply": llm_result["reply"],
             "tokens_used": llm_result["tokens_used"],
+            "usage": llm_result["usage"],
             "docs_used": rag_result["docs_used"],
             "has_relevant_docs": rag_result["has_relevant_docs"],
             "retrieved_chunks": len(rag_result["docs_used"]),
-            "title": title,
+            "cached": cached is not None,
+            "coalesced": coalesced,
+            "timings": {**timer.snapshot(), "total_ms": timer.elapsed_ms()},
         }
 
     async def process_message_stream(self, session_id: str, user_message: str):
@@ -62,106 +175,163 @@ class ChatService:
         Process a chat message with streaming + live status updates.
 
         Yields SSE events:
-        - status: Pipeline stage updates
+        - status: Pipeline stage updates (with measured stage timings)
         - chunk: Response text chunks
         - complete: Final metadata
+        - title: Session title, sent after 'complete' for new sessions
         - error: Error information
         """
-        # Stage 1: Initialize session
-        yield {"type": "status", "stage": "session", "message": "Initializing session..."}
-        queries.create_session(session_id)
-        queries.insert_message(session_id, "user", user_message)
-
-        # Stage 2: RAG search
-        yield {"type": "status", "stage": "searching", "message": "🔍 Searching documentation..."}
-        await asyncio.sleep(0.3)
+        timer = StageTimer()
+        results: dict = {}
+        async for event in self._prepare_turn(session_id, user_message, results, timer):
+            yield event
+        rag_result, history = results["rag"], results["history"]
 
-        rag_result = await rag_service.search(user_message)
+        full_response = ""
+        usage = None
+        coalesced = False
 
-        if rag_result["has_relevant_docs"]:
-            yield {
-                "type": "status",
-                "stage": "docs_found",
-                "message": f"📄 Found {len(rag_result['docs_used'])} relevant document(s)",
-            }
+        cached = self._lookup_cached_answer(rag_result, history)
+        if cached:
+            # Replay the stored answer as stream chunks — no LLM call
+            for piece in split_for_replay(cached["reply"]):
+                timer.mark("ttft")
+                full_response += piece
+                yield {"type": "chunk", "content": piece}
         else:
-            yield {
-                "type": "status",
-                "stage": "docs_found",
-                "message": "📄 No specific documentation match found",
-            }
+            key = self._generation_key(user_message, rag_result, history)
+            if key is None:
+                events = self._generate_stream(user_message, rag_result, history)
+            else:
+                # Subscribers of an in-flight identical generation get its events, buffered ones first
+                events, started = self._streams.subscribe(
+                    key, lambda: self._generate_stream(user_message, rag_result, history)
+                )
+                coalesced = not started
+            async with aclosing(events):
+                async for event in events:
+                    if event["type"] == "chunk":
+                        timer.mark("ttft")
+                        full_response += event["content"]
+                        yield {"type": "chunk", "content": event["content"]}
+                    elif event["type"] == "complete":
+                        usage = None if coalesced else event.get("usage")
+                    elif event["type"] == "error":
+                        yield {"type": "error", "error": event["error"]}
+                        return
 
-        # Stage 3: Context analysis
-        yield {"type": "status", "stage": "analyzing", "message": "🧠 Analyzing conversation context..."}
-        await asyncio.sleep(0.2)
-        history = queries.get_recent_message_pairs(session_id, config.MAX_HISTORY_PAIRS)
+        pending_title = await self._finish_turn(session_id, user_message, full_response, usage)
 
-        # Stage 4: Generate streaming response
-        yield {"type": "status", "stage": "generating", "message": "✍️ Generating response..."}
-        await asyncio.sleep(0.15)
+        yield {
+            "type": "complete",
+            "tokens_used": usage["total_tokens"] if usage else 0,
+            "usage": usage,
+            "docs_used": rag_result["docs_used"],
+            "has_relevant_docs": rag_result["has_relevant_docs"],
+            "retrieved_chunks": len(rag_result["docs_used"]),
+            "cached": cached is not None,
+            "coalesced": coalesced,
+            "timings": {**timer.snapshot(), "total_ms": timer.elapsed_ms()},
+        }
 
-        full_response = ""
-        tokens_used = 0
+        # Title is generated in the background; forward it if it lands soon
+        if pending_title is not None:
+            try:
+                title = await asyncio.wait_for(asyncio.shield(pending_title), config.TITLE_EVENT_WAIT)
+            except asyncio.TimeoutError:
+                title = None
+            if title:
+                yield {"type": "title", "title": title}
+
+    # Generation (optionally shared between identical requests)
 
-        async for event in llm_service.generate_stream_response(
-            user_message, rag_result["context"], history
-        ):
+    @staticmethod
+    def _generation_key(user_message: str, rag_result: dict, history: list[dict]) -> tuple | None:
+        """
+        Key under which identical concurrent generations are coalesced.
+
+        Only first-turn questions qualify: same normalized text, same
+        retrieved chunks, same vector store. None means do not coalesce.
+        """
+        if not config.COALESCING_ENABLED or len(history) > 1:
+            return None
+        chunk_ids = tuple(doc["chunk_id"] for doc in rag_result["docs_used"])
+        return (normalize_query(user_message), chunk_ids, rag_service.store_version)
+
+    async def _generate(self, user_message: str, rag_result: dict, history: list[dict]) -> dict:
+        llm_result = await llm_service.generate_response(user_message, rag_result["chunks"], history)
+        self._store_cached_answer(rag_result, history, llm_result["reply"])
+        return llm_result
+
+    async def _generate_stream(self, user_message: str, rag_result: dict, history: list[dict]):
+        reply = ""
+        async for event in llm_service.generate_stream_response(user_message, rag_result["chunks"], history):
             if event["type"] == "chunk":
-                full_response += event["content"]
-                yield {"type": "chunk", "content": event["content"]}
-            elif event["type"] == "complete":
-                tokens_used = event.get("tokens_used", 0)
-            elif event["type"] == "error":
-                yield {"type": "error", "error": event["error"]}
+                reply += event["content"]
+            yield event
+            if event["type"] == "error":
                 return
+        self._store_cached_answer(rag_result, history, reply)
 
-        # Store response in DB
-        queries.insert_message(session_id, "assistant", full_response, tokens_used)
+    def coalescing_stats(self) -> dict:
+        """Shared generations for /metrics."""
+        return {"responses": self._responses.stats(), "streams": self._streams.stats()}
 
-        # Generate title (first message only)
-        title = None
-        if not queries.has_title(session_id):
-            try:
-                title = await llm_service.generate_title(user_message, full_response)
-                queries.update_session_title(session_id, title)
-            except Exception:
-                pass  # Non-critical
+    # Semantic answer cache
 
-        yield {
-            "type": "complete",
-            "tokens_used": tokens_used,
-            "docs_used": rag_result["docs_used"],
-            "has_relevant_docs": rag_result["has_relevant_docs"],
-            "retrieved_chunks": len(rag_result["docs_used"]),
-            "title": title,
-        }
+    @staticmethod
+    def _is_cacheable(rag_result: dict, history: list[dict]) -> bool:
+        """Only history-free turns are cacheable (history already holds the new user message)."""
+        return (
+            config.ANSWER_CACHE_ENABLED
+            and rag_result.get("query_embedding") is not None
+            and len(history) <= 1
+        )
+
+    def _lookup_cached_answer(self, rag_result: dict, history: list[dict]) -> dict | None:
+        """Return a cached answer for an equivalent first-turn question, if any."""
+        if not self._is_cacheable(rag_result, history):
+            return None
+        return answer_cache.lookup(rag_result["query_embedding"], rag_result["docs_used"])
+
+    def _store_cached_answer(self, rag_result: dict, history: list[dict], reply: str) -> None:
+        """Remember a freshly generated first-turn answer."""
+        if reply and self._is_cacheable(rag_result, history):
+            answer_cache.store(rag_result["query_embedding"], rag_result["docs_used"], {"reply": reply})
+
+    async def get_conversation(self, session_id: str, limit: int, before_id: int | None = None) -> dict | None:
+        """Get a page of a session's messages ('session', 'messages', 'next_before_id')."""
+        session = await queries.get_session_by_id(session_id)
+        if not session:
+            return None
+        page = await queries.get_messages_page(session_id, limit, before_id)
+        return {"session": session, **page}
 
-    def get_conversation(self, session_id: str) -> dict | None:
-        """Get all messages for a session."""
-        session = queries.get_session_by_id(session_id)
+    async def stream_conversation(self, session_id: str):
+        """Async iterator over all of a session's messages, or None if it does not exist."""
+        session = await queries.get_session_by_id(session_id)
         if not session:
             return None
-        messages = queries.get_messages_by_session(session_id)
-        return {"session": session, "messages": messages}
+        return queries.iter_messages(session_id, config.CONVERSATION_STREAM_BATCH)
 
-    def get_all_sessions(self) -> list[dict]:
-        """Get all sessions."""
-        return queries.get_all_sessions()
+    async def get_sessions(self, limit: int, cursor: str | None = None) -> dict:
+        """Get a page of sessions ('sessions', 'next_cursor')."""
+        return await queries.get_sessions(limit, cursor)
 
-    def delete_session(self, session_id: str) -> bool:
+    async def delete_session(self, session_id: str) -> bool:
         """Delete a session and all its messages."""
-        session = queries.get_session_by_id(session_id)
+        session = await queries.get_session_by_id(session_id)
         if not session:
             return False
-        queries.delete_session(session_id)
+        await queries.delete_session(session_id)
         return True
 
-    def clear_conversation(self, session_id: str) -> bool:
+    async def clear_conversation(self, session_id: str) -> bool:
         """Clear all messages from a session (keep the session)."""
-        session = queries.get_session_by_id(session_id)
+        session = await queries.get_session_by_id(session_id)
         if not session:
             return False
-        queries.clear_messages(session_id)
+        await queries.clear_messages(session_id)
         return True
 
 
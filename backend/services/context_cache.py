@@ -0,0 +1,285 @@
+"""
+Context Cache — provider-side cached content for the static prompt prefix.
+
+The grounding rules and the most frequently retrieved documentation chunks
+are stored once as Gemini cached content, so each request only sends what
+is not cached. A background loop creates the cache, extends its TTL before
+expiry, rebuilds it when the vector store or the hot chunk set changes,
+and deletes it on shutdown. Whenever caching is unavailable, requests fall
+back to full prompts on the plain model.
+
+The provider is pluggable: GeminiCacheProvider for real runs,
+FakeCacheProvider for offline tests.
+"""
+import asyncio
+import time
+from collections import Counter
+from datetime import timedelta
+
+from config import config
+from services.prompt_builder import SYSTEM_RULES, cached_documents, estimate_tokens
+
+# Cached input tokens are billed at roughly a quarter of the normal rate
+CACHED_TOKEN_DISCOUNT = 0.75
+
+
+# Providers
+
+class GeminiCacheProvider:
+    """Cached content through google.generativeai.caching (blocking calls run in a thread)."""
+
+    def __init__(self, model_name: str, generation_config: dict):
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    async def create(self, system_instruction: str, contents: list[str], ttl: float):
+        from google.generativeai import caching
+
+        return await asyncio.to_thread(
+            caching.CachedContent.create,
+            model=self.model_name,
+            display_name="ovi-assistai-prompt-prefix",
+            system_instruction=system_instruction,
+            contents=contents,
+            ttl=timedelta(seconds=ttl),
+        )
+
+    async def refresh(self, handle, ttl: float) -> None:
+        await asyncio.to_thread(handle.update, ttl=timedelta(seconds=ttl))
+
+    async def delete(self, handle) -> None:
+        await asyncio.to_thread(handle.delete)
+
+    def model_for(self, handle):
+        import google.generativeai as genai
+
+        return genai.GenerativeModel.from_cached_content(handle, generation_config=self.generation_config)
+
+
+class FakeCacheProvider:
+    """
+    Offline stand-in for the caching API.
+
+    Records lifecycle calls; `fail=True` makes every call raise so the
+    fallback path can be exercised. `model_for` returns the given model.
+    """
+
+    def __init__(self, model=None, fail: bool = False):
+        self.model = model
+        self.fail = fail
+        self.created: list[dict] = []
+        self.refreshed = 0
+        self.deleted = 0
+
+    def _check(self) -> None:
+        if self.fail:
+            raise RuntimeError("Context caching unavailable (simulated)")
+
+    async def create(self, system_instruction: str, contents: list[str], ttl: float):
+        self._check()
+        handle = {
+            "name": f"cachedContents/fake-{len(self.created)}",
+            "system_instruction": system_instruction,
+            "contents": contents,
+            "ttl": ttl,
+        }
+        self.created.append(handle)
+        return handle
+
+    async def refresh(self, handle, ttl: float) -> None:
+        self._check()
+        self.refreshed += 1
+
+    async def delete(self, handle) -> None:
+        self.deleted += 1
+
+    def model_for(self, handle):
+        return self.model
+
+
+# Cache lifecycle
+
+class ActiveCache:
+    """What a request needs: the model bound to the cache and the chunk ids inside it."""
+
+    def __init__(self, name: str, model, chunk_ids: frozenset):
+        self.name = name
+        self.model = model
+        self.chunk_ids = chunk_ids
+
+
+class ContextCache:
+    """Lifecycle and savings accounting of the cached prompt prefix."""
+
+    def __init__(self, provider=None):
+        self.provider = provider
+        self._handle = None
+        self._active: ActiveCache | None = None
+        self._store_version = None
+        self._expires_at = 0.0
+        self._retry_at = 0.0
+        self._lock = asyncio.Lock()
+        self._rebuild_task: asyncio.Task | None = None
+        self._retrievals: Counter = Counter()
+        self.creates = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.invalidations = 0
+        self.requests_cached = 0
+        self.requests_uncached = 0
+        self.cached_tokens = 0
+        self.prompt_tokens = 0
+
+    # Request path
+
+    def note_retrieval(self, chunks: list[dict]) -> None:
+        """Count retrieved chunks; the most frequent ones are cached next rebuild."""
+        self._retrievals.update(chunk["id"] for chunk in chunks)
+
+    def active(self) -> ActiveCache | None:
+        """The usable cache, or None to send full prompts."""
+        if self._active is None or time.monotonic() >= self._expires_at:
+            return None
+        from services.rag_service import rag_service
+
+        if self._store_version != rag_service.store_version:
+            # Built from the store before a hot reload; rebuild now rather than next cycle
+            self._schedule_rebuild()
+            return None
+        return self._active
+
+    def _schedule_rebuild(self) -> None:
+        if self._rebuild_task is not None and not self._rebuild_task.done():
+            return
+        try:
+            self._rebuild_task = asyncio.get_running_loop().create_task(self.ensure())
+        except RuntimeError:
+            pass   # no event loop (scripts); the maintenance loop rebuilds
+
+    def invalidate(self, reason: str) -> None:
+        """Stop using the cache (e.g. the provider no longer knows it); rebuilt next cycle."""
+        if self._active is None:
+            return
+        print(f"⚠️  Context cache dropped: {reason}")
+        self.invalidations += 1
+        self._active = None
+        self._expires_at = 0.0
+
+    def record_usage(self, usage, cached: bool) -> None:
+        """Account Gemini's prompt and cached-content token counts for one call."""
+        if cached:
+            self.requests_cached += 1
+        else:
+            self.requests_uncached += 1
+        if usage is not None:
+            self.prompt_tokens += getattr(usage, "prompt_token_count", 0) or 0
+            self.cached_tokens += getattr(usage, "cached_content_token_count", 0) or 0
+
+    # Maintenance
+
+    def _hot_chunks(self, snapshot_chunks: list[dict]) -> list[dict]:
+        """Most frequently retrieved chunks of the current store (corpus order)."""
+        by_id = {chunk["id"]: chunk for chunk in snapshot_chunks}
+        hot_ids = {
+            chunk_id
+            for chunk_id, _ in self._retrievals.most_common(config.CONTEXT_CACHE_HOT_CHUNKS)
+            if chunk_id in by_id
+        }
+        return [chunk for chunk in snapshot_chunks if chunk["id"] in hot_ids]
+
+    async def ensure(self) -> None:
+        """Create, refresh or rebuild the cache as needed; never raises."""
+        if not config.CONTEXT_CACHE_ENABLED or self.provider is None:
+            return
+        from services.rag_service import rag_service
+
+        async with self._lock:
+            now = time.monotonic()
+            if now < self._retry_at:
+                return
+
+            version = rag_service.store_version
+            expiring = self._expires_at - now < config.CONTEXT_CACHE_REFRESH_MARGIN
+            if self._active is not None and version == self._store_version and not expiring:
+                return
+
+            hot = self._hot_chunks(rag_service.chunks)
+            hot_ids = frozenset(chunk["id"] for chunk in hot)
+            try:
+                if self._active is not None and version == self._store_version and hot_ids == self._active.chunk_ids:
+                    await self.provider.refresh(self._handle, config.CONTEXT_CACHE_TTL)
+                    self.refreshes += 1
+                    self._expires_at = now + config.CONTEXT_CACHE_TTL
+                    return
+                await self._rebuild(hot, hot_ids, version, now)
+            except Exception as e:
+                self.failures += 1
+                self._retry_at = now + config.CONTEXT_CACHE_RETRY
+                print(f"⚠️  Context cache unavailable, using full prompts: {e}")
+                if version != self._store_version:
+                    self._active = None   # stale documentation must not be served
+
+    async def _rebuild(self, hot: list[dict], hot_ids: frozenset, version: str | None, now: float) -> None:
+        contents = [cached_documents(hot)] if hot else []
+        size = estimate_tokens(SYSTEM_RULES) + sum(estimate_tokens(text) for text in contents)
+        if size < config.CONTEXT_CACHE_MIN_TOKENS:
+            # Below the provider minimum; wait for more retrievals
+            await self._drop()
+            return
+
+        handle = await self.provider.create(SYSTEM_RULES, contents, config.CONTEXT_CACHE_TTL)
+        name = getattr(handle, "name", None) or handle["name"]
+        previous = self._handle
+        self._handle = handle
+        self._active = ActiveCache(name, self.provider.model_for(handle), hot_ids)
+        self._store_version = version
+        self._expires_at = now + config.CONTEXT_CACHE_TTL
+        self.creates += 1
+        print(f"🗃️  Context cache {name}: rules + {len(hot)} chunk(s), ~{size} tokens")
+        if previous is not None:
+            await self._delete(previous)
+
+    async def _drop(self) -> None:
+        previous, self._handle, self._active = self._handle, None, None
+        if previous is not None:
+            await self._delete(previous)
+
+    async def _delete(self, handle) -> None:
+        try:
+            await self.provider.delete(handle)
+        except Exception as e:
+            print(f"⚠️  Could not delete cached content: {e}")
+
+    async def run(self, interval: float) -> None:
+        """Background maintenance loop (started from the app lifespan)."""
+        while True:
+            await self.ensure()
+            await asyncio.sleep(interval)
+
+    async def close(self) -> None:
+        """Delete the cached content so it stops accruing storage cost."""
+        if self.provider is not None:
+            await self._drop()
+
+    def stats(self) -> dict:
+        """Lifecycle counters and cached-token savings."""
+        active = self.active()
+        return {
+            "enabled": config.CONTEXT_CACHE_ENABLED,
+            "active": active.name if active else None,
+            "cached_chunks": len(active.chunk_ids) if active else 0,
+            "creates": self.creates,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "invalidations": self.invalidations,
+            "requests_cached": self.requests_cached,
+            "requests_uncached": self.requests_uncached,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+            "billed_tokens_saved": int(self.cached_tokens * CACHED_TOKEN_DISCOUNT),
+        }
+
+
+# Singleton instance
+context_cache = ContextCache()
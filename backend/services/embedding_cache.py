@@ -0,0 +1,131 @@
+"""
+Embedding Cache — avoids repeat Gemini embedding round-trips for repeated questions.
+
+Two tiers:
+1. In-process LRU + TTL cache (always on)
+2. Optional SQLite file that survives restarts (EMBEDDING_CACHE_DISK=true)
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from threading import Lock
+
+import numpy as np
+
+from config import config
+from utils.cache import TTLCache
+
+CACHE_DB_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "data", "embedding_cache.db"
+)
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form used as the cache key: lowercased, single-spaced, no trailing punctuation."""
+    return " ".join(query.lower().split()).rstrip("?!.")
+
+
+class EmbeddingCache:
+    """Query-text → embedding cache with an optional on-disk tier."""
+
+    def __init__(self):
+        self.memory = TTLCache(max_size=config.EMBEDDING_CACHE_SIZE, ttl=config.EMBEDDING_CACHE_TTL)
+        self.disk_hits = 0
+        self._disk: sqlite3.Connection | None = None
+        self._disk_lock = Lock()
+
+    def _key(self, query: str) -> str:
+        """Key on model + normalized text so a model change never returns stale vectors."""
+        text = f"{config.EMBEDDING_MODEL}\n{normalize_query(query)}"
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    # Disk tier
+
+    def _get_disk(self) -> sqlite3.Connection | None:
+        """Open the SQLite tier lazily (None when disabled)."""
+        if not config.EMBEDDING_CACHE_DISK:
+            return None
+        if self._disk is None:
+            self._disk = sqlite3.connect(CACHE_DB_PATH, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("""
+                CREATE TABLE IF NOT EXISTS query_embeddings (
+                    key TEXT PRIMARY KEY,
+                    embedding BLOB NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+        return self._disk
+
+    def _disk_get(self, key: str) -> np.ndarray | None:
+        with self._disk_lock:
+            db = self._get_disk()
+            if db is None:
+                return None
+            row = db.execute(
+                "SELECT embedding, expires_at FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def _disk_set(self, key: str, embedding: np.ndarray) -> None:
+        with self._disk_lock:
+            db = self._get_disk()
+            if db is None:
+                return
+            db.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, embedding, expires_at) VALUES (?, ?, ?)",
+                (key, embedding.tobytes(), time.time() + config.EMBEDDING_CACHE_TTL),
+            )
+            db.commit()
+
+    # Public API
+
+    async def get(self, query: str) -> np.ndarray | None:
+        """Look up a cached embedding (memory first, then disk)."""
+        key = self._key(query)
+        embedding = self.memory.get(key)
+        if embedding is not None:
+            return embedding
+
+        if config.EMBEDDING_CACHE_DISK:
+            embedding = await asyncio.to_thread(self._disk_get, key)
+            if embedding is not None:
+                self.disk_hits += 1
+                self.memory.set(key, embedding)
+                return embedding
+        return None
+
+    async def set(self, query: str, embedding) -> np.ndarray:
+        """Store an embedding in both tiers; returns it as a float32 array."""
+        key = self._key(query)
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector.setflags(write=False)
+        self.memory.set(key, vector)
+        if config.EMBEDDING_CACHE_DISK:
+            await asyncio.to_thread(self._disk_set, key, vector)
+        return vector
+
+    def stats(self) -> dict:
+        """Hit/miss counters for both tiers."""
+        stats = self.memory.stats()
+        stats["disk_enabled"] = config.EMBEDDING_CACHE_DISK
+        stats["disk_hits"] = self.disk_hits
+        stats["misses"] = stats["misses"] - self.disk_hits
+        lookups = stats["hits"] + self.disk_hits + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + self.disk_hits) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def close(self) -> None:
+        """Close the disk tier."""
+        with self._disk_lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+
+# Singleton instance
+embedding_cache = EmbeddingCache()
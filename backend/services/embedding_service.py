@@ -0,0 +1,105 @@
+"""
+Embedding Service — non-blocking Gemini embedding calls.
+
+Every call runs off the event loop, either through the async Gemini client
+or a bounded thread pool (EMBEDDING_TRANSPORT), with a per-call deadline and
+a cap on concurrent upstream requests.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import google.generativeai as genai
+
+from config import config
+
+
+class EmbeddingTimeoutError(Exception):
+    """Raised when an embedding call exceeds EMBEDDING_TIMEOUT."""
+
+
+class EmbeddingService:
+    """Bounded, deadline-aware access to the Gemini Embeddings API."""
+
+    def __init__(self):
+        self._semaphore = asyncio.Semaphore(config.EMBEDDING_MAX_CONCURRENCY)
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.EMBEDDING_MAX_CONCURRENCY, thread_name_prefix="embedding"
+        )
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.total_ms = 0.0
+
+    async def _request(self, content) -> dict:
+        """Issue one embed_content request without blocking the event loop."""
+        request_options = {"timeout": config.EMBEDDING_TIMEOUT}
+        if config.EMBEDDING_TRANSPORT == "thread":
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor,
+                partial(
+                    genai.embed_content,
+                    model=config.EMBEDDING_MODEL,
+                    content=content,
+                    request_options=request_options,
+                ),
+            )
+        return await genai.embed_content_async(
+            model=config.EMBEDDING_MODEL,
+            content=content,
+            request_options=request_options,
+        )
+
+    async def embed(self, content):
+        """
+        Embed a string (or a list of strings as one batch request).
+
+        Returns:
+            The embedding vector, or a list of vectors for list input
+
+        Raises:
+            EmbeddingTimeoutError: If the call misses its deadline
+        """
+        self.waiting += 1
+        async with self._semaphore:
+            self.waiting -= 1
+            self.in_flight += 1
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(self._request(content), timeout=config.EMBEDDING_TIMEOUT)
+                return result["embedding"]
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise EmbeddingTimeoutError(f"Embedding call exceeded {config.EMBEDDING_TIMEOUT}s")
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.calls += 1
+                self.in_flight -= 1
+                self.total_ms += (time.perf_counter() - start) * 1000
+
+    def stats(self) -> dict:
+        """Call counters and current concurrency."""
+        return {
+            "transport": config.EMBEDDING_TRANSPORT,
+            "max_concurrency": config.EMBEDDING_MAX_CONCURRENCY,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.calls, 1) if self.calls else 0.0,
+        }
+
+    def close(self) -> None:
+        """Shut down the thread-pool transport."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Singleton instance
+embedding_service = EmbeddingService()
@@ -1,139 +1,413 @@
 """
 LLM Service — handles all interactions with Google Gemini for chat generation.
+
+Calls go through a resilient transport: a cap on in-flight requests,
+per-attempt timeouts inside an overall deadline, jittered retries of
+transient failures, optional hedging of slow non-stream calls, and a
+circuit breaker that fails fast while Gemini is degraded.
 """
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 import google.generativeai as genai
 from config import config
+from services.context_cache import GeminiCacheProvider, context_cache
+from services.prompt_builder import estimate_tokens, prompt_builder
+from utils.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyWindow,
+    backoff_delay,
+    hedged,
+    is_transient_error,
+)
+
+GENERIC_ERROR = "Failed to generate AI response. Please try again later."
+
+GENERATION_CONFIG = {
+    "temperature": config.TEMPERATURE,
+    "top_p": 0.8,
+    "top_k": 40,
+    "max_output_tokens": config.MAX_OUTPUT_TOKENS,
+}
+
+
+class LLMUnavailableError(Exception):
+    """Raised without calling Gemini while the circuit breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("The AI service is temporarily unavailable. Please try again shortly.")
+        self.retry_after = retry_after
+
+
+def configure_gemini() -> None:
+    """
+    Configure the Gemini client.
+
+    With GEMINI_API_ENDPOINT set, calls use the REST transport against that
+    endpoint, and its HTTP connection pool is sized for LLM_MAX_CONCURRENCY.
+    """
+    if not config.GEMINI_API_ENDPOINT:
+        genai.configure(api_key=config.GEMINI_API_KEY)
+        return
+
+    genai.configure(
+        api_key=config.GEMINI_API_KEY,
+        transport="rest",
+        client_options={"api_endpoint": config.GEMINI_API_ENDPOINT},
+    )
+    from google.generativeai.client import get_default_generative_client
+    from requests.adapters import HTTPAdapter
+
+    session = getattr(get_default_generative_client()._transport, "_session", None)
+    if session is not None:
+        pool_size = max(config.LLM_MAX_CONCURRENCY, config.EMBEDDING_MAX_CONCURRENCY)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    print(f"🔌 Gemini REST endpoint: {config.GEMINI_API_ENDPOINT}")
 
 
 class LLMService:
     """Google Gemini LLM integration for grounded responses."""
 
     def __init__(self):
-        self.model = genai.GenerativeModel(
-            model_name=config.CHAT_MODEL,
-            generation_config={
-                "temperature": config.TEMPERATURE,
-                "top_p": 0.8,
-                "top_k": 40,
-                "max_output_tokens": config.MAX_OUTPUT_TOKENS,
-            },
-        )
+        self.model = genai.GenerativeModel(model_name=config.CHAT_MODEL, generation_config=GENERATION_CONFIG)
+        if context_cache.provider is None:
+            context_cache.provider = GeminiCacheProvider(config.CHAT_MODEL, GENERATION_CONFIG)
+        self._semaphore = asyncio.Semaphore(config.LLM_MAX_CONCURRENCY)
+        self._executor = ThreadPoolExecutor(max_workers=config.LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+        self.breaker = CircuitBreaker("Gemini", config.LLM_BREAKER_FAILURES, config.LLM_BREAKER_RESET)
+        self.latency = LatencyWindow()
+        self.calls = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.hedges = 0
+        self.hedge_wins = 0
 
-    def build_prompt(
-        self, user_message: str, document_context: str, chat_history: list[dict] = None
-    ) -> str:
+    # Transport
+
+    async def _request(self, prompt: str, timeout: float, stream: bool = False, model=None):
+        """Issue one generate_content request without blocking the event loop."""
+        model = model or self.model
+        # retry=None: the client's default policy retries 503s for up to 600s,
+        # which would hide failures from the breaker and pin pool threads
+        request_options = {"timeout": timeout, "retry": None}
+        if config.LLM_TRANSPORT == "thread":
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor,
+                partial(model.generate_content, prompt, stream=stream, request_options=request_options),
+            )
+        return await model.generate_content_async(prompt, stream=stream, request_options=request_options)
+
+    async def _stream_chunks(self, prompt: str, timeout: float, model=None, sink: dict | None = None):
         """
-        Build the augmented prompt with retrieved context and conversation history.
+        Yield response chunks of a streaming request from either transport.
 
-        Structure:
-        1. System instructions (grounding rules)
-        2. Retrieved document context
-        3. Conversation history
-        4. Current user question
+        The response object is put in `sink["response"]`; once iteration is
+        done it holds the aggregated result (including usage_metadata).
         """
-        prompt = """You are a helpful AI Support Assistant for CloudDesk platform.
-
-## STRICT RULES (YOU MUST FOLLOW THESE):
-1. You can ONLY answer questions using the provided "Product Documentation" below.
-2. If the user's question is NOT covered by the documentation, you MUST respond with: "I'm sorry, I don't have information about that in our documentation. Please contact our support team for further assistance."
-3. Do NOT make up, guess, or hallucinate any information.
-4. Do NOT provide information from your general knowledge — ONLY use the documentation provided.
-5. Be concise, friendly, and professional.
-6. Use markdown formatting when it improves readability (bullet points, bold for emphasis, code blocks if needed).
-7. If the user greets you (hello, hi, hey), respond warmly and ask how you can help.
-8. If the user thanks you, respond politely.
-
-## Product Documentation:
-"""
-        if document_context:
-            prompt += document_context
+        response = await self._request(prompt, timeout, stream=True, model=model)
+        if sink is not None:
+            sink["response"] = response
+        if config.LLM_TRANSPORT == "thread":
+            loop = asyncio.get_running_loop()
+            chunks = iter(response)
+            while (chunk := await loop.run_in_executor(self._executor, next, chunks, None)) is not None:
+                yield chunk
         else:
-            prompt += "(No relevant documentation found for this query)"
+            async for chunk in response:
+                yield chunk
 
-        prompt += "\n\n## Conversation History (for context):\n"
+    async def _attempt(self, prompt: str, timeout: float, model=None):
+        """One concurrency-capped, deadline-bound non-stream call."""
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(self._request(prompt, timeout, model=model), timeout=timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+            finally:
+                self.calls += 1
+            self.latency.add(time.perf_counter() - start)
+            return result
 
-        if chat_history:
-            for msg in chat_history:
-                role = "User" if msg["role"] == "user" else "Assistant"
-                prompt += f"{role}: {msg['content']}\n"
-        else:
-            prompt += "(This is the start of the conversation)\n"
+    def _hedge_delay(self) -> float | None:
+        """Seconds after which a slow call gets a duplicate, or None to not hedge."""
+        if not config.LLM_HEDGE_ENABLED or len(self.latency) < config.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return self.latency.percentile(config.LLM_HEDGE_PERCENTILE)
 
-        prompt += f"""
-## Current User Question:
-{user_message}
+    def _allow(self) -> None:
+        try:
+            self.breaker.allow()
+        except CircuitOpenError as e:
+            raise LLMUnavailableError(e.retry_after) from e
+
+    def _record(self, error: Exception | None) -> bool:
+        """Feed a call outcome to the breaker; returns whether the error is worth retrying."""
+        if error is None or not is_transient_error(error):
+            # Gemini answered (possibly with a client error), so it is healthy
+            self.breaker.record_success()
+            return False
+        self.errors += 1
+        self.breaker.record_failure()
+        return True
+
+    async def _generate(self, prompt: str, max_retries: int | None = None, model=None):
+        """
+        Non-stream generate_content with deadline, retries, hedging and breaker.
+
+        Raises:
+            LLMUnavailableError: If the circuit is open
+            Exception: The last upstream error once retries or the deadline run out
+        """
+        max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        deadline = time.monotonic() + config.LLM_DEADLINE
 
-## Your Response:
-Remember: ONLY use the Product Documentation above. If the answer is not in the docs, say you don't have that information."""
+        for attempt in range(max_retries + 1):
+            self._allow()
+            timeout = min(config.LLM_ATTEMPT_TIMEOUT, deadline - time.monotonic())
+            try:
+                result, hedge_sent, hedge_won = await hedged(
+                    lambda: self._attempt(prompt, timeout, model), self._hedge_delay()
+                )
+            except Exception as e:
+                retryable = self._record(e)
+                delay = backoff_delay(attempt)
+                if not retryable or attempt == max_retries or time.monotonic() + delay >= deadline:
+                    raise
+                self.retries += 1
+                print(f"⚠️  Gemini call failed ({type(e).__name__}), retry {attempt + 1}/{max_retries}")
+                await asyncio.sleep(delay)
+                continue
 
-        return prompt
+            self._record(None)
+            self.hedges += hedge_sent
+            self.hedge_wins += hedge_won
+            return result
+
+    # Prompt planning
+
+    def _plan(self, user_message: str, chunks: list[dict], chat_history: list[dict] | None, use_cache: bool = True) -> dict:
+        """Budgeted prompt plus the model to send it to (bound to cached content when available)."""
+        cache = context_cache.active() if use_cache else None
+        plan = prompt_builder.build(
+            user_message, chunks, chat_history, cached_chunk_ids=cache.chunk_ids if cache else None
+        )
+        plan["model"] = cache.model if cache else self.model
+        plan["cached"] = cache is not None
+        return plan
+
+    @staticmethod
+    def _record_usage(plan: dict, usage) -> None:
+        """Feed reported token counts to the cache savings and prompt estimate stats."""
+        context_cache.record_usage(usage, plan["cached"])
+        if usage is not None:
+            cached_tokens = getattr(usage, "cached_content_token_count", 0) or 0
+            prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+            prompt_builder.record_usage(plan["estimated_tokens"], prompt_tokens - cached_tokens)
+
+    @staticmethod
+    def _usage(plan: dict, usage, reply: str) -> dict:
+        """
+        Token split of one response from Gemini's usage_metadata, or local
+        estimates when it is missing.
+        """
+        prompt_tokens = (getattr(usage, "prompt_token_count", 0) or 0) if usage is not None else 0
+        if prompt_tokens:
+            total = getattr(usage, "total_token_count", 0) or 0
+            candidates = getattr(usage, "candidates_token_count", 0) or 0
+            # The total also counts thinking tokens, which are billed as output
+            output_tokens = max(candidates, total - prompt_tokens)
+            return {
+                "prompt_tokens": prompt_tokens,
+                "output_tokens": output_tokens,
+                "cached_tokens": getattr(usage, "cached_content_token_count", 0) or 0,
+                "total_tokens": total or prompt_tokens + output_tokens,
+                "estimated": False,
+            }
+
+        prompt_tokens = plan["estimated_tokens"]
+        output_tokens = estimate_tokens(reply)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "cached_tokens": 0,
+            "total_tokens": prompt_tokens + output_tokens,
+            "estimated": True,
+        }
+
+    @staticmethod
+    def _is_cache_error(plan: dict, error: Exception) -> bool:
+        """Whether a call on cached content failed because the cache is gone."""
+        if not plan["cached"]:
+            return False
+        return type(error).__name__ in ("NotFound", "PermissionDenied", "FailedPrecondition") or "cached" in str(error).lower()
 
     async def generate_response(
-        self, user_message: str, document_context: str, chat_history: list[dict] = None
+        self, user_message: str, chunks: list[dict], chat_history: list[dict] = None
     ) -> dict:
         """
         Generate a non-streaming response.
 
+        Args:
+            user_message: Current question
+            chunks: Retrieved chunks with scores (see PromptBuilder.build)
+            chat_history: Messages oldest first
+
         Returns:
-            Dict with 'reply' and 'tokens_used'
+            Dict with 'reply', 'tokens_used' and 'usage' (prompt / output /
+            cached / total token counts and whether they were estimated)
+
+        Raises:
+            LLMUnavailableError: If Gemini is failing and the circuit is open
         """
         try:
-            prompt = self.build_prompt(user_message, document_context, chat_history)
-            result = await self.model.generate_content_async(prompt)
+            context_cache.note_retrieval(chunks)
+            plan = self._plan(user_message, chunks, chat_history)
+            try:
+                result = await self._generate(plan["prompt"], model=plan["model"])
+            except Exception as e:
+                if not self._is_cache_error(plan, e):
+                    raise
+                context_cache.invalidate(str(e))
+                plan = self._plan(user_message, chunks, chat_history, use_cache=False)
+                result = await self._generate(plan["prompt"], model=plan["model"])
             text = result.text
-            tokens_used = getattr(result, "usage_metadata", None)
-            token_count = 0
-            if tokens_used:
-                token_count = getattr(tokens_used, "total_token_count", 0)
+            metadata = getattr(result, "usage_metadata", None)
+            self._record_usage(plan, metadata)
+            usage = self._usage(plan, metadata, text)
 
-            return {"reply": text, "tokens_used": token_count}
+            return {"reply": text, "tokens_used": usage["total_tokens"], "usage": usage}
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             print(f"❌ LLM generation error: {e}")
-            raise Exception("Failed to generate AI response. Please try again later.")
+            raise Exception(GENERIC_ERROR)
 
     async def generate_stream_response(
-        self, user_message: str, document_context: str, chat_history: list[dict] = None
+        self, user_message: str, chunks: list[dict], chat_history: list[dict] = None
     ):
         """
         Generate a streaming response — yields chunks as they arrive.
 
+        A failure before the first chunk is retried like a non-stream call;
+        once text has been sent the stream ends with an error instead.
+
         Yields:
-            Dicts with type 'chunk', 'complete', or 'error'
+            Dicts with type 'chunk', 'complete' (with 'tokens_used' and
+            'usage', as in generate_response), or 'error'
         """
-        try:
-            prompt = self.build_prompt(user_message, document_context, chat_history)
-            response = await self.model.generate_content_async(prompt, stream=True)
+        context_cache.note_retrieval(chunks)
+        plan = self._plan(user_message, chunks, chat_history)
+        deadline = time.monotonic() + config.LLM_DEADLINE
 
-            async for chunk in response:
-                text = chunk.text
-                if text:
-                    yield {"type": "chunk", "content": text}
+        for attempt in range(config.LLM_MAX_RETRIES + 1):
+            try:
+                self._allow()
+            except LLMUnavailableError as e:
+                yield {"type": "error", "error": str(e)}
+                return
 
-            # Get final token count
-            # Note: streaming doesn't always provide usage metadata
-            # We estimate or get it from the aggregated response
-            yield {"type": "complete", "tokens_used": 0}
+            received = False
+            reply = ""
+            sink: dict = {}
+            try:
+                async with self._semaphore:
+                    self.calls += 1
+                    stream = self._stream_chunks(
+                        plan["prompt"], max(0.0, deadline - time.monotonic()), plan["model"], sink
+                    )
+                    try:
+                        while True:
+                            timeout = config.LLM_CHUNK_TIMEOUT if received else config.LLM_FIRST_CHUNK_TIMEOUT
+                            timeout = min(timeout, deadline - time.monotonic())
+                            try:
+                                chunk = await asyncio.wait_for(anext(stream), timeout=max(0.0, timeout))
+                            except StopAsyncIteration:
+                                break
+                            except asyncio.TimeoutError:
+                                self.timeouts += 1
+                                raise
+                            received = True
+                            text = chunk.text
+                            if text:
+                                reply += text
+                                yield {"type": "chunk", "content": text}
+                    finally:
+                        await stream.aclose()
+            except Exception as e:
+                if not received and self._is_cache_error(plan, e):
+                    context_cache.invalidate(str(e))
+                    plan = self._plan(user_message, chunks, chat_history, use_cache=False)
+                    continue
+                retryable = self._record(e)
+                delay = backoff_delay(attempt)
+                if received or not retryable or attempt == config.LLM_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                    print(f"❌ LLM streaming error: {e}")
+                    yield {"type": "error", "error": GENERIC_ERROR}
+                    return
+                self.retries += 1
+                print(f"⚠️  Gemini stream failed before first chunk ({type(e).__name__}), retry {attempt + 1}")
+                await asyncio.sleep(delay)
+                continue
 
-        except Exception as e:
-            print(f"❌ LLM streaming error: {e}")
-            yield {"type": "error", "error": "Failed to generate AI response. Please try again later."}
+            self._record(None)
+            # The aggregated response carries the usage of the whole stream
+            metadata = getattr(sink.get("response"), "usage_metadata", None)
+            self._record_usage(plan, metadata)
+            usage = self._usage(plan, metadata, reply)
+            yield {"type": "complete", "tokens_used": usage["total_tokens"], "usage": usage}
+            return
 
     async def generate_title(self, user_message: str, assistant_reply: str) -> str:
-        """Generate a short title for a chat session."""
-        try:
-            prompt = (
-                "Generate a very short title (3-5 words max) for this conversation. "
-                "Return ONLY the title, nothing else. No quotes, no punctuation at the end.\n\n"
-                f"User: {user_message}\n"
-                f"Assistant: {assistant_reply[:200]}\n\n"
-                "Title:"
-            )
-            result = await self.model.generate_content_async(prompt)
-            title = result.text.strip().strip("\"'")
-            return title[:50]
-        except Exception as e:
-            print(f"⚠️  Title generation failed: {e}")
-            return " ".join(user_message.split()[:5])
+        """
+        Generate a short title for a chat session.
+
+        Raises on failure; retries and the heuristic fallback live in
+        services/title_service.py.
+        """
+        prompt = (
+            "Generate a very short title (3-5 words max) for this conversation. "
+            "Return ONLY the title, nothing else. No quotes, no punctuation at the end.\n\n"
+            f"User: {user_message}\n"
+            f"Assistant: {assistant_reply[:200]}\n\n"
+            "Title:"
+        )
+        # No transport retries: the title queue retries with its own backoff
+        result = await self._generate(prompt, max_retries=0)
+        title = result.text.strip().strip("\"'")
+        if not title:
+            raise ValueError("Empty title from model")
+        return title[:50]
+
+    def stats(self) -> dict:
+        """Call counters, latency percentiles and circuit state."""
+        p50, p95 = self.latency.percentile(50), self.latency.percentile(95)
+        return {
+            "transport": config.LLM_TRANSPORT,
+            "max_concurrency": config.LLM_MAX_CONCURRENCY,
+            "calls": self.calls,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_after_ms": round(self._hedge_delay() * 1000, 1) if self._hedge_delay() else None,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "circuit": self.breaker.stats(),
+        }
+
+    def close(self) -> None:
+        """Shut down the thread-pool transport."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
 
 
 # Singleton instance
@@ -0,0 +1,179 @@
+"""
+Prompt Builder — assembles the grounded chat prompt within a token budget.
+
+The static instructions are a module-level constant built once. Retrieved
+chunks and conversation history are added under PROMPT_TOKEN_BUDGET
+(estimated locally): the oldest history goes first, then the
+lowest-scored chunks. Estimates are compared with the token counts Gemini
+reports so the budget and chars-per-token ratio can be tuned.
+"""
+from config import config
+
+SYSTEM_RULES = """You are a helpful AI Support Assistant for CloudDesk platform.
+
+## STRICT RULES (YOU MUST FOLLOW THESE):
+1. You can ONLY answer questions using the provided "Product Documentation" below.
+2. If the user's question is NOT covered by the documentation, you MUST respond with: "I'm sorry, I don't have information about that in our documentation. Please contact our support team for further assistance."
+3. Do NOT make up, guess, or hallucinate any information.
+4. Do NOT provide information from your general knowledge — ONLY use the documentation provided.
+5. Be concise, friendly, and professional.
+6. Use markdown formatting when it improves readability (bullet points, bold for emphasis, code blocks if needed).
+7. If the user greets you (hello, hi, hey), respond warmly and ask how you can help.
+8. If the user thanks you, respond politely."""
+
+DOCUMENTS_HEADER = "\n\n## Product Documentation:\n"
+SYSTEM_PREFIX = SYSTEM_RULES + DOCUMENTS_HEADER
+
+# With provider-side context caching, the rules become the system
+# instruction and frequently used chunks are cached under this header
+CACHED_DOCUMENTS_HEADER = "## Product Documentation (cached):\n"
+CACHED_REFERENCE = "(Also relevant — see the cached Product Documentation: {titles})"
+
+NO_DOCUMENTS = "(No relevant documentation found for this query)"
+HISTORY_HEADER = "\n\n## Conversation History (for context):\n"
+NO_HISTORY = "(This is the start of the conversation)\n"
+QUESTION_TEMPLATE = """
+## Current User Question:
+{question}
+
+## Your Response:
+Remember: ONLY use the Product Documentation above. If the answer is not in the docs, say you don't have that information."""
+
+CHUNK_SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (characters / PROMPT_CHARS_PER_TOKEN, rounded up)."""
+    return int(-(-len(text) // config.PROMPT_CHARS_PER_TOKEN))
+
+
+def format_chunk(chunk: dict) -> str:
+    return f"[{chunk['title']}]: {chunk['content']}"
+
+
+def format_message(message: dict) -> str:
+    role = "User" if message["role"] == "user" else "Assistant"
+    return f"{role}: {message['content']}\n"
+
+
+def cached_documents(chunks: list[dict]) -> str:
+    """Body of the cached-content documentation block."""
+    return CACHED_DOCUMENTS_HEADER + CHUNK_SEPARATOR.join(format_chunk(chunk) for chunk in chunks)
+
+
+# Fixed parts, estimated once
+_FIXED_TOKENS = estimate_tokens(SYSTEM_PREFIX) + estimate_tokens(HISTORY_HEADER)
+_FIXED_TOKENS_CACHED = estimate_tokens(DOCUMENTS_HEADER) + estimate_tokens(HISTORY_HEADER)
+
+
+class PromptBuilder:
+    """Budgeted prompt assembly plus estimate-vs-actual bookkeeping."""
+
+    def __init__(self):
+        self.builds = 0
+        self.history_trimmed = 0
+        self.chunks_trimmed = 0
+        self.samples = 0
+        self.estimated_total = 0
+        self.actual_total = 0
+
+    def build(
+        self,
+        user_message: str,
+        chunks: list[dict],
+        chat_history: list[dict] | None = None,
+        budget: int | None = None,
+        cached_chunk_ids: frozenset | None = None,
+    ) -> dict:
+        """
+        Build the prompt: instructions, documentation, history, question.
+
+        Args:
+            user_message: Current question
+            chunks: Retrieved chunks ('id', 'title', 'content', 'score'), best first
+            chat_history: Messages oldest first
+            budget: Input token budget (defaults to PROMPT_TOKEN_BUDGET)
+            cached_chunk_ids: Set when the model runs on cached content: the
+                rules are then omitted and cached chunks only referenced by title
+
+        Returns:
+            Dict with 'prompt', 'estimated_tokens', 'chunks' (the chunks kept)
+            and 'history_messages' (number of history messages kept)
+        """
+        budget = config.PROMPT_TOKEN_BUDGET if budget is None else budget
+        chat_history = chat_history or []
+        question = QUESTION_TEMPLATE.format(question=user_message)
+
+        reference = ""
+        if cached_chunk_ids is not None:
+            in_cache = [chunk for chunk in chunks if chunk["id"] in cached_chunk_ids]
+            chunks = [chunk for chunk in chunks if chunk["id"] not in cached_chunk_ids]
+            if in_cache:
+                reference = CACHED_REFERENCE.format(titles="; ".join(chunk["title"] for chunk in in_cache))
+
+        chunk_texts = [format_chunk(chunk) for chunk in chunks]
+        chunk_tokens = [estimate_tokens(text) + 1 for text in chunk_texts]
+        history_texts = [format_message(message) for message in chat_history]
+        history_tokens = [estimate_tokens(text) for text in history_texts]
+
+        fixed = _FIXED_TOKENS if cached_chunk_ids is None else _FIXED_TOKENS_CACHED + estimate_tokens(reference)
+        total = fixed + estimate_tokens(question) + sum(chunk_tokens) + sum(history_tokens)
+
+        # Over budget: drop the oldest history first...
+        first_message = 0
+        while total > budget and first_message < len(history_texts):
+            total -= history_tokens[first_message]
+            first_message += 1
+
+        # ...then the lowest-scored chunks
+        kept = sorted(range(len(chunks)), key=lambda i: chunks[i].get("score", 0), reverse=True)
+        while total > budget and kept:
+            total -= chunk_tokens[kept.pop()]
+        kept.sort()
+
+        self.builds += 1
+        self.history_trimmed += first_message
+        self.chunks_trimmed += len(chunks) - len(kept)
+        if first_message or len(kept) < len(chunks):
+            print(
+                f"✂️  Prompt over budget ({budget} tokens): dropped {first_message} history message(s), "
+                f"{len(chunks) - len(kept)} chunk(s)"
+            )
+
+        documents = CHUNK_SEPARATOR.join([chunk_texts[i] for i in kept] + ([reference] if reference else []))
+        history = "".join(history_texts[first_message:]) or NO_HISTORY
+        if cached_chunk_ids is None:
+            prompt = "".join((SYSTEM_PREFIX, documents or NO_DOCUMENTS, HISTORY_HEADER, history, question))
+        else:
+            prompt = "".join((DOCUMENTS_HEADER.lstrip(), documents or NO_DOCUMENTS, HISTORY_HEADER, history, question))
+
+        return {
+            "prompt": prompt,
+            "estimated_tokens": total,
+            "chunks": [chunks[i] for i in kept],
+            "history_messages": len(history_texts) - first_message,
+        }
+
+    def record_usage(self, estimated: int, actual: int | None) -> None:
+        """Track the local estimate against Gemini's reported prompt token count (see stats)."""
+        if not actual:
+            return
+        self.samples += 1
+        self.estimated_total += estimated
+        self.actual_total += actual
+
+    def stats(self) -> dict:
+        """Trim counters and the running actual/estimated token ratio."""
+        return {
+            "token_budget": config.PROMPT_TOKEN_BUDGET,
+            "chars_per_token": config.PROMPT_CHARS_PER_TOKEN,
+            "builds": self.builds,
+            "history_messages_trimmed": self.history_trimmed,
+            "chunks_trimmed": self.chunks_trimmed,
+            "usage_samples": self.samples,
+            "actual_to_estimated": round(self.actual_total / self.estimated_total, 3) if self.estimated_total else None,
+        }
+
+
+# Singleton instance
+prompt_builder = PromptBuilder()
@@ -1,102 +1,266 @@
 """
 RAG Service — Embedding-based Retrieval-Augmented Generation.
-Loads pre-computed embeddings from vector_store.json and performs
-real cosine similarity search against user queries.
+Memory-maps pre-computed embeddings from the binary vector store into a
+vectorized index and performs real cosine similarity search against user queries.
+
+The loaded store is held as an immutable snapshot. Reloads build a new
+snapshot in a worker thread and swap the reference in one assignment, so
+searches already in flight finish on the snapshot they started with.
 """
-import json
+import asyncio
 import os
-import google.generativeai as genai
+import time
+from datetime import datetime, timezone
 from config import config
-from utils.vector_math import find_top_k_similar
-
-# Path to vector store
-VECTOR_STORE_PATH = os.path.join(
-    os.path.dirname(os.path.abspath(__file__)), "..", "data", "vector_store.json"
+from services.answer_cache import answer_cache
+from services.embedding_cache import embedding_cache, normalize_query
+from services.embedding_service import embedding_service
+from utils.singleflight import SingleFlight
+from utils.timing import StageTimer
+from utils.vector_index import FlatIndex, build_index
+from utils.vector_store import (
+    LEGACY_JSON_PATH,
+    VECTOR_STORE_BASE,
+    ivf_index_path,
+    load_json_vector_store,
+    load_vector_store,
+    store_exists,
+    store_signature,
 )
 
 
+class StoreSnapshot:
+    """One loaded version of the vector store (never mutated after creation)."""
+
+    def __init__(self, index: FlatIndex, chunks: list[dict], version: str, signature: tuple = ()):
+        self.index = index
+        self.chunks = chunks
+        self.version = version
+        self.signature = signature  # store_signature() the snapshot was built from
+        self.loaded_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "chunks": len(self.chunks),
+            "index": type(self.index).__name__,
+            "loaded_at": self.loaded_at,
+        }
+
+
+def build_snapshot() -> StoreSnapshot | None:
+    """
+    Load pre-computed embeddings into a new snapshot.
+
+    Prefers the binary store (memory-mapped, no parsing); falls back to
+    the legacy vector_store.json for deployments not yet migrated.
+    Returns None when no store exists.
+    """
+    if store_exists(VECTOR_STORE_BASE):
+        signature = store_signature(VECTOR_STORE_BASE)
+        matrix, meta = load_vector_store(VECTOR_STORE_BASE)
+        index = build_index(
+            matrix,
+            meta["chunks"],
+            kind=config.VECTOR_INDEX,
+            ivf_path=ivf_index_path(VECTOR_STORE_BASE),
+            store_version=meta["version"],
+            normalized=True,
+        )
+        return StoreSnapshot(index, meta["chunks"], meta["version"], signature)
+
+    if os.path.exists(LEGACY_JSON_PATH):
+        print("⚠️  Loading legacy vector_store.json. Run 'python scripts/convert_vector_store.py' to migrate.")
+        embeddings, chunks = load_json_vector_store(LEGACY_JSON_PATH)
+        return StoreSnapshot(FlatIndex(embeddings, chunks), chunks, "legacy-json")
+
+    return None
+
+
 class RAGService:
     """Embedding-based RAG retrieval engine."""
 
     def __init__(self):
-        self.chunks: list[dict] = []
-        self._loaded = False
+        self._snapshot: StoreSnapshot | None = None
+        self._seen_signature: tuple | None = None
+        self._reload_lock = asyncio.Lock()
+        self._embedding_flights = SingleFlight()
+        self.reloads = 0
+
+    @property
+    def chunks(self) -> list[dict]:
+        return self._snapshot.chunks if self._snapshot else []
+
+    @property
+    def index(self) -> FlatIndex | None:
+        return self._snapshot.index if self._snapshot else None
+
+    @property
+    def store_version(self) -> str | None:
+        return self._snapshot.version if self._snapshot else None
+
+    def _swap(self, snapshot: StoreSnapshot) -> None:
+        """Publish a new snapshot (single reference assignment)."""
+        self._snapshot = snapshot
+        self._seen_signature = snapshot.signature
+        answer_cache.invalidate(snapshot.version)
+        print(
+            f"📚 RAG Service loaded {len(snapshot.chunks)} chunks from vector store "
+            f"({snapshot.index.dim}d, {type(snapshot.index).__name__}, version {snapshot.version})"
+        )
 
     def load_vector_store(self):
-        """Load pre-computed embeddings from vector_store.json."""
+        """Load the vector store at startup."""
         try:
-            if not os.path.exists(VECTOR_STORE_PATH):
-                print("⚠️  vector_store.json not found. Run 'python scripts/ingest.py' first.")
+            snapshot = build_snapshot()
+            if snapshot is None:
+                print("⚠️  Vector store not found. Run 'python scripts/ingest.py' first.")
                 return
-
-            with open(VECTOR_STORE_PATH, "r") as f:
-                self.chunks = json.load(f)
-
-            self._loaded = True
-            print(f"📚 RAG Service loaded {len(self.chunks)} chunks from vector store")
+            self._swap(snapshot)
         except Exception as e:
             print(f"❌ Failed to load vector store: {e}")
-            self.chunks = []
+            self._snapshot = None
+
+    @staticmethod
+    def _same_store(current: StoreSnapshot, snapshot: StoreSnapshot) -> bool:
+        """
+        Same content and same index. ingest publishes the IVF file after the
+        sidecar, so a reload can see the new vectors before their index.
+        """
+        return (
+            snapshot.version == current.version
+            and snapshot.signature[1:] == current.signature[1:]
+            and type(snapshot.index) is type(current.index)
+        )
+
+    async def reload_vector_store(self, force: bool = False) -> bool:
+        """
+        Hot-swap to the store currently on disk, without blocking searches.
+
+        The new snapshot (mmap + index) is built in a worker thread; the old
+        one keeps serving until the swap. A failed load keeps the old snapshot.
+
+        Args:
+            force: Reload even if the on-disk store looks unchanged
+
+        Returns:
+            True if a new store version (or its index) was swapped in
+        """
+        async with self._reload_lock:
+            current = self._snapshot
+            if not force and current and self._seen_signature == store_signature(VECTOR_STORE_BASE):
+                return False
+
+            start = time.perf_counter()
+            try:
+                snapshot = await asyncio.to_thread(build_snapshot)
+            except Exception as e:
+                print(f"❌ Vector store reload failed, keeping version {self.store_version}: {e}")
+                return False
+
+            if snapshot is None:
+                return False
+            if not force and current and self._same_store(current, snapshot):
+                self._seen_signature = snapshot.signature  # files touched, content identical
+                return False
+
+            self._swap(snapshot)
+            self.reloads += 1
+            print(f"🔄 Vector store hot-swapped in {(time.perf_counter() - start) * 1000:.0f}ms")
+            return True
 
-    async def get_query_embedding(self, query: str) -> list[float]:
+    async def watch_vector_store(self, interval: float):
+        """Poll the store files and hot-reload when a new version is published."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self._seen_signature != store_signature(VECTOR_STORE_BASE):
+                    await self.reload_vector_store()
+            except Exception as e:
+                print(f"⚠️  Vector store watcher error: {e}")
+
+    def describe_store(self) -> dict | None:
+        """Active store version info for /health."""
+        return self._snapshot.describe() if self._snapshot else None
+
+    def coalescing_stats(self) -> dict:
+        """Shared (deduplicated) query embedding calls for /metrics."""
+        return self._embedding_flights.stats()
+
+    async def get_query_embedding(self, query: str):
         """
         Generate embedding vector for a user query using Gemini Embeddings API.
+        Repeated questions are served from the embedding cache; identical
+        questions arriving together share one embedding call.
         """
+        cached = await embedding_cache.get(query)
+        if cached is not None:
+            return cached
+
+        if config.COALESCING_ENABLED:
+            return await self._embedding_flights.do(normalize_query(query), lambda: self._embed_query(query))
+        return await self._embed_query(query)
+
+    async def _embed_query(self, query: str):
         try:
-            result = genai.embed_content(
-                model=config.EMBEDDING_MODEL,
-                content=query,
-            )
-            return result["embedding"]
+            embedding = await embedding_service.embed(query)
         except Exception as e:
             print(f"❌ Embedding generation error: {e}")
             raise Exception("Failed to generate query embedding")
 
+        return await embedding_cache.set(query, embedding)
+
     async def search(self, query: str) -> dict:
         """
         Perform embedding-based similarity search.
 
         1. Convert user query to embedding vector
-        2. Compare against all stored chunk embeddings using cosine similarity
+        2. Score all stored chunk embeddings with one matrix-vector product
         3. Return top-K chunks above threshold
 
         Args:
             query: User's question text
 
         Returns:
-            Dict with context string, docs_used list, and has_relevant_docs flag
+            Dict with retrieved chunks (title, content, score; best first),
+            docs_used list, has_relevant_docs flag,
+            the query_embedding (None when no store is loaded) and stage
+            timings (embedding_ms, retrieval_ms)
         """
-        if not self._loaded or len(self.chunks) == 0:
+        snapshot = self._snapshot
+        if snapshot is None or len(snapshot.chunks) == 0:
             return {
-                "context": "",
+                "chunks": [],
                 "docs_used": [],
                 "has_relevant_docs": False,
+                "query_embedding": None,
+                "timings": {},
             }
 
+        timer = StageTimer()
+
         # Step 1: Get query embedding
-        query_vector = await self.get_query_embedding(query)
+        with timer.stage("embedding"):
+            query_vector = await self.get_query_embedding(query)
 
         # Step 2: Find top-K similar chunks via cosine similarity
-        top_chunks = find_top_k_similar(
-            query_vector=query_vector,
-            document_vectors=self.chunks,
-            top_k=config.TOP_K_CHUNKS,
-            threshold=config.SIMILARITY_THRESHOLD,
-        )
+        with timer.stage("retrieval"):
+            top_chunks = snapshot.index.search(
+                query_vector,
+                top_k=config.TOP_K_CHUNKS,
+                threshold=config.SIMILARITY_THRESHOLD,
+            )
 
         if not top_chunks:
             print(f"🔍 No chunks above threshold ({config.SIMILARITY_THRESHOLD}) for: {query[:60]}...")
             return {
-                "context": "",
+                "chunks": [],
                 "docs_used": [],
                 "has_relevant_docs": False,
+                "query_embedding": query_vector,
+                "timings": timer.snapshot(),
             }
 
-        # Step 3: Build context from retrieved chunks
-        context = "\n\n".join(
-            f"[{chunk['title']}]: {chunk['content']}" for chunk in top_chunks
-        )
-
         docs_used = [
             {"title": c["title"], "score": str(c["score"]), "chunk_id": c["id"]}
             for c in top_chunks
@@ -108,9 +272,11 @@ class RAGService:
             print(f"   📄 {doc['title']} — score: {doc['score']}")
 
         return {
-            "context": context,
+            "chunks": top_chunks,
             "docs_used": docs_used,
             "has_relevant_docs": True,
+            "query_embedding": query_vector,
+            "timings": timer.snapshot(),
         }
 
 
@@ -0,0 +1,144 @@
+"""
+Title Service — generates session titles in the background.
+
+Titles are produced by a small pool of workers fed from a bounded queue,
+off the request critical path. Failed LLM calls are retried with backoff;
+when the queue is full (or retries are exhausted) a cheap local heuristic
+title is used instead.
+"""
+import asyncio
+import random
+
+from config import config
+from db import async_queries as queries
+from services.llm_service import llm_service
+
+_FILLER_WORDS = {"a", "an", "the", "i", "my", "me", "do", "does", "can", "how", "what", "is", "to", "please"}
+
+
+def fallback_title(user_message: str, max_words: int = 5) -> str:
+    """Heuristic title from the user's first message (no LLM call)."""
+    words = [w.strip("?!.,:;\"'") for w in user_message.split()]
+    words = [w for w in words if w]
+    meaningful = [w for w in words if w.lower() not in _FILLER_WORDS] or words
+    title = " ".join(meaningful[:max_words])
+    return (title[:1].upper() + title[1:])[:50] or "New conversation"
+
+
+class TitleService:
+    """Bounded background queue of title-generation jobs."""
+
+    def __init__(self):
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self._pending: dict[str, asyncio.Future] = {}
+        self.generated = 0
+        self.fallbacks = 0
+        self.failures = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self) -> None:
+        """Start the worker pool (called from the app lifespan)."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=config.TITLE_QUEUE_SIZE)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"title-worker-{i}")
+            for i in range(config.TITLE_WORKERS)
+        ]
+
+    async def stop(self) -> None:
+        """Stop the workers; queued jobs get heuristic titles so none are lost."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        while self._queue is not None and not self._queue.empty():
+            session_id, user_message, _ = self._queue.get_nowait()
+            await self._store(session_id, fallback_title(user_message), fallback=True)
+
+    def submit(self, session_id: str, user_message: str, assistant_reply: str) -> asyncio.Future:
+        """
+        Queue title generation for a session.
+
+        Returns:
+            Future resolving to the stored title. It resolves immediately
+            with a heuristic title when the queue is saturated.
+        """
+        if session_id in self._pending:
+            return self._pending[session_id]
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[session_id] = future
+        future.add_done_callback(lambda _: self._pending.pop(session_id, None))
+
+        try:
+            if not self.running:
+                raise asyncio.QueueFull
+            self._queue.put_nowait((session_id, user_message, assistant_reply))
+        except asyncio.QueueFull:
+            asyncio.create_task(self._store(session_id, fallback_title(user_message), fallback=True))
+        return future
+
+    async def _worker(self) -> None:
+        while True:
+            session_id, user_message, assistant_reply = await self._queue.get()
+            try:
+                title, fallback = await self._generate(user_message, assistant_reply)
+                await self._store(session_id, title, fallback=fallback)
+            except Exception as e:
+                print(f"⚠️  Title job failed for {session_id}: {e}")
+                self._resolve(session_id, None)
+            finally:
+                self._queue.task_done()
+
+    async def _generate(self, user_message: str, assistant_reply: str) -> tuple[str, bool]:
+        """LLM title with jittered exponential backoff; heuristic after the last attempt."""
+        for attempt in range(config.TITLE_MAX_RETRIES + 1):
+            try:
+                return await llm_service.generate_title(user_message, assistant_reply), False
+            except Exception as e:
+                self.failures += 1
+                if attempt == config.TITLE_MAX_RETRIES:
+                    print(f"⚠️  Title generation failed, using heuristic: {e}")
+                    break
+                await asyncio.sleep(0.5 * (2 ** attempt) * random.uniform(0.5, 1.5))
+        return fallback_title(user_message), True
+
+    async def _store(self, session_id: str, title: str, fallback: bool) -> None:
+        """Persist the title (unless the session got one meanwhile) and resolve waiters."""
+        try:
+            if not await queries.has_title(session_id):
+                await queries.update_session_title(session_id, title)
+        except Exception as e:
+            print(f"⚠️  Could not store title for {session_id}: {e}")
+            title = None
+        if fallback:
+            self.fallbacks += 1
+        else:
+            self.generated += 1
+        self._resolve(session_id, title)
+
+    def _resolve(self, session_id: str, title: str | None) -> None:
+        future = self._pending.get(session_id)
+        if future is not None and not future.done():
+            future.set_result(title)
+
+    def stats(self) -> dict:
+        """Queue depth and outcome counters."""
+        return {
+            "workers": len(self._workers),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_size": config.TITLE_QUEUE_SIZE,
+            "generated": self.generated,
+            "fallbacks": self.fallbacks,
+            "llm_failures": self.failures,
+        }
+
+
+# Singleton instance
+title_service = TitleService()
@@ -0,0 +1,166 @@
+"""
+Admission Control Utility
+Bounds how much work runs at once and sheds the rest early: a concurrency
+limit, a bounded priority queue in front of it, deadline-aware rejection
+(a request that would wait longer than its deadline is turned away up
+front) and a retry-after estimate for rejected callers.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+
+from utils.resilience import LatencyWindow
+
+# Priorities (lower is admitted first)
+PRIORITY_ACTIVE = 0   # continuing an existing conversation
+PRIORITY_NEW = 1      # first message of a session
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; `retry_after` is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Slot:
+    """A held unit of concurrency; release() is idempotent."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._start = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self._start)
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded, priority-ordered wait queue."""
+
+    def __init__(self, max_concurrency: int, max_queue: int, max_wait: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._active = 0
+        self._queue: list[tuple[int, int, asyncio.Future]] = []   # heap of (priority, seq, waiter)
+        self._queued = 0
+        self._seq = itertools.count()
+        self._service_time = 1.0   # EWMA of slot hold time (seconds)
+        self._waits = LatencyWindow()
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected_full = 0
+        self.rejected_deadline = 0
+        self.evicted = 0
+
+    def estimated_wait(self, ahead: int | None = None) -> float:
+        """Seconds a newly queued request would wait behind `ahead` others (default: the whole queue)."""
+        ahead = self._queued if ahead is None else ahead
+        return (ahead + 1) * self._service_time / self.max_concurrency
+
+    async def acquire(self, priority: int = PRIORITY_NEW, deadline: float | None = None) -> Slot:
+        """
+        Wait for a slot.
+
+        Args:
+            priority: PRIORITY_ACTIVE or PRIORITY_NEW
+            deadline: Longest wait in seconds (default: max_wait)
+
+        Returns:
+            Slot to release when the work is done
+
+        Raises:
+            AdmissionRejected: queue full, or the wait would exceed the deadline
+        """
+        deadline = self.max_wait if deadline is None else deadline
+        if self._active < self.max_concurrency and not self._queued:
+            return self._admit()
+
+        ahead = sum(1 for p, _, waiter in self._queue if p <= priority and not waiter.done())
+        if self.estimated_wait(ahead) > deadline:
+            self.rejected_deadline += 1
+            raise AdmissionRejected("Server is busy. Please try again shortly.", self.estimated_wait())
+        if self._queued >= self.max_queue and not self._evict_below(priority):
+            self.rejected_full += 1
+            raise AdmissionRejected("Server is busy. Please try again shortly.", self.estimated_wait())
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+        self._queued += 1
+        self.queued_total += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=deadline)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.rejected_deadline += 1
+            raise AdmissionRejected("Server is busy. Please try again shortly.", self.estimated_wait())
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        # Evicted waiters raise AdmissionRejected from the await above
+        self._waits.add(time.monotonic() - start)
+        return Slot(self)
+
+    def _admit(self) -> Slot:
+        self._active += 1
+        self.admitted += 1
+        self._waits.add(0.0)
+        return Slot(self)
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        """Drop a waiter that gave up; if it was handed a slot meanwhile, pass the slot on."""
+        if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+            self._release(None)
+        elif not waiter.done():
+            waiter.cancel()
+            self._queued -= 1
+
+    def _evict_below(self, priority: int) -> bool:
+        """Reject the newest waiter with a lower priority than `priority` to make room."""
+        live = [(p, seq, waiter) for p, seq, waiter in self._queue if p > priority and not waiter.done()]
+        if not live:
+            return False
+        _, _, victim = max(live, key=lambda entry: (entry[0], entry[1]))
+        victim.set_exception(AdmissionRejected("Server is busy. Please try again shortly.", self.estimated_wait()))
+        self._queued -= 1
+        self.evicted += 1
+        return True
+
+    def _release(self, held: float | None) -> None:
+        if held is not None:
+            self._service_time = 0.9 * self._service_time + 0.1 * held
+        # Hand the slot straight to the best live waiter, so arrivals cannot jump the queue
+        while self._queue:
+            _, _, waiter = heapq.heappop(self._queue)
+            if not waiter.done():
+                self._queued -= 1
+                self.admitted += 1
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def stats(self) -> dict:
+        """Concurrency, queue depth and wait time (for autoscaling) plus shed counters."""
+        p50, p95 = self._waits.percentile(50), self._waits.percentile(95)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_wait": self.max_wait,
+            "active": self._active,
+            "queue_depth": self._queued,
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "rejected_full": self.rejected_full,
+            "rejected_deadline": self.rejected_deadline,
+            "evicted": self.evicted,
+            "wait_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "wait_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "estimated_wait_ms": round(self.estimated_wait() * 1000, 1),
+            "avg_service_ms": round(self._service_time * 1000, 1),
+        }
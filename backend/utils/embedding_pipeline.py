@@ -0,0 +1,256 @@
+"""
+Embedding Pipeline Utility
+Batched, concurrent embedding of chunk texts for ingestion.
+
+- Texts are sent in batches (one batch request per EMBED_BATCH_SIZE texts)
+- Batches run concurrently under an adaptive limit that halves on HTTP 429
+  and creeps back up on success (AIMD), with jittered exponential backoff
+- Finished batches are appended to a JSONL checkpoint so an interrupted run
+  resumes where it stopped
+- The backend is pluggable: GeminiEmbedder for real runs, FakeEmbedder for
+  offline benchmarks
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+
+def text_hash(text: str) -> str:
+    """Stable content hash of an embedding input."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether an upstream error is a 429 / quota error worth backing off on."""
+    if getattr(error, "code", None) == 429:
+        return True
+    name = type(error).__name__
+    return name in ("ResourceExhausted", "TooManyRequests", "RateLimitError") or "429" in str(error)
+
+
+# Backends
+
+class GeminiEmbedder:
+    """Batch embeddings through the async Gemini client."""
+
+    def __init__(self, model: str, timeout: float = 60):
+        self.model = model
+        self.timeout = timeout
+
+    async def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        import google.generativeai as genai
+
+        result = await genai.embed_content_async(
+            model=self.model,
+            content=texts,
+            request_options={"timeout": self.timeout},
+        )
+        return result["embedding"]
+
+
+class FakeRateLimitError(Exception):
+    """Simulated HTTP 429 raised by FakeEmbedder."""
+
+    code = 429
+
+
+class FakeEmbedder:
+    """
+    Offline stand-in for the Embeddings API.
+
+    Vectors are deterministic per text; latency and 429 rate are configurable
+    so the pipeline's concurrency and backoff can be benchmarked.
+    """
+
+    def __init__(self, dim: int = 768, latency: float = 0.2, rate_limit_prob: float = 0.0, seed: int = 0):
+        self.dim = dim
+        self.latency = latency
+        self.rate_limit_prob = rate_limit_prob
+        self._rng = random.Random(seed)
+        self.calls = 0
+
+    async def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self._rng.random() < self.rate_limit_prob:
+            raise FakeRateLimitError("429 Resource has been exhausted (simulated)")
+        vectors = []
+        for text in texts:
+            seed = int(text_hash(text)[:8], 16)
+            vectors.append(np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32).tolist())
+        return vectors
+
+
+# Adaptive concurrency
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: +1 slot after `increase_every` successes,
+    halved on every rate-limit error.
+    """
+
+    def __init__(self, max_concurrency: int, increase_every: int = 5):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.increase_every = increase_every
+        self.active = 0
+        self.rate_limited = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def release(self, rate_limited: bool = False) -> None:
+        async with self._condition:
+            self.active -= 1
+            if rate_limited:
+                self.rate_limited += 1
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.increase_every and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+
+# Checkpoint
+
+class Checkpoint:
+    """Append-only JSONL record of finished embeddings, keyed by chunk id + text hash."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: dict[str, tuple[str, list[float]]] = {}
+
+    def load(self) -> int:
+        """Read a previous run's checkpoint; returns the number of entries recovered."""
+        if not os.path.exists(self.path):
+            return 0
+        good_end = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn final line from an interrupted write
+                good_end += len(line)
+                try:
+                    entry = json.loads(line)
+                    self.done[entry["id"]] = (entry["hash"], entry["embedding"])
+                except (ValueError, KeyError, TypeError):
+                    continue  # corrupt line; that chunk is simply embedded again
+        if good_end < os.path.getsize(self.path):
+            # Drop the torn tail, or the next append would continue that line
+            with open(self.path, "r+b") as f:
+                f.truncate(good_end)
+        return len(self.done)
+
+    def get(self, chunk_id: str, digest: str) -> list[float] | None:
+        """Embedding from a previous run, if the chunk text is unchanged."""
+        entry = self.done.get(chunk_id)
+        if entry and entry[0] == digest:
+            return entry[1]
+        return None
+
+    def append(self, records: list[tuple[str, str, list[float]]]) -> None:
+        """Persist a finished batch."""
+        with open(self.path, "a") as f:
+            for chunk_id, digest, embedding in records:
+                f.write(json.dumps({"id": chunk_id, "hash": digest, "embedding": embedding}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        for chunk_id, digest, embedding in records:
+            self.done[chunk_id] = (digest, embedding)
+
+    def remove(self) -> None:
+        """Delete the checkpoint after a successful run."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# Pipeline
+
+async def embed_texts(
+    items: list[tuple[str, str]],
+    embedder,
+    batch_size: int = 50,
+    max_concurrency: int = 4,
+    max_retries: int = 6,
+    checkpoint: Checkpoint | None = None,
+    on_batch=None,
+) -> tuple[dict[str, list[float]], list[str]]:
+    """
+    Embed (chunk_id, text) pairs in concurrent batches.
+
+    Args:
+        items: (chunk_id, embedding input text) pairs
+        embedder: Object with an async `embed_batch(texts)` method
+        batch_size: Texts per upstream request
+        max_concurrency: Upper bound on concurrent batch requests
+        max_retries: Attempts per batch before giving up on it
+        checkpoint: Optional checkpoint to resume from and append to
+        on_batch: Optional callback(done_count, total_count, batch_ids)
+
+    Returns:
+        (embeddings by chunk id, ids of chunks that failed)
+    """
+    results: dict[str, list[float]] = {}
+    pending: list[tuple[str, str, str]] = []
+    for chunk_id, text in items:
+        digest = text_hash(text)
+        previous = checkpoint.get(chunk_id, digest) if checkpoint else None
+        if previous is not None:
+            results[chunk_id] = previous
+        else:
+            pending.append((chunk_id, text, digest))
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    limiter = AdaptiveLimiter(max_concurrency)
+    failed: list[str] = []
+    total = len(items)
+
+    async def run_batch(batch: list[tuple[str, str, str]]) -> None:
+        for attempt in range(max_retries):
+            await limiter.acquire()
+            try:
+                vectors = await embedder.embed_batch([text for _, text, _ in batch])
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                await limiter.release(rate_limited=rate_limited)
+                if attempt == max_retries - 1:
+                    print(f"   ❌ Batch of {len(batch)} failed after {max_retries} attempts — {e}")
+                    failed.extend(chunk_id for chunk_id, _, _ in batch)
+                    return
+                # Jittered exponential backoff (longer when throttled)
+                base = 1.0 if rate_limited else 0.5
+                await asyncio.sleep(base * (2 ** attempt) * random.uniform(0.5, 1.5))
+                continue
+
+            await limiter.release()
+            records = [(chunk_id, digest, list(map(float, vector))) for (chunk_id, _, digest), vector in zip(batch, vectors)]
+            if checkpoint:
+                checkpoint.append(records)
+            for chunk_id, _, vector in records:
+                results[chunk_id] = vector
+            if on_batch:
+                on_batch(len(results), total, [chunk_id for chunk_id, _, _ in batch])
+            return
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_batch(batch) for batch in batches))
+    elapsed = time.perf_counter() - start
+
+    if batches:
+        print(
+            f"   ⏱️  {len(pending)} texts in {len(batches)} batches — {elapsed:.1f}s "
+            f"({len(pending) / elapsed:.1f} texts/s), 429s: {limiter.rate_limited}, final concurrency: {limiter.limit}"
+        )
+    return results, failed
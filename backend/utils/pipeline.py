@@ -0,0 +1,70 @@
+"""
+Pipeline Utility
+Runs a small dependency graph of async stages with maximum overlap.
+
+Each stage starts as soon as the stages it depends on have finished, so
+the critical path is the longest dependency chain rather than the sum of
+all stages.
+"""
+import asyncio
+import time
+
+
+class Stage:
+    """One node of the graph: `run(results)` is awaited after every stage in `after`."""
+
+    def __init__(self, name: str, run, after: tuple[str, ...] = ()):
+        self.name = name
+        self.run = run
+        self.after = after
+
+
+async def run_stages(stages: list[Stage], results: dict, timer=None):
+    """
+    Execute `stages` concurrently, respecting dependencies.
+
+    Each stage's return value is stored in `results[stage.name]`. If a
+    StageTimer is given, each stage's duration is recorded as `<name>_ms`.
+
+    Yields:
+        Stage names in completion order
+
+    Raises:
+        The first stage exception; all other running stages are cancelled
+    """
+    pending = {stage.name: stage for stage in stages}
+    unknown = {dep for stage in stages for dep in stage.after} - set(pending)
+    if unknown:
+        raise ValueError(f"Unknown stage dependencies: {sorted(unknown)}")
+
+    running: dict[asyncio.Task, Stage] = {}
+    done: set[str] = set()
+
+    async def timed(stage: Stage):
+        started = time.perf_counter()
+        try:
+            return await stage.run(results)
+        finally:
+            if timer is not None:
+                timer.timings[f"{stage.name}_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    try:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if all(dep in done for dep in stage.after):
+                    running[asyncio.create_task(timed(stage))] = stage
+                    del pending[name]
+
+            if not running:
+                raise ValueError(f"Stage dependency cycle: {sorted(pending)}")
+
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                stage = running.pop(task)
+                results[stage.name] = task.result()
+                done.add(stage.name)
+                yield stage.name
+    finally:
+        # Failure or early exit (e.g. client disconnected): stop the rest
+        for task in running:
+            task.cancel()
@@ -0,0 +1,177 @@
+"""
+Resilience Utility
+Building blocks for calling a flaky upstream: transient-error detection,
+jittered backoff, a rolling latency window, hedged requests and a circuit
+breaker.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+
+# Upstream error types worth retrying (google.api_core / requests names)
+_TRANSIENT_ERRORS = {
+    "ServiceUnavailable",
+    "InternalServerError",
+    "DeadlineExceeded",
+    "GatewayTimeout",
+    "BadGateway",
+    "ResourceExhausted",
+    "TooManyRequests",
+    "Aborted",
+    "ChunkedEncodingError",
+}
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Whether a failed call may succeed if repeated (timeouts, 429, 5xx, dropped connections)."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError, OSError)):
+        return True
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and (code == 429 or code >= 500):
+        return True
+    return type(error).__name__ in _TRANSIENT_ERRORS
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """Jittered exponential backoff for the given (0-based) retry attempt."""
+    return min(cap, base * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+
+class LatencyWindow:
+    """Rolling window of recent call latencies (seconds) for percentile estimates."""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        """The q-th percentile (0-100) of the window, or None when empty."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+async def hedged(make_call, delay: float | None):
+    """
+    Run `make_call()`; if it has not finished after `delay` seconds, start
+    one duplicate and take whichever succeeds first. The other is cancelled.
+
+    Args:
+        make_call: Zero-argument coroutine factory (the call must be idempotent)
+        delay: Seconds before hedging, or None to never hedge
+
+    Returns:
+        (result, hedge_sent, hedge_won)
+
+    Raises:
+        The last error if every attempt fails
+    """
+    primary = asyncio.ensure_future(make_call())
+    tasks = {primary}
+    hedge_sent = False
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                tasks.add(asyncio.ensure_future(make_call()))
+                hedge_sent = True
+
+        error = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), hedge_sent, task is not primary
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit is open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Fail fast while an upstream is degraded.
+
+    closed    → open after `failure_threshold` consecutive transient failures
+    open      → half-open once `reset_timeout` seconds have passed
+    half-open → one trial call is let through; success closes the circuit,
+                failure re-opens it
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_started = None
+        self.opens = 0
+        self.rejected = 0
+
+    def allow(self) -> None:
+        """
+        Check before each upstream call.
+
+        Raises:
+            CircuitOpenError: If the call should not be made right now
+        """
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            remaining = self.opened_at + self.reset_timeout - now
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, remaining)
+            self.state = self.HALF_OPEN
+            self._trial_started = None
+
+        if self.state == self.HALF_OPEN:
+            # A trial whose caller vanished (cancelled) must not wedge the circuit
+            if self._trial_started is not None and now - self._trial_started < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.reset_timeout)
+            self._trial_started = now
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_started = None
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opens += 1
+                print(f"⚠️  {self.name} circuit opened after {self.failures} failure(s)")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opens": self.opens,
+            "rejected": self.rejected,
+        }
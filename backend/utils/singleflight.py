@@ -0,0 +1,144 @@
+"""
+Single-flight Utility
+Deduplicates concurrent identical work: callers with the same key share one
+in-flight call (SingleFlight) or one in-flight event stream (BroadcastGroup).
+Nothing is cached — once the call finishes, the next caller starts a new one.
+"""
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """Concurrent callers with the same key await a single shared call."""
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, make_call: Callable[[], Awaitable]):
+        """
+        Run `make_call()` unless an identical call is already in flight.
+
+        Returns:
+            The call's result (exceptions are raised to every waiter)
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            # Shielded so one waiter giving up does not cancel the others
+            return await asyncio.shield(future)
+
+        self.calls += 1
+        future = asyncio.ensure_future(make_call())
+        self._calls[key] = future
+        future.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(future)
+
+    def _finished(self, key: Hashable, future: asyncio.Future) -> None:
+        self._calls.pop(key, None)
+        if not future.cancelled():
+            future.exception()   # retrieved, even if every waiter gave up
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Whether a call for `key` is running (a `do` now would share it)."""
+        return key in self._calls
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls), "calls": self.calls, "shared": self.shared}
+
+
+class Broadcast:
+    """
+    One async event stream fanned out to any number of subscribers.
+
+    Events are buffered, so a subscriber joining mid-stream first replays
+    what it missed. The source is cancelled once every subscriber has left.
+    """
+
+    def __init__(self, source: AsyncIterator, on_done: Callable[[], None] | None = None):
+        self.events: list = []
+        self.done = False
+        self.closing = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self._on_done = on_done
+        self._task = asyncio.create_task(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator) -> None:
+        try:
+            async for event in source:
+                self.events.append(event)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+            if self._on_done:
+                self._on_done()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator:
+        """Yield every event from the start; re-raises the source's error."""
+        self.subscribers += 1
+        position = 0
+        try:
+            while True:
+                while position < len(self.events):
+                    yield self.events[position]
+                    position += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                self.closing = True
+                self._task.cancel()
+
+
+class BroadcastGroup:
+    """Keyed Broadcasts: identical concurrent streams share one source."""
+
+    def __init__(self):
+        self._streams: dict[Hashable, Broadcast] = {}
+        self.streams = 0
+        self.shared = 0
+
+    def subscribe(self, key: Hashable, make_source: Callable[[], AsyncIterator]) -> tuple[AsyncIterator, bool]:
+        """
+        Join the in-flight stream for `key`, or start it with `make_source()`.
+
+        Returns:
+            (event iterator, whether this caller started the stream)
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is not None and not (broadcast.done or broadcast.closing):
+            self.shared += 1
+            return broadcast.subscribe(), False
+
+        def remove() -> None:
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+
+        self.streams += 1
+        broadcast = Broadcast(make_source(), on_done=remove)
+        self._streams[key] = broadcast
+        return broadcast.subscribe(), True
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._streams),
+            "subscribers": sum(b.subscribers for b in self._streams.values()),
+            "streams": self.streams,
+            "shared": self.shared,
+        }
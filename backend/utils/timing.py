@@ -0,0 +1,43 @@
+"""
+Timing Utility
+Measures per-stage latency of the chat pipeline in milliseconds.
+"""
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Collects named stage durations (ms) relative to a common start."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.timings: dict[str, float] = {}
+
+    @staticmethod
+    def _ms(seconds: float) -> float:
+        return round(seconds * 1000, 1)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as `<name>_ms`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[f"{name}_ms"] = self._ms(time.perf_counter() - started)
+
+    def mark(self, name: str) -> None:
+        """Record time since the pipeline started as `<name>_ms` (first call wins)."""
+        self.timings.setdefault(f"{name}_ms", self._ms(time.perf_counter() - self.start))
+
+    def elapsed_ms(self) -> float:
+        """Time since the pipeline started."""
+        return self._ms(time.perf_counter() - self.start)
+
+    def update(self, timings: dict[str, float]) -> None:
+        """Merge durations measured elsewhere (e.g. inside RAGService.search)."""
+        self.timings.update(timings)
+
+    def snapshot(self) -> dict[str, float]:
+        """Copy of the durations measured so far."""
+        return dict(self.timings)
@@ -0,0 +1,316 @@
+"""
+Vector Index Utility
+In-memory retrieval engine over a contiguous, pre-normalized embedding matrix.
+Built once when the vector store is loaded; each query is a single
+matrix-vector product followed by an argpartition top-K selection.
+
+FlatIndex scans every row (exact). IVFIndex narrows the scan to the rows in
+the clusters closest to the query (approximate) for large corpora.
+"""
+import os
+
+import numpy as np
+
+from config import config
+from utils.vector_math import normalize_rows, normalize_vector, top_k_indices
+
+# Metadata fields copied into each search result
+RESULT_FIELDS = ("id", "doc_id", "title", "content", "chunk_index")
+
+
+class FlatIndex:
+    """Exact (brute-force) cosine similarity search."""
+
+    def __init__(self, embeddings, chunks: list[dict], normalized: bool = False):
+        """
+        Args:
+            embeddings: (n, dim) matrix of chunk embeddings
+            chunks: Chunk metadata dicts, row-aligned with `embeddings`
+            normalized: Skip normalization when rows are already unit length
+                        (lets a memory-mapped matrix be used without a copy)
+        """
+        if len(chunks) != len(embeddings):
+            raise ValueError(
+                f"Embedding rows ({len(embeddings)}) do not match chunk count ({len(chunks)})"
+            )
+        self.matrix = embeddings if normalized else normalize_rows(embeddings)
+        self.chunks = chunks
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def dim(self) -> int:
+        return int(self.matrix.shape[1]) if len(self.chunks) else 0
+
+    def search(self, query_vector, top_k: int = 3, threshold: float = 0.65) -> list[dict]:
+        """
+        Find the top-K chunks most similar to the query.
+
+        Args:
+            query_vector: Embedding vector of the user query
+            top_k: Number of top results to return
+            threshold: Minimum similarity score to include
+
+        Returns:
+            List of matching chunks with their similarity scores, sorted by score
+        """
+        if len(self.chunks) == 0:
+            return []
+
+        query = normalize_vector(query_vector)
+        scores = self.matrix @ query
+        winners = top_k_indices(scores, top_k)
+        return self._build_results(winners, scores[winners], threshold)
+
+    def _build_results(self, rows: np.ndarray, row_scores: np.ndarray, threshold: float) -> list[dict]:
+        """Turn only the winning rows into result dicts (rows sorted by score)."""
+        results = []
+        for row, raw_score in zip(rows, row_scores):
+            score = round(float(raw_score), 4)
+            if score < threshold:
+                # Rows are sorted by score, so nothing after this qualifies
+                break
+            chunk = self.chunks[row]
+            result = {field: chunk[field] for field in RESULT_FIELDS}
+            result["score"] = score
+            results.append(result)
+        return results
+
+
+def kmeans(
+    matrix: np.ndarray,
+    n_clusters: int,
+    n_iter: int = 20,
+    seed: int = 0,
+    max_train_points: int = 256,
+    batch_size: int = 8192,
+) -> np.ndarray:
+    """
+    Spherical k-means over normalized rows (cosine distance).
+
+    Trains on a random sample of at most `max_train_points` per cluster.
+
+    Returns:
+        (n_clusters, dim) matrix of normalized centroids
+    """
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    n_clusters = max(1, min(n_clusters, n))
+
+    sample_size = min(n, n_clusters * max_train_points)
+    sample_rows = np.sort(rng.choice(n, size=sample_size, replace=False))
+    sample = np.ascontiguousarray(matrix[sample_rows], dtype=np.float32)
+
+    centroids = sample[rng.choice(sample_size, size=n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assignments = assign_to_centroids(sample, centroids, batch_size)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+        sums[nonempty] = np.add.reduceat(sample[np.argsort(assignments, kind="stable")], starts, axis=0)
+
+        # Re-seed empty clusters from random sample points
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = sample[rng.choice(sample_size, size=len(empty), replace=False)]
+
+        centroids = normalize_rows(sums)
+
+    return centroids
+
+
+def assign_to_centroids(matrix: np.ndarray, centroids: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+    """Index of the most similar centroid for every row, computed in batches."""
+    assignments = np.empty(matrix.shape[0], dtype=np.int64)
+    for start in range(0, matrix.shape[0], batch_size):
+        block = np.asarray(matrix[start:start + batch_size], dtype=np.float32)
+        assignments[start:start + batch_size] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+class IVFIndex(FlatIndex):
+    """
+    Inverted-file approximate search.
+
+    Rows are partitioned into `nlist` clusters by k-means; a query only scores
+    the rows in its `nprobe` closest clusters. Exact search over the full
+    matrix stays available through `search(..., exact=True)`.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        chunks: list[dict],
+        centroids: np.ndarray,
+        list_rows: np.ndarray,
+        list_offsets: np.ndarray,
+        nprobe: int = 8,
+        normalized: bool = False,
+    ):
+        """
+        Args:
+            embeddings: (n, dim) matrix of chunk embeddings
+            chunks: Chunk metadata dicts, row-aligned with `embeddings`
+            centroids: (nlist, dim) normalized cluster centroids
+            list_rows: Row ids grouped by cluster
+            list_offsets: (nlist + 1,) start offset of each cluster in `list_rows`
+            nprobe: Default number of clusters scanned per query
+            normalized: Skip normalization when rows are already unit length
+        """
+        super().__init__(embeddings, chunks, normalized=normalized)
+        self.centroids = centroids
+        self.list_rows = list_rows
+        self.list_offsets = list_offsets
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @classmethod
+    def build(
+        cls,
+        embeddings,
+        chunks: list[dict],
+        nlist: int = 0,
+        nprobe: int = 8,
+        normalized: bool = False,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """
+        Train centroids and build inverted lists.
+
+        Args:
+            nlist: Number of clusters (0 = 4 * sqrt(n))
+        """
+        matrix = embeddings if normalized else normalize_rows(embeddings)
+        if nlist <= 0:
+            nlist = default_nlist(len(chunks))
+
+        centroids = kmeans(matrix, nlist, seed=seed)
+        assignments = assign_to_centroids(matrix, centroids)
+
+        list_rows = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=centroids.shape[0])
+        list_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+        return cls(matrix, chunks, centroids, list_rows, list_offsets, nprobe=nprobe, normalized=True)
+
+    def save(self, path: str, store_version: str) -> None:
+        """Persist centroids and inverted lists (tagged with the store version)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                list_rows=self.list_rows,
+                list_offsets=self.list_offsets,
+                store_version=np.array(store_version),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        embeddings,
+        chunks: list[dict],
+        store_version: str,
+        nprobe: int = 8,
+        normalized: bool = False,
+    ) -> "IVFIndex":
+        """
+        Load a persisted index for the given store.
+
+        Raises:
+            ValueError: If the index was built for a different store version
+        """
+        with np.load(path) as data:
+            built_for = str(data["store_version"])
+            if built_for != store_version:
+                raise ValueError(f"IVF index is stale (built for {built_for}, store is {store_version})")
+            return cls(
+                embeddings,
+                chunks,
+                data["centroids"],
+                data["list_rows"],
+                data["list_offsets"],
+                nprobe=nprobe,
+                normalized=normalized,
+            )
+
+    def search(
+        self,
+        query_vector,
+        top_k: int = 3,
+        threshold: float = 0.65,
+        nprobe: int | None = None,
+        exact: bool = False,
+    ) -> list[dict]:
+        """
+        Approximate top-K search over the `nprobe` closest clusters.
+
+        Args:
+            nprobe: Clusters to scan (defaults to the index setting)
+            exact: Bypass the inverted lists and scan every row
+        """
+        nprobe = nprobe or self.nprobe
+        if exact or nprobe >= self.nlist:
+            return super().search(query_vector, top_k=top_k, threshold=threshold)
+        if len(self.chunks) == 0:
+            return []
+
+        query = normalize_vector(query_vector)
+        probes = top_k_indices(self.centroids @ query, nprobe)
+        candidates = np.concatenate([
+            self.list_rows[self.list_offsets[p]:self.list_offsets[p + 1]] for p in probes
+        ])
+        if len(candidates) == 0:
+            return []
+
+        scores = np.asarray(self.matrix[candidates], dtype=np.float32) @ query
+        winners = top_k_indices(scores, top_k)
+        return self._build_results(candidates[winners], scores[winners], threshold)
+
+
+def wants_ivf(n_chunks: int, kind: str) -> bool:
+    """Whether index `kind` ('flat' | 'ivf' | 'auto') selects IVF for a corpus size."""
+    return kind == "ivf" or (kind == "auto" and n_chunks >= config.IVF_MIN_CHUNKS)
+
+
+def default_nlist(n: int) -> int:
+    """Rule-of-thumb cluster count for `n` rows."""
+    return max(1, int(4 * np.sqrt(n)))
+
+
+def build_index(
+    matrix,
+    chunks: list[dict],
+    kind: str = "auto",
+    ivf_path: str | None = None,
+    store_version: str | None = None,
+    normalized: bool = False,
+) -> FlatIndex:
+    """
+    Build the configured index type for a loaded store.
+
+    `kind` is 'flat', 'ivf' or 'auto' (IVF once the corpus reaches
+    IVF_MIN_CHUNKS). IVF is only used when a persisted index matching
+    `store_version` exists; otherwise exact search is the fallback.
+    """
+    use_ivf = wants_ivf(len(chunks), kind)
+    if use_ivf and ivf_path and os.path.exists(ivf_path):
+        try:
+            return IVFIndex.load(
+                ivf_path, matrix, chunks, store_version,
+                nprobe=config.IVF_NPROBE, normalized=normalized,
+            )
+        except Exception as e:
+            print(f"⚠️  Ignoring IVF index, falling back to exact search: {e}")
+    elif use_ivf:
+        print("⚠️  No IVF index found, falling back to exact search. Re-run 'python scripts/ingest.py'.")
+
+    return FlatIndex(matrix, chunks, normalized=normalized)
@@ -32,6 +32,52 @@ def cosine_similarity(vec_a: list[float], vec_b: list[float]) -> float:
     return float(dot_product / (norm_a * norm_b))
 
 
+def normalize_vector(vec) -> np.ndarray:
+    """
+    L2-normalize a single vector into a float32 array.
+
+    A zero vector is returned unchanged (all scores against it are 0).
+    """
+    v = np.asarray(vec, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    if norm == 0:
+        return v
+    return v / norm
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """
+    L2-normalize every row of a 2-D matrix.
+
+    Returns a C-contiguous float32 matrix so that a single matrix-vector
+    product against a normalized query yields cosine similarities.
+    Zero rows stay zero.
+    """
+    m = np.ascontiguousarray(matrix, dtype=np.float32)
+    if m.ndim != 2:
+        raise ValueError(f"Expected a 2-D embedding matrix, got shape {m.shape}")
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(m / norms, dtype=np.float32)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the `k` highest scores, sorted by descending score.
+
+    Uses `np.argpartition` so only the K winners are fully sorted
+    (O(n + k log k) instead of O(n log n)).
+    """
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
 def find_top_k_similar(
     query_vector: list[float],
     document_vectors: list[dict],
@@ -41,6 +87,9 @@ def find_top_k_similar(
     """
     Find the top-K most similar document chunks to the query.
 
+    Convenience wrapper for ad-hoc lists of chunk dicts. The service path
+    builds a `FlatIndex` once instead (see utils/vector_index.py).
+
     Args:
         query_vector: Embedding vector of the user query
         document_vectors: List of dicts with 'embedding' and chunk metadata
@@ -50,22 +99,13 @@ def find_top_k_similar(
     Returns:
         List of matching chunks with their similarity scores, sorted by score
     """
-    scored = []
-
-    for doc in document_vectors:
-        score = cosine_similarity(query_vector, doc["embedding"])
-        scored.append({
-            "id": doc["id"],
-            "doc_id": doc["doc_id"],
-            "title": doc["title"],
-            "content": doc["content"],
-            "chunk_index": doc["chunk_index"],
-            "score": round(score, 4),
-        })
-
-    # Filter by threshold, sort descending, take top K
-    relevant = [s for s in scored if s["score"] >= threshold]
-    relevant.sort(key=lambda x: x["score"], reverse=True)
+    from utils.vector_index import FlatIndex
 
-    return relevant[:top_k]
+    if not document_vectors:
+        return []
 
+    index = FlatIndex(
+        np.array([doc["embedding"] for doc in document_vectors], dtype=np.float32),
+        document_vectors,
+    )
+    return index.search(query_vector, top_k=top_k, threshold=threshold)
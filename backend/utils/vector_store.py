@@ -0,0 +1,212 @@
+"""
+Vector Store Utility
+Binary on-disk format for chunk embeddings.
+
+Layout (for a base path like data/vector_store):
+- vector_store.<version>.npy  float32 (n, dim) matrix, rows L2-normalized
+- vector_store.meta.json      compact sidecar with format info, chunk metadata
+                              and the name of its matrix file
+- vector_store.ivf.npz        optional IVF index (see utils/vector_index.py)
+
+Stores written before versioned matrix files keep theirs in vector_store.npy.
+
+The matrix is opened with `np.load(mmap_mode="r")`, so startup does not parse
+any floats and every uvicorn worker shares the same pages via the OS page cache.
+"""
+import glob
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from utils.vector_math import normalize_rows
+
+FORMAT_VERSION = 1
+
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+VECTOR_STORE_BASE = os.path.join(DATA_DIR, "vector_store")
+LEGACY_JSON_PATH = os.path.join(DATA_DIR, "vector_store.json")
+
+
+def store_paths(base_path: str = VECTOR_STORE_BASE) -> tuple[str, str]:
+    """Return (legacy matrix_path, meta_path) for a store base path."""
+    return f"{base_path}.npy", f"{base_path}.meta.json"
+
+
+def matrix_path_for(base_path: str, meta: dict) -> str:
+    """Matrix file a sidecar belongs to (the unversioned name for older stores)."""
+    matrix_file = meta.get("matrix_file")
+    if not matrix_file:
+        return store_paths(base_path)[0]
+    return os.path.join(os.path.dirname(os.path.abspath(base_path)), matrix_file)
+
+
+def _published_matrix(base_path: str) -> str | None:
+    """Matrix path of the sidecar currently on disk, if any."""
+    try:
+        with open(store_paths(base_path)[1], "r") as f:
+            return matrix_path_for(base_path, json.load(f))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _remove_stale_matrices(base_path: str, keep: set[str]) -> None:
+    """Delete matrix files of older builds (open memory maps stay valid)."""
+    candidates = glob.glob(f"{glob.escape(base_path)}.*.npy") + [store_paths(base_path)[0]]
+    for path in candidates:
+        if os.path.abspath(path) not in keep and os.path.exists(path):
+            os.remove(path)
+
+
+def ivf_index_path(base_path: str = VECTOR_STORE_BASE) -> str:
+    """Path of the persisted IVF index that sits next to a store."""
+    return f"{base_path}.ivf.npz"
+
+
+def store_signature(base_path: str = VECTOR_STORE_BASE) -> tuple:
+    """
+    Cheap change marker for a store: (sidecar mtime, IVF index mtime).
+
+    The sidecar is renamed into place last, so a new signature means a
+    complete new store is on disk.
+    """
+    signature = []
+    for path in (store_paths(base_path)[1], ivf_index_path(base_path)):
+        try:
+            signature.append(os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def store_exists(base_path: str = VECTOR_STORE_BASE) -> bool:
+    """Check whether a published binary store exists at `base_path`."""
+    matrix_path = _published_matrix(base_path)
+    return matrix_path is not None and os.path.exists(matrix_path)
+
+
+def _store_version(matrix: np.ndarray, chunks: list[dict]) -> str:
+    """Content hash identifying a store build (embeddings + chunk ids)."""
+    digest = hashlib.sha1(matrix.tobytes())
+    for chunk in chunks:
+        digest.update(str(chunk["id"]).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def save_vector_store(
+    embeddings,
+    chunks: list[dict],
+    base_path: str = VECTOR_STORE_BASE,
+    model: str | None = None,
+    doc_hashes: dict[str, str] | None = None,
+) -> dict:
+    """
+    Write embeddings and chunk metadata in the binary format.
+
+    The matrix goes to a file named after the store version, then the
+    sidecar naming it is renamed into place. That rename is the single
+    publish step: a reader always gets a sidecar together with its own
+    matrix, never the new matrix with the old metadata. The previous
+    build's matrix is kept for readers that just read the old sidecar.
+
+    Args:
+        embeddings: (n, dim) embedding matrix (normalized here)
+        chunks: Chunk metadata dicts, row-aligned with `embeddings`
+        base_path: Store base path (without extension)
+        model: Embedding model name, recorded in the sidecar
+        doc_hashes: Source document content hashes, for incremental re-ingestion
+
+    Returns:
+        The metadata dict written to the sidecar
+    """
+    if len(chunks) != len(embeddings):
+        raise ValueError(
+            f"Embedding rows ({len(embeddings)}) do not match chunk count ({len(chunks)})"
+        )
+
+    matrix = normalize_rows(embeddings) if len(chunks) else np.zeros((0, 0), dtype=np.float32)
+    chunks = [{k: v for k, v in chunk.items() if k != "embedding"} for chunk in chunks]
+
+    version = _store_version(matrix, chunks)
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "version": version,
+        "matrix_file": f"{os.path.basename(base_path)}.{version}.npy",
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "model": model,
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]) if len(chunks) else 0,
+        "dtype": "float32",
+        "normalized": True,
+        "doc_hashes": doc_hashes or {},
+        "chunks": chunks,
+    }
+
+    _, meta_path = store_paths(base_path)
+    matrix_path = matrix_path_for(base_path, meta)
+    os.makedirs(os.path.dirname(os.path.abspath(matrix_path)), exist_ok=True)
+    previous = _published_matrix(base_path)
+
+    tmp_matrix = f"{matrix_path}.tmp"
+    with open(tmp_matrix, "wb") as f:
+        np.save(f, matrix)
+    os.replace(tmp_matrix, matrix_path)
+
+    tmp_meta = f"{meta_path}.tmp"
+    with open(tmp_meta, "w") as f:
+        json.dump(meta, f, separators=(",", ":"))
+    os.replace(tmp_meta, meta_path)
+
+    _remove_stale_matrices(base_path, {os.path.abspath(matrix_path), os.path.abspath(previous or matrix_path)})
+    return meta
+
+
+def load_vector_store(base_path: str = VECTOR_STORE_BASE) -> tuple[np.ndarray, dict]:
+    """
+    Open a binary store.
+
+    Returns:
+        (matrix, meta) — `matrix` is a read-only memory map of normalized rows
+    """
+    _, meta_path = store_paths(base_path)
+
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported vector store format: {meta.get('format_version')}")
+
+    # The sidecar names its own matrix, so a concurrent save cannot pair them up wrongly
+    matrix = np.load(matrix_path_for(base_path, meta), mmap_mode="r")
+    if matrix.shape[0] != meta["count"]:
+        raise ValueError(
+            f"Vector store is inconsistent: {matrix.shape[0]} rows vs {meta['count']} chunks"
+        )
+
+    return matrix, meta
+
+
+def load_json_vector_store(json_path: str = LEGACY_JSON_PATH) -> tuple[np.ndarray, list[dict]]:
+    """
+    Read the legacy vector_store.json format.
+
+    Returns:
+        (embeddings, chunks) — raw float32 matrix and metadata without embeddings
+    """
+    with open(json_path, "r") as f:
+        entries = json.load(f)
+
+    embeddings = np.array([entry.pop("embedding") for entry in entries], dtype=np.float32)
+    return embeddings, entries
+
+
+def convert_json_store(
+    json_path: str = LEGACY_JSON_PATH,
+    base_path: str = VECTOR_STORE_BASE,
+    model: str | None = None,
+) -> dict:
+    """One-shot migration from vector_store.json to the binary format."""
+    embeddings, chunks = load_json_vector_store(json_path)
+    return save_vector_store(embeddings, chunks, base_path, model=model)
@@ -3,7 +3,7 @@ import MessageItem from './MessageItem';
 import TypingIndicator from './TypingIndicator';
 import StatusIndicator from './StatusIndicator';
 
-const MessageList = ({ messages, isLoading, streamingMessage, statusStages }) => {
+const MessageList = ({ messages, hasEarlier, onLoadEarlier, isLoading, streamingMessage, statusStages }) => {
     const bottomRef = useRef(null);
 
     // Auto-scroll to bottom on new messages
@@ -13,6 +13,12 @@ const MessageList = ({ messages, isLoading, streamingMessage, statusStages }) =>
 
     return (
         <div className="message-area">
+            {hasEarlier && (
+                <button className="load-earlier-btn" onClick={onLoadEarlier}>
+                    Load earlier messages
+                </button>
+            )}
+
             {messages.map((msg) => (
                 <MessageItem key={msg.id} message={msg} />
             ))}
@@ -1,7 +1,7 @@
 import { Bot, Plus, MessageSquare, Trash2, X } from 'lucide-react';
 import { formatTime } from '../../utils/session';
 
-const SessionSidebar = ({ sessions, currentSessionId, onNewChat, onSelectSession, onDeleteSession, onClose }) => {
+const SessionSidebar = ({ sessions, currentSessionId, onNewChat, onSelectSession, onDeleteSession, hasMore, onLoadMore, onClose }) => {
     return (
         <aside className="sidebar">
             {}
@@ -63,6 +63,11 @@ const SessionSidebar = ({ sessions, currentSessionId, onNewChat, onSelectSession
                         </div>
                     ))
                 )}
+                {hasMore && (
+                    <button className="session-load-more" onClick={onLoadMore}>
+                        Load more
+                    </button>
+                )}
             </div>
         </aside>
     );
@@ -20,7 +20,9 @@ import {
 const ChatPage = () => {
     const [sessionId, setCurrentSessionId] = useState(getSessionId());
     const [messages, setMessages] = useState([]);
+    const [earlierBeforeId, setEarlierBeforeId] = useState(null);
     const [sessions, setSessions] = useState([]);
+    const [sessionsCursor, setSessionsCursor] = useState(null);
     const [isLoading, setIsLoading] = useState(false);
     const [streamingMessage, setStreamingMessage] = useState('');
     const [statusStages, setStatusStages] = useState([]);
@@ -37,15 +39,28 @@ const ChatPage = () => {
         try {
             const data = await getSessions();
             setSessions(data.sessions || []);
+            setSessionsCursor(data.nextCursor || null);
         } catch {
             // No sessions yet
         }
     };
 
+    const loadMoreSessions = async () => {
+        if (!sessionsCursor) return;
+        try {
+            const data = await getSessions(sessionsCursor);
+            setSessions((prev) => [...prev, ...(data.sessions || [])]);
+            setSessionsCursor(data.nextCursor || null);
+        } catch {
+            toast.error('Failed to load more chats');
+        }
+    };
+
     const loadConversation = async (sid) => {
         try {
             const data = await getConversation(sid);
             setMessages(data.messages || []);
+            setEarlierBeforeId(data.nextBeforeId || null);
             const session = sessions.find((s) => s.id === sid);
             if (session?.title) {
                 setChatTitle(session.title);
@@ -54,6 +69,7 @@ const ChatPage = () => {
             }
         } catch {
             setMessages([]);
+            setEarlierBeforeId(null);
             setChatTitle('');
         }
     };
@@ -111,7 +127,12 @@ const ChatPage = () => {
                                 setMessages((prev) => [...prev, assistantMsg]);
                                 setStreamingMessage('');
                                 setStatusStages([]);
-                                if (data.title) setChatTitle(data.title);
+                                // The stream stays open a few seconds for the title; unlock the input now
+                                setIsLoading(false);
+                                loadSessions();
+                            } else if (data.type === 'title') {
+                                setChatTitle(data.title);
+                                loadSessions();
                             } else if (data.type === 'error') {
                                 toast.error(data.error || 'Failed to get response');
                             }
@@ -120,8 +141,6 @@ const ChatPage = () => {
                         }
                     }
                 }
-
-                loadSessions();
             } catch (error) {
                 toast.error(error.message || 'Failed to send message. Is the backend running?');
             } finally {
@@ -133,11 +152,23 @@ const ChatPage = () => {
         [sessionId, isLoading]
     );
 
+    const loadEarlierMessages = async () => {
+        if (!earlierBeforeId) return;
+        try {
+            const data = await getConversation(sessionId, earlierBeforeId);
+            setMessages((prev) => [...(data.messages || []), ...prev]);
+            setEarlierBeforeId(data.nextBeforeId || null);
+        } catch {
+            toast.error('Failed to load earlier messages');
+        }
+    };
+
     // New chat
     const handleNewChat = useCallback(() => {
         const newId = createNewSession();
         setCurrentSessionId(newId);
         setMessages([]);
+        setEarlierBeforeId(null);
         setChatTitle('');
         setStreamingMessage('');
         setStatusStages([]);
@@ -166,6 +197,7 @@ const ChatPage = () => {
                     const newId = createNewSession();
                     setCurrentSessionId(newId);
                     setMessages([]);
+                    setEarlierBeforeId(null);
                     setChatTitle('');
                 }
                 toast.success('Session deleted');
@@ -189,6 +221,7 @@ const ChatPage = () => {
         try {
             await clearConversation(sessionId);
             setMessages([]);
+            setEarlierBeforeId(null);
             setChatTitle('');
             setStreamingMessage('');
             setStatusStages([]);
@@ -206,6 +239,7 @@ const ChatPage = () => {
             const newId = createNewSession();
             setCurrentSessionId(newId);
             setMessages([]);
+            setEarlierBeforeId(null);
             setChatTitle('');
             setStreamingMessage('');
             setStatusStages([]);
@@ -227,6 +261,8 @@ const ChatPage = () => {
                         onNewChat={handleNewChat}
                         onSelectSession={handleSelectSession}
                         onDeleteSession={handleDeleteSession}
+                        hasMore={Boolean(sessionsCursor)}
+                        onLoadMore={loadMoreSessions}
                         onClose={() => setSidebarOpen(false)}
                     />
                     <div
@@ -277,6 +313,8 @@ const ChatPage = () => {
                 ) : (
                     <MessageList
                         messages={messages}
+                        hasEarlier={Boolean(earlierBeforeId)}
+                        onLoadEarlier={loadEarlierMessages}
                         isLoading={isLoading}
                         streamingMessage={streamingMessage}
                         statusStages={statusStages}
@@ -30,9 +30,11 @@ export async function sendMessage(sessionId, message) {
 }
 
 
-export async function getConversation(sessionId) {
+export async function getConversation(sessionId, beforeId) {
     try {
-        const res = await axiosClient.get(`/api/conversations/${sessionId}`);
+        const res = await axiosClient.get(`/api/conversations/${sessionId}`, {
+            params: beforeId ? { before_id: beforeId } : {},
+        });
         return res.data;
     } catch (error) {
         if (error.response?.status === 404) return { messages: [] };
@@ -41,9 +43,9 @@ export async function getConversation(sessionId) {
 }
 
 
-export async function getSessions() {
+export async function getSessions(cursor) {
     try {
-        const res = await axiosClient.get('/api/sessions');
+        const res = await axiosClient.get('/api/sessions', { params: cursor ? { cursor } : {} });
         return res.data;
     } catch (error) {
         throw new Error('Failed to load sessions');